@@ -3,6 +3,21 @@ ASGI config for PedidosApp project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Perfil ASGI: activa PEDIDOS_ASGI (vistas de lectura async y exportaciones
+con flujo async) salvo que el entorno diga otra cosa. Ejemplo con uvicorn
+detrás de gunicorn, un proceso por núcleo:
+
+    gunicorn PedidosApp.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+Las vistas que escriben siguen siendo síncronas y Django las corre en un
+hilo por petición. SQLite atiende una consulta a la vez por conexión: el
+beneficio de asyncio.gather es no bloquear el loop, no paralelizar SQL.
+Ver `manage.py benchmark_asgi` para comparar con WSGI.
+
+Los cambios en vivo (api/eventos/, server-sent events) aprovechan este
+perfil: cada tablet conectada es una espera en el loop, no un hilo. Entre
+workers los cambios se propagan por la BD (ver pedidos/eventos.py).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -12,5 +27,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "PedidosApp.settings")
+os.environ.setdefault("PEDIDOS_ASGI", "True")
 
 application = get_asgi_application()
@@ -57,6 +57,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "pedidos.middleware.EstaticosMiddleware",
+    "pedidos.middleware.ContextoPeticionMiddleware",
+    "pedidos.middleware.MetricasMiddleware",
     "pedidos.middleware.ErrorHandlingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -68,13 +71,21 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "PedidosApp.urls"
 
+# Fuera de DEBUG las plantillas se compilan una vez por proceso (cached.Loader)
+CARGADORES_PLANTILLAS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / 'templates']
         ,
-        "APP_DIRS": True,
         "OPTIONS": {
+            "loaders": CARGADORES_PLANTILLAS if DEBUG else [
+                ("django.template.loaders.cached.Loader", CARGADORES_PLANTILLAS),
+            ],
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
@@ -87,16 +98,137 @@ TEMPLATES = [
 WSGI_APPLICATION = "PedidosApp.wsgi.application"
 
 
+# Perfil ASGI: PedidosApp/asgi.py lo activa. Las páginas de solo lectura y
+# las APIs JSON usan sus versiones async (ORM async + asyncio.gather) y las
+# exportaciones se envían con un flujo async. Con WSGI queda en False.
+PEDIDOS_ASGI = os.getenv('PEDIDOS_ASGI', 'False') == 'True'
+
+
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite afinado para varios workers (todo configurable desde .env):
+# - WAL: los lectores no bloquean al escritor ni al revés.
+# - synchronous=NORMAL: en WAL no pierde consistencia y evita un fsync por commit.
+# - busy_timeout: espera (ms) por el lock de escritura en vez de fallar al instante.
+# - transaction_mode IMMEDIATE: cada atomic() toma el lock de escritura al
+#   comenzar; así una lectura no falla con "database is locked" al pasar a escritura.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),
+    # Negativo = KiB (-20000 ~ 20 MB de caché de páginas por conexión)
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-20000')),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024))),
+    'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            "init_command": ";".join(f"PRAGMA {nombre}={valor}" for nombre, valor in SQLITE_PRAGMAS.items()),
+            "transaction_mode": os.getenv('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+            # Segundos que el driver espera un lock (misma idea que busy_timeout)
+            "timeout": SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        },
+        # Conexiones persistentes: los PRAGMA se aplican una vez por conexión.
+        # Bajo ASGI cada petición corre en su propio hilo y una conexión
+        # persistente quedaría abierta en un hilo que ya terminó: se cierran.
+        "CONN_MAX_AGE": int(os.getenv('DB_CONN_MAX_AGE', '0' if PEDIDOS_ASGI else '60')),
+        "CONN_HEALTH_CHECKS": os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+    }
+}
+
+
+# Cache
+# Backend configurable desde .env: 'locmem' (por proceso) o 'file' (compartido
+# entre workers sin servicios externos). También acepta una ruta completa.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        "LOCATION": os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, '.cache') if CACHE_BACKEND == 'file' else 'manzagrafica',
+        ),
+        # Las entradas de versiones anteriores no se borran al cambiar la
+        # versión: vencen por TTL y, pasado este máximo, el backend descarta
+        # una parte al guardar. Con 'file' acota los archivos del directorio.
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv('CACHE_MAX_ENTRIES', '300'))},
     }
 }
 
+# Segundos que vive cada entrada del cache versionado de pedidos. Siempre
+# finito: es lo que limpia las entradas de versiones viejas
+PEDIDOS_CACHE_TTL = int(os.getenv('PEDIDOS_CACHE_TTL', '300'))
+
+# Segundos que vive cada fila/tarjeta de pedido cacheada ({% cache %} con la
+# fecha de modificación en la clave: un cambio la reemplaza antes). 0 = sin cache
+PEDIDOS_FRAGMENTOS_TTL = int(os.getenv('PEDIDOS_FRAGMENTOS_TTL', '3600'))
+
+# Segundos que vive en memoria del proceso cada respuesta del autocompletado de clientes
+PEDIDOS_AUTOCOMPLETAR_TTL = int(os.getenv('PEDIDOS_AUTOCOMPLETAR_TTL', '30'))
+
+# Trabajo semanal: días hacia adelante del histograma de carga (?dias=N lo
+# cambia por petición) y entregas diarias que el taller alcanza a cumplir
+# (0 = sin línea de capacidad)
+PEDIDOS_HORIZONTE_CARGA = int(os.getenv('PEDIDOS_HORIZONTE_CARGA', '14'))
+PEDIDOS_CAPACIDAD_DIARIA = int(os.getenv('PEDIDOS_CAPACIDAD_DIARIA', '0'))
+
+# Cambios en vivo (api/eventos/, server-sent events): segundos entre latidos
+# que mantienen viva la conexión, segundos que dura cada conexión en WSGI
+# (ocupa un hilo; el navegador se reconecta) y cada cuántos segundos se
+# revisan los cambios hechos por otros procesos (0 = solo los de este)
+PEDIDOS_EVENTOS_LATIDO = int(os.getenv('PEDIDOS_EVENTOS_LATIDO', '15'))
+PEDIDOS_EVENTOS_DURACION_SYNC = int(os.getenv('PEDIDOS_EVENTOS_DURACION_SYNC', '30'))
+PEDIDOS_EVENTOS_REVISION = float(os.getenv('PEDIDOS_EVENTOS_REVISION', '2'))
+# Si el dashboard y el trabajo semanal se suscriben a los cambios. Por
+# defecto solo con ASGI: en WSGI cada tablet conectada ocupa un hilo del
+# worker, y un pool chico se queda sin hilos para el resto de las páginas
+PEDIDOS_EN_VIVO = os.getenv('PEDIDOS_EN_VIVO', str(PEDIDOS_ASGI)) == 'True'
+
+# Métricas por vista (api/metricas/): peticiones recientes que se guardan por
+# vista para los percentiles, y si se envía la cabecera Server-Timing
+PEDIDOS_METRICAS_MUESTRAS = int(os.getenv('PEDIDOS_METRICAS_MUESTRAS', '500'))
+PEDIDOS_SERVER_TIMING = os.getenv('PEDIDOS_SERVER_TIMING', str(DEBUG)) == 'True'
+
+
+# Logging
+# JSON de una línea por registro, escrito desde un hilo aparte (la petición
+# solo encola). Errores idénticos: a lo más LOG_REPETIDOS_MAX por ventana.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'json': {
+            'class': 'pedidos.registro.ColaHandler',
+            # Vacío = stderr
+            'archivo': os.getenv('LOG_ARCHIVO') or None,
+            'maximo_repetidos': int(os.getenv('LOG_REPETIDOS_MAX', '5')),
+            'ventana_repetidos': int(os.getenv('LOG_REPETIDOS_VENTANA', '60')),
+        },
+    },
+    'loggers': {
+        'pedidos': {
+            'handlers': ['json'],
+            'level': os.getenv('LOG_NIVEL', 'INFO'),
+            'propagate': False,
+        },
+        'django.request': {
+            'handlers': ['json'],
+            'level': 'ERROR',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -137,6 +269,17 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# CSS/JS/fuentes de terceros: 'auto' usa los archivos propios si ya se
+# construyeron (manage.py construir_estaticos), si no los CDN. También
+# acepta 'locales' o 'cdn'.
+PEDIDOS_ESTATICOS = os.getenv('PEDIDOS_ESTATICOS', 'auto')
+
+# EstaticosMiddleware sirve STATIC_ROOT (nombres con hash cacheados un año,
+# copias .br/.gz). Desactivar si los sirve el servidor web o el hosting.
+PEDIDOS_SERVIR_ESTATICOS = os.getenv('PEDIDOS_SERVIR_ESTATICOS', 'True') == 'True'
+# Segundos de cache para los archivos sin hash en el nombre
+PEDIDOS_ESTATICOS_MAX_AGE = int(os.getenv('PEDIDOS_ESTATICOS_MAX_AGE', '60'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
 
@@ -149,3 +292,15 @@ USE_THOUSAND_SEPARATOR = True
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Las imágenes de pedidos se guardan por contenido (SHA-256): subidas
+# repetidas o pedidos duplicados comparten el mismo archivo en disco.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    # Nombres con hash + copias .gz/.br (pedidos/almacenamiento.py)
+    "staticfiles": {"BACKEND": "pedidos.almacenamiento.EstaticosComprimidos"},
+    "pedidos": {"BACKEND": "pedidos.almacenamiento.AlmacenamientoPorContenido"},
+}
+
+# Hilos que generan las variantes de imagen de los pedidos en segundo plano
+PEDIDOS_IMAGENES_HILOS = int(os.getenv('PEDIDOS_IMAGENES_HILOS', '2'))
@@ -1,10 +1,10 @@
 from django.contrib import admin
-from .models import Cliente, Pedido
+from .models import Cliente, Pedido, PedidoEvento
 
 @admin.register(Cliente)
 class ClienteAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'telefono', 'email')
-    search_fields = ('nombre', 'telefono')
+    search_fields = ('nombre', 'telefono', '^telefono_normalizado')
 
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
@@ -12,4 +12,23 @@ class PedidoAdmin(admin.ModelAdmin):
     list_filter = ('estado', 'fecha_entrega')
     search_fields = ('cliente__nombre', 'resumen_pedido')
     list_editable = ('estado',)
+    list_select_related = ('cliente',)
     list_per_page = 20
+
+@admin.register(PedidoEvento)
+class PedidoEventoAdmin(admin.ModelAdmin):
+    list_display = ('creado_en', 'pedido_id', 'usuario', 'estado_anterior', 'estado_nuevo', 'delta_venta', 'delta_abonado')
+    list_filter = ('estado_nuevo',)
+    search_fields = ('=pedido__id',)
+    list_select_related = ('usuario',)
+    list_per_page = 50
+
+    # Solo de inserción: el historial no se crea, edita ni borra a mano
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
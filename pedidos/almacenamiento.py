@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+
+try:
+    import brotli
+except ImportError:
+    # Opcional: sin el paquete brotli solo se generan las copias .gz
+    brotli = None
+
+# Niveles de subdirectorios (2 caracteres cada uno) para no juntar miles de
+# archivos en una sola carpeta: pedidos/3f/a2/3fa2...e9.jpg
+NIVELES = 2
+
+
+def _huella_sha256(contenido):
+    sha = hashlib.sha256()
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    for bloque in contenido.chunks():
+        sha.update(bloque)
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    return sha.hexdigest()
+
+
+class AlmacenamientoPorContenido(FileSystemStorage):
+    """
+    Guarda cada archivo con el SHA-256 de su contenido como nombre, dentro
+    de la carpeta pedida (upload_to). Dos subidas idénticas apuntan al
+    mismo archivo en disco: la segunda no escribe nada.
+
+    Borrar un archivo compartido es responsabilidad de pedidos/archivos.py,
+    que lleva la cuenta de referencias.
+    """
+
+    def __init__(self, **kwargs):
+        # Sobrescribir es seguro: mismo nombre implica mismo contenido
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def nombre_por_contenido(self, name, contenido):
+        carpeta = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        huella = _huella_sha256(contenido)
+        fragmentos = [huella[i * 2:i * 2 + 2] for i in range(NIVELES)]
+        return '/'.join(filter(None, [carpeta, *fragmentos, huella + extension]))
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        nombre = self.nombre_por_contenido(name, content)
+        if self.exists(nombre):
+            return nombre
+        return super().save(nombre, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre ya es único por contenido: nunca se agregan sufijos _xyz
+        return name
+
+
+def almacenamiento_pedidos():
+    """Storage de Pedido.imagen_referencia (STORAGES['pedidos'] en settings)."""
+    return storages['pedidos']
+
+
+# ==========================================
+# ESTÁTICOS CON HASH Y PRECOMPRIMIDOS
+# ==========================================
+
+def precomprimir(ruta):
+    """Escribe ruta.gz (y ruta.br si hay brotli) cuando achican el archivo."""
+    with open(ruta, 'rb') as archivo:
+        datos = archivo.read()
+    variantes = {'.gz': gzip.compress(datos, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes['.br'] = brotli.compress(datos, quality=11)
+    for extension, comprimido in variantes.items():
+        # Si casi no achica (ej: fuentes woff2) no vale la pena
+        if len(comprimido) < len(datos) * 0.95:
+            with open(ruta + extension, 'wb') as archivo:
+                archivo.write(comprimido)
+
+
+class EstaticosComprimidos(ManifestStaticFilesStorage):
+    """
+    collectstatic deja cada archivo con un hash de su contenido en el nombre
+    (se puede cachear un año: si cambia, cambia la URL) y, junto a los de
+    texto, copias .gz y .br para servirlas sin comprimir en cada petición
+    (ver EstaticosMiddleware).
+    """
+    COMPRIMIBLES = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.xml', '.eot', '.ttf')
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for nombre in set(self.hashed_files.values()):
+            if nombre.endswith(self.COMPRIMIBLES):
+                precomprimir(self.path(nombre))
+
+    def url(self, name, force=False):
+        # Sin manifiesto (desarrollo, tests o antes del primer collectstatic)
+        # se usan los nombres originales en vez de fallar en cada {% static %}
+        if not self.hashed_files and not force:
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force)
+
+    def inmutables(self):
+        """Nombres con hash publicados por el último collectstatic."""
+        return set(self.hashed_files.values())
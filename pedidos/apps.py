@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class PedidosConfig(AppConfig):
     name = "pedidos"
+
+    def ready(self):
+        # Registra los receptores de señales (contadores KPI, etc.) y los
+        # chequeos de sistema
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,71 @@
+"""
+Cuenta de referencias de las imágenes de pedidos.
+
+Con el almacenamiento por contenido varios pedidos pueden compartir un
+mismo archivo (duplicados, subidas repetidas). Cada cambio de imagen suma
+o resta en ArchivoMedia dentro de la transacción del pedido; al confirmar,
+los archivos que quedaron sin pedidos se borran del disco junto con sus
+variantes.
+"""
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .almacenamiento import almacenamiento_pedidos
+from .models import ArchivoMedia, Pedido
+
+
+def _sumar(nombre, delta, using):
+    actualizados = ArchivoMedia.objects.using(using).filter(nombre=nombre).update(
+        referencias=F('referencias') + delta
+    )
+    if actualizados or delta <= 0:
+        return
+
+    try:
+        with transaction.atomic(using=using):
+            ArchivoMedia.objects.using(using).create(nombre=nombre, referencias=delta)
+    except IntegrityError:
+        # Otra petición la creó en paralelo: basta con repetir el UPDATE
+        _sumar(nombre, delta, using)
+
+
+def registrar_cambio(anterior, nuevo, using=None, hash_anterior=None, cantidad=1):
+    """
+    `cantidad` pedidos dejaron de apuntar a `anterior` y pasaron a `nuevo`
+    (cualquiera de los dos puede ser vacío).
+    """
+    using = using or 'default'
+    if anterior == nuevo:
+        return
+    if nuevo:
+        _sumar(nuevo, cantidad, using)
+    if anterior:
+        _sumar(anterior, -cantidad, using)
+        transaction.on_commit(lambda: recolectar(anterior, hash_anterior, using=using), using=using)
+
+
+def recolectar(nombre, hash_imagen=None, using='default', borrar=True):
+    """
+    Borra `nombre` (y las variantes de `hash_imagen`) si ningún pedido los
+    usa. La tabla de pedidos manda: una cuenta desfasada no protege ni
+    condena un archivo. Devuelve la lista de archivos borrados (o que se
+    borrarían con borrar=False).
+    """
+    # Import local: imagenes.py usa este módulo al mover referencias
+    from . import imagenes
+
+    candidatos = []
+    original_libre = not Pedido.objects.using(using).filter(imagen_referencia=nombre).exists()
+    if original_libre:
+        candidatos.append((almacenamiento_pedidos(), nombre))
+    if hash_imagen and not Pedido.objects.using(using).filter(imagen_hash=hash_imagen).exists():
+        candidatos += [(default_storage, variante) for variante in imagenes.nombres_variantes(hash_imagen)]
+
+    existentes = [(storage, archivo) for storage, archivo in candidatos if storage.exists(archivo)]
+    if borrar:
+        if original_libre:
+            ArchivoMedia.objects.using(using).filter(nombre=nombre).delete()
+        for storage, archivo in existentes:
+            storage.delete(archivo)
+    return [archivo for _, archivo in existentes]
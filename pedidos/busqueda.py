@@ -0,0 +1,236 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from . import cache as cache_pedidos
+from .models import Cliente
+
+# Tablas FTS5 creadas por la migración 0006 (sincronizadas por triggers)
+TABLA_CLIENTES = 'pedidos_cliente_fts'
+TABLA_PEDIDOS = 'pedidos_pedido_fts'
+
+# Triggers de alta, cambio y baja de esas tablas (0006, recreados en 0008 y
+# 0011). Una migración que reconstruye la tabla en SQLite (AlterField,
+# AddField con default...) los borra sin aviso: ver pedidos/checks.py
+TRIGGERS_FTS = tuple(
+    f'pedidos_{tabla}_fts_{accion}' for tabla in ('cliente', 'pedido') for accion in ('ai', 'au', 'ad')
+)
+
+_disponible = {}
+
+# Cache en memoria del proceso para el autocompletado (muchas peticiones
+# seguidas con el mismo prefijo mientras el usuario escribe)
+MAX_AUTOCOMPLETADOS = 512
+_autocompletados = OrderedDict()
+_autocompletados_lock = threading.Lock()
+
+
+def fts_disponible(using='default'):
+    """
+    Indica si la base tiene las tablas FTS5. Si SQLite no trae FTS5 (u otro
+    motor) la búsqueda cae al comportamiento anterior con icontains.
+    """
+    if using not in _disponible:
+        conexion = connections[using]
+        if conexion.vendor != 'sqlite':
+            _disponible[using] = False
+        else:
+            with conexion.cursor() as cursor:
+                cursor.execute(
+                    "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN (%s, %s)",
+                    [TABLA_CLIENTES, TABLA_PEDIDOS],
+                )
+                _disponible[using] = cursor.fetchone()[0] == 2
+    return _disponible[using]
+
+
+def triggers_faltantes(using='default'):
+    """
+    Triggers de TRIGGERS_FTS que faltan en la base. Lista vacía si no hay
+    tablas FTS5 (no se usa fts_disponible: puede correr antes de migrar).
+    """
+    conexion = connections[using]
+    if conexion.vendor != 'sqlite':
+        return []
+    with conexion.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existentes = set(cursor.fetchall())
+    if not {('table', TABLA_CLIENTES), ('table', TABLA_PEDIDOS)} <= existentes:
+        return []
+    return [nombre for nombre in TRIGGERS_FTS if ('trigger', nombre) not in existentes]
+
+
+def consulta_fts(termino, telefono=True):
+    """
+    Traduce el texto del usuario a una expresión MATCH de FTS5: cada palabra
+    se busca como prefijo y todas deben aparecer. Si el texto mezcla palabras
+    y dígitos (y la tabla tiene columna `telefono`) también se prueba como
+    prefijo del teléfono normalizado. Devuelve None si no hay nada buscable.
+    """
+    palabras = re.findall(r'\w+', termino or '')
+    if not palabras:
+        return None
+
+    # Las comillas dobles evitan que el usuario inyecte sintaxis FTS5
+    expresion = ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+    digitos = re.sub(r'\D', '', termino)
+    if telefono and len(digitos) >= 3 and len(palabras) > 1:
+        expresion = f'({expresion}) OR telefono : "{digitos}"*'
+    return expresion
+
+
+def _sql_clientes():
+    return f"SELECT rowid FROM {TABLA_CLIENTES} WHERE {TABLA_CLIENTES} MATCH %s"
+
+
+def _sql_pedidos():
+    return f"SELECT rowid FROM {TABLA_PEDIDOS} WHERE {TABLA_PEDIDOS} MATCH %s"
+
+
+# ==========================================
+# FILTROS PARA LAS VISTAS
+# ==========================================
+
+def digitos_telefono(termino):
+    """
+    Si el texto parece un teléfono ('+56 9 1234', '5691234', '(9) 1234-5')
+    devuelve solo sus dígitos; si no, None.
+    """
+    if termino and re.fullmatch(r'[\d\s+\-().]+', termino):
+        digitos = re.sub(r'\D', '', termino)
+        if len(digitos) >= 3:
+            return digitos
+    return None
+
+
+def prefijo_telefono(digitos, campo='telefono_normalizado'):
+    """
+    Teléfonos normalizados que empiezan con `digitos`. Se expresa como rango
+    (>= '569', < '569:') y no como LIKE '569%': en SQLite el LIKE no usa el
+    índice porque no distingue mayúsculas, el rango sí.
+    """
+    return Q(**{f'{campo}__gte': digitos, f'{campo}__lt': digitos + ':'})
+
+
+def filtrar_clientes(queryset, termino):
+    digitos = digitos_telefono(termino)
+    if digitos:
+        return queryset.filter(prefijo_telefono(digitos))
+
+    expresion = consulta_fts(termino)
+    if expresion and fts_disponible(queryset.db):
+        return queryset.filter(pk__in=RawSQL(_sql_clientes(), [expresion]))
+
+    # Respaldo: comportamiento original con LIKE '%x%'
+    return queryset.filter(
+        Q(nombre__icontains=termino) |
+        Q(email__icontains=termino) |
+        Q(telefono__icontains=termino)
+    )
+
+
+def filtrar_pedidos(queryset, termino):
+    """
+    Pedidos cuyo cliente coincide (nombre, teléfono, email) o cuyo resumen
+    o detalle contiene el texto buscado.
+    """
+    digitos = digitos_telefono(termino)
+    expresion = consulta_fts(termino)
+    fts = expresion and fts_disponible(queryset.db)
+
+    if digitos:
+        # Teléfono por prefijo; los dígitos también pueden estar en el texto
+        # del pedido (ej: 'lote 4711')
+        filtro = prefijo_telefono(digitos, 'cliente__telefono_normalizado')
+        if fts:
+            filtro |= Q(pk__in=RawSQL(_sql_pedidos(), [consulta_fts(termino, telefono=False)]))
+        return queryset.filter(filtro)
+
+    if fts:
+        return queryset.filter(
+            Q(cliente_id__in=RawSQL(_sql_clientes(), [expresion])) |
+            Q(pk__in=RawSQL(_sql_pedidos(), [consulta_fts(termino, telefono=False)]))
+        )
+
+    return queryset.filter(
+        Q(cliente__nombre__icontains=termino) |
+        Q(cliente__telefono__icontains=termino)
+    )
+
+
+# ==========================================
+# IDS ORDENADOS POR RELEVANCIA
+# ==========================================
+
+def ids_clientes(termino, limite=20, using='default'):
+    """IDs de clientes ordenados por relevancia (bm25). Lista vacía si no hay FTS5."""
+    expresion = consulta_fts(termino)
+    if not expresion or not fts_disponible(using):
+        return []
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"{_sql_clientes()} ORDER BY rank LIMIT %s",
+            [expresion, limite],
+        )
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+# ==========================================
+# AUTOCOMPLETADO DE CLIENTES
+# ==========================================
+
+def _buscar_para_autocompletar(termino, limite, using):
+    clientes = Cliente.objects.using(using).only('id', 'nombre', 'telefono')
+    if not termino:
+        return list(clientes.order_by('nombre', 'id')[:limite])
+
+    digitos = digitos_telefono(termino)
+    if digitos:
+        return list(clientes.filter(prefijo_telefono(digitos)).order_by('telefono_normalizado', 'id')[:limite])
+
+    if fts_disponible(using):
+        ids = ids_clientes(termino, limite=limite, using=using)
+        encontrados = clientes.in_bulk(ids)
+        return [encontrados[pk] for pk in ids if pk in encontrados]
+
+    # Respaldo sin FTS5: prefijo del nombre
+    return list(clientes.filter(nombre__istartswith=termino).order_by('nombre', 'id')[:limite])
+
+
+def autocompletar_clientes(termino, limite=20, using='default'):
+    """
+    Clientes cuyo nombre o teléfono normalizado empieza con lo escrito,
+    en el formato de resultados de select2. Las respuestas se guardan unos
+    segundos en memoria del proceso, atadas a la versión del cache de
+    pedidos para que un cliente nuevo aparezca de inmediato.
+    """
+    termino = ' '.join((termino or '').split()).lower()
+    clave = (using, cache_pedidos.version_pedidos(using), termino, limite)
+    ahora = time.monotonic()
+
+    with _autocompletados_lock:
+        guardado = _autocompletados.get(clave)
+        if guardado and guardado[0] > ahora:
+            _autocompletados.move_to_end(clave)
+            return guardado[1]
+
+    resultados = [
+        {'id': cliente.pk, 'text': cliente.nombre, 'telefono': cliente.telefono}
+        for cliente in _buscar_para_autocompletar(termino, limite, using)
+    ]
+
+    ttl = getattr(settings, 'PEDIDOS_AUTOCOMPLETAR_TTL', 30)
+    with _autocompletados_lock:
+        _autocompletados[clave] = (ahora + ttl, resultados)
+        _autocompletados.move_to_end(clave)
+        while len(_autocompletados) > MAX_AUTOCOMPLETADOS:
+            _autocompletados.popitem(last=False)
+    return resultados
@@ -0,0 +1,130 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, F, Func, Max, Subquery
+
+from .models import Cliente, ContadorEstado, Pedido
+
+# La "versión" de pedidos se deduce de la BD, no de una clave del cache: con
+# el backend por proceso (locmem) cada worker la ve cambiar igual, sin
+# avisos entre procesos. Las entradas de versiones anteriores quedan huérfanas.
+PREFIJO_ESTADISTICAS = 'pedidos:cache:stats'
+
+
+def _cache():
+    return caches[getattr(settings, 'PEDIDOS_CACHE_ALIAS', 'default')]
+
+
+def _ttl():
+    return getattr(settings, 'PEDIDOS_CACHE_TTL', 300)
+
+
+def _ultima_modificacion(modelo, using):
+    return Subquery(modelo.objects.using(using).order_by('-actualizado_en').values('actualizado_en')[:1])
+
+
+def version_bd(using='default'):
+    """
+    (última modificación, partes) de todos los pedidos y clientes, en una
+    consulta: los MAX salen de los índices de actualizado_en y los totales
+    de la tabla de contadores y de la de clientes (un borrado no deja
+    rastro en las fechas). También es el ETag de las páginas de lectura.
+    """
+    total_pedidos = ContadorEstado.objects.using(using).order_by().annotate(
+        total=Func(F('cantidad'), function='SUM')
+    ).values('total')
+    # Sobre la tabla de clientes y no la de contadores: sin pedidos no hay
+    # filas de contadores y todas las partes saldrían NULL
+    version = Cliente.objects.using(using).aggregate(
+        # aggregate() solo acepta agregados: MAX de una subconsulta constante
+        total=Max(Subquery(total_pedidos)),
+        pedidos=Max(_ultima_modificacion(Pedido, using)),
+        clientes=Max(_ultima_modificacion(Cliente, using)),
+        total_clientes=Count('pk'),
+    )
+    fechas = [fecha for fecha in (version['pedidos'], version['clientes']) if fecha]
+    return max(fechas, default=None), tuple(version.values())
+
+
+def version_pedidos(using='default', version=None):
+    """
+    Huella corta de version_bd() (o de `version`, si la petición ya la leyó
+    para su ETag): la parte variable de las claves.
+    """
+    _, partes = version or version_bd(using)
+    return hashlib.md5(repr(partes).encode('utf-8')).hexdigest()[:12]
+
+
+def _clave(nombre, partes, version=None):
+    clave = f"pedidos:{nombre}:{version_pedidos(version=version)}"
+    if partes:
+        # Las partes pueden traer texto del usuario: se resumen en un hash
+        huella = hashlib.md5(repr(tuple(partes)).encode('utf-8')).hexdigest()
+        clave = f"{clave}:{huella}"
+    return clave
+
+
+def _contar(nombre, resultado):
+    cache = _cache()
+    clave = f"{PREFIJO_ESTADISTICAS}:{nombre}:{resultado}"
+    try:
+        cache.incr(clave)
+    except ValueError:
+        if not cache.add(clave, 1, timeout=None):
+            cache.incr(clave)
+
+
+def _buscar(nombre, partes, version=None):
+    """(clave, valor cacheado o None); cuenta el acierto o fallo."""
+    clave = _clave(nombre, partes, version)
+    valor = _cache().get(clave)
+    _contar(nombre, 'fallos' if valor is None else 'aciertos')
+    return clave, valor
+
+
+def obtener_o_calcular(nombre, calcular, partes=(), ttl=None, version=None):
+    """
+    Devuelve el valor cacheado para (nombre, partes) en la versión actual
+    de pedidos, o lo calcula con `calcular()` y lo guarda. Con `version`
+    (la de version_bd() ya leída para el ETag) no se vuelve a consultar:
+    el contenido sale de la misma versión que anuncia el ETag.
+    """
+    clave, valor = _buscar(nombre, partes, version)
+    if valor is None:
+        valor = calcular()
+        _cache().set(clave, valor, ttl if ttl is not None else _ttl())
+    return valor
+
+
+async def aobtener_o_calcular(nombre, calcular, partes=(), ttl=None, version=None):
+    """Como obtener_o_calcular, pero `calcular` es una corrutina (vistas async)."""
+    clave, valor = await sync_to_async(_buscar)(nombre, partes, version)
+    if valor is None:
+        valor = await calcular()
+        await _cache().aset(clave, valor, ttl if ttl is not None else _ttl())
+    return valor
+
+
+def estadisticas(nombres=('dashboard', 'trabajo_semanal', 'ranking_clientes')):
+    """Aciertos y fallos acumulados por cada entrada cacheada."""
+    cache = _cache()
+    claves = {
+        (nombre, resultado): f"{PREFIJO_ESTADISTICAS}:{nombre}:{resultado}"
+        for nombre in nombres
+        for resultado in ('aciertos', 'fallos')
+    }
+    valores = cache.get_many(list(claves.values()))
+
+    resumen = {'version': version_pedidos()}
+    for nombre in nombres:
+        aciertos = valores.get(claves[(nombre, 'aciertos')], 0)
+        fallos = valores.get(claves[(nombre, 'fallos')], 0)
+        total = aciertos + fallos
+        resumen[nombre] = {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_aciertos': round(aciertos / total, 3) if total else None,
+        }
+    return resumen
@@ -0,0 +1,26 @@
+from django.core.checks import Tags, Warning, register
+
+from . import busqueda
+
+
+@register(Tags.database)
+def triggers_busqueda(app_configs, databases=None, **kwargs):
+    """
+    Las tablas FTS5 se sincronizan con triggers de SQLite que una migración
+    que reconstruye la tabla borra sin aviso: la búsqueda dejaría de ver los
+    cambios. Es un aviso y no un error: migrate corre este chequeo antes de
+    aplicar las migraciones, que pueden ser justamente las que los recrean.
+    """
+    avisos = []
+    for alias in databases or ():
+        faltantes = busqueda.triggers_faltantes(alias)
+        if faltantes:
+            avisos.append(Warning(
+                f"Faltan triggers de búsqueda en la base '{alias}': {', '.join(faltantes)}.",
+                hint=(
+                    "Una migración reconstruyó pedidos_cliente o pedidos_pedido: "
+                    "recréalos en esa misma migración (ver 0011_actualizado_en)."
+                ),
+                id='pedidos.W001',
+            ))
+    return avisos
@@ -0,0 +1,50 @@
+"""
+CSS, JS y fuentes de terceros servidos desde el propio sitio.
+
+`manage.py construir_estaticos` descarga las versiones fijadas aquí a
+pedidos/static/pedidos/vendor/, compila el CSS de Tailwind (solo las clases
+que usan las plantillas, minificado) y corre collectstatic, que deja nombres
+con hash y copias .gz/.br (ver EstaticosComprimidos).
+
+Mientras esos archivos no existan las plantillas siguen usando los CDN.
+"""
+import functools
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+CSS_TAILWIND = 'pedidos/dist/app.css'
+CSS_FUENTES = 'pedidos/vendor/fuentes/fuentes.css'
+
+# Ruta dentro de static/ -> URL de origen. Los url(...) relativos de cada
+# CSS (ej: las fuentes de summernote) se descargan junto a él.
+ARCHIVOS = {
+    'pedidos/vendor/jquery/jquery-3.7.1.min.js': 'https://code.jquery.com/jquery-3.7.1.min.js',
+    'pedidos/vendor/select2/select2.min.css': 'https://cdn.jsdelivr.net/npm/select2@4.1.0-rc.0/dist/css/select2.min.css',
+    'pedidos/vendor/select2/select2.min.js': 'https://cdn.jsdelivr.net/npm/select2@4.1.0-rc.0/dist/js/select2.min.js',
+    'pedidos/vendor/summernote/summernote-lite.min.css': 'https://cdn.jsdelivr.net/npm/summernote@0.8.18/dist/summernote-lite.min.css',
+    'pedidos/vendor/summernote/summernote-lite.min.js': 'https://cdn.jsdelivr.net/npm/summernote@0.8.18/dist/summernote-lite.min.js',
+}
+
+# Hojas de Google Fonts: se guardan juntas en CSS_FUENTES, con sus .woff2
+FUENTES = [
+    'https://fonts.googleapis.com/css2?family=Bebas+Neue&family=Inter:wght@300;400;500;600;700&display=swap',
+    'https://fonts.googleapis.com/icon?family=Material+Icons+Round',
+]
+
+
+@functools.lru_cache(maxsize=None)
+def _construidos():
+    # Se revisa una vez por proceso: el build se hace antes de reiniciar
+    return all(finders.find(ruta) for ruta in [*ARCHIVOS, CSS_TAILWIND, CSS_FUENTES])
+
+
+def locales():
+    """
+    True si las plantillas deben usar los archivos propios. PEDIDOS_ESTATICOS:
+    'auto' (los propios si ya se construyeron), 'locales' o 'cdn'.
+    """
+    modo = getattr(settings, 'PEDIDOS_ESTATICOS', 'auto')
+    if modo == 'auto':
+        return _construidos()
+    return modo == 'locales'
@@ -0,0 +1,358 @@
+"""
+Cambios de pedidos en vivo (server-sent events).
+
+Cada alta, cambio o borrado de un pedido se publica, al confirmar la
+transacción, como un evento compacto (id, estado, valor_pendiente,
+fecha_entrega) en un canal en memoria del proceso. La vista
+`eventos_pedidos` lo reenvía a los navegadores suscritos (dashboard y
+trabajo semanal), que actualizan la página sin recargarla.
+
+El canal vive en cada proceso: un cambio hecho en otro worker no pasa por
+aquí. Para eso, mientras haya suscripciones, un hilo vigía por proceso
+revisa cada PEDIDOS_EVENTOS_REVISION segundos los pedidos con
+`actualizado_en` reciente (índice pedido_actualizado_idx) y publica los que
+aún no se vieron. La BD hace de intermediario: no hay broker externo.
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import ContadorEstado, Pedido
+
+logger = logging.getLogger(__name__)
+
+# Eventos recientes que se reenvían a quien se reconecta con Last-Event-ID
+HISTORIAL = 500
+# Eventos sin leer por suscripción; si se llena, el navegador refresca todo
+CAPACIDAD = 200
+# Milisegundos que espera EventSource antes de reconectarse
+RECONEXION_MS = 3000
+# El vigía vuelve a mirar este margen hacia atrás: una transacción que se
+# confirmó tarde no se pierde (los repetidos se descartan por clave)
+SOLAPE = timedelta(seconds=5)
+# Más cambios que esto en una revisión (ej: una importación): un refresco
+MAXIMO_POR_REVISION = 200
+
+ESTADOS = dict(Pedido.ESTADO_CHOICES)
+
+
+def formatear(tipo, datos, id_evento=None):
+    """Un mensaje SSE: `event`, `data` en JSON y, si lo hay, `id`."""
+    lineas = f'id: {id_evento}\n' if id_evento else ''
+    return f'{lineas}event: {tipo}\ndata: {json.dumps(datos, separators=(",", ":"))}\n\n'
+
+
+# Se perdieron eventos (reconexión fuera del historial, otro proceso, cola
+# llena): el navegador vuelve a pedir la página
+REFRESCAR = formatear('refrescar', {})
+LATIDO = ': latido\n\n'
+
+
+def evento_pedido(pk, estado, valor_pendiente=None, fecha_entrega=None):
+    """
+    Datos del evento de un pedido. Las operaciones masivas no leen cada fila:
+    publican solo lo que saben (ver operaciones.cambiar_estado).
+    """
+    evento = {'id': pk, 'estado': estado, 'etiqueta': ESTADOS.get(estado, estado)}
+    if valor_pendiente is not None:
+        evento['valor_pendiente'] = valor_pendiente
+    if fecha_entrega is not None:
+        evento['fecha_entrega'] = fecha_entrega.isoformat()
+    return evento
+
+
+# ==========================================
+# CANAL EN MEMORIA
+# ==========================================
+
+class Suscripcion:
+    """
+    Cola acotada de un navegador conectado. Con `loop` es una asyncio.Queue
+    (vista async); sin él, una queue.Queue que bloquea el hilo (vista síncrona).
+    """
+
+    def __init__(self, canal, loop=None, capacidad=CAPACIDAD):
+        self.canal = canal
+        self.loop = loop
+        self.cola = asyncio.Queue(capacidad) if loop else queue.Queue(capacidad)
+        self.desbordada = False
+
+    def entregar(self, mensaje):
+        if self.loop is None:
+            self.poner(mensaje)
+            return
+        # publicar() corre en el hilo que guardó el pedido, no en el del loop
+        try:
+            self.loop.call_soon_threadsafe(self.poner, mensaje)
+        except RuntimeError:
+            pass  # loop cerrado: la conexión ya terminó
+
+    def poner(self, mensaje):
+        try:
+            self.cola.put_nowait(mensaje)
+        except (asyncio.QueueFull, queue.Full):
+            self.desbordada = True
+
+    def esperar(self, segundos):
+        """Mensajes pendientes; espera hasta `segundos` al primero ([] si no llega)."""
+        try:
+            primero = self.cola.get(timeout=segundos)
+        except queue.Empty:
+            return []
+        return self._juntar(primero)
+
+    async def aesperar(self, segundos):
+        try:
+            primero = await asyncio.wait_for(self.cola.get(), segundos)
+        except asyncio.TimeoutError:
+            return []
+        return self._juntar(primero)
+
+    def _juntar(self, primero):
+        mensajes = [primero]
+        while True:
+            try:
+                mensajes.append(self.cola.get_nowait())
+            except (asyncio.QueueEmpty, queue.Empty):
+                break
+        if self.desbordada:
+            self.desbordada = False
+            return [REFRESCAR]
+        return mensajes
+
+    def cancelar(self):
+        self.canal.cancelar(self)
+
+
+class Canal:
+    """Publica eventos a todas las suscripciones del proceso."""
+
+    def __init__(self, historial=HISTORIAL):
+        # Los id llevan el prefijo del proceso: un Last-Event-ID de otro
+        # worker (o de antes de un reinicio) no se confunde con uno propio
+        self.prefijo = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._numero = 0
+        self._historial = deque(maxlen=historial)
+        self._claves = OrderedDict()
+        self._suscripciones = set()
+
+    def publicar(self, tipo, datos, clave=None):
+        """
+        Envía el evento a cada suscripción. Con `clave` (ej: pk y
+        actualizado_en) un evento ya publicado se descarta: así el vigía no
+        repite los cambios hechos en este mismo proceso.
+        """
+        with self._lock:
+            if clave is not None:
+                if clave in self._claves:
+                    return False
+                self._claves[clave] = None
+                if len(self._claves) > self._historial.maxlen:
+                    self._claves.popitem(last=False)
+            self._numero += 1
+            mensaje = formatear(tipo, datos, f'{self.prefijo}-{self._numero}')
+            self._historial.append((self._numero, mensaje))
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            suscripcion.entregar(mensaje)
+        return True
+
+    def ultimo_id(self):
+        return f'{self.prefijo}-{self._numero}'
+
+    def suscribir(self, ultimo_id=None, loop=None):
+        """
+        Nueva suscripción. Con `ultimo_id` (Last-Event-ID) recibe primero lo
+        publicado después de ese evento, o un refresco si ya no está.
+        """
+        suscripcion = Suscripcion(self, loop)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+            pendientes = self._pendientes(ultimo_id)
+        for mensaje in pendientes:
+            suscripcion.poner(mensaje)
+        return suscripcion
+
+    def _pendientes(self, ultimo_id):
+        if not ultimo_id:
+            return []
+        prefijo, _, numero = ultimo_id.partition('-')
+        if prefijo != self.prefijo or not numero.isdigit() or int(numero) > self._numero:
+            return [REFRESCAR]
+        numero = int(numero)
+        primero = self._historial[0][0] if self._historial else self._numero + 1
+        if numero < primero - 1:
+            return [REFRESCAR]
+        return [mensaje for n, mensaje in self._historial if n > numero]
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def suscriptores(self):
+        return len(self._suscripciones)
+
+
+canal = Canal()
+
+
+def publicar_pedido(pedido):
+    canal.publicar(
+        'pedido',
+        evento_pedido(pedido.pk, pedido.estado, pedido.valor_pendiente, pedido.fecha_entrega),
+        clave=(pedido.pk, pedido.actualizado_en),
+    )
+
+
+def publicar_cambio_masivo(ids, estado, valor_pendiente, actualizado_en):
+    for pk in set(ids):
+        canal.publicar(
+            'pedido', evento_pedido(pk, estado, valor_pendiente), clave=(pk, actualizado_en)
+        )
+
+
+def publicar_eliminados(ids):
+    for pk in set(ids):
+        canal.publicar('pedido', {'id': pk, 'eliminado': True})
+
+
+def publicar_refresco():
+    """Muchos cambios de una vez (ej: una importación): un solo aviso."""
+    canal.publicar('refrescar', {})
+
+
+# ==========================================
+# CAMBIOS DE OTROS PROCESOS
+# ==========================================
+
+class Vigia:
+    """
+    Hilo que publica los cambios hechos por otros procesos. Corre solo
+    mientras el canal tenga suscripciones: cuesta dos consultas por
+    revisión, no por navegador conectado.
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+        self.marca = None
+        self.total = None
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def asegurar(self):
+        intervalo = settings.PEDIDOS_EVENTOS_REVISION
+        if not intervalo:
+            return
+        with self._lock:
+            if self._hilo is None:
+                self.marca, self.total = timezone.now(), None
+                self._hilo = threading.Thread(
+                    target=self._correr, args=(intervalo,), name='pedidos-eventos', daemon=True
+                )
+                self._hilo.start()
+
+    def _correr(self, intervalo):
+        try:
+            while True:
+                time.sleep(intervalo)
+                # Bajo el lock: una suscripción nueva ve el hilo vivo o lo arranca
+                with self._lock:
+                    if not canal.suscriptores():
+                        self._hilo = None
+                        return
+                close_old_connections()
+                try:
+                    self.revisar()
+                except DatabaseError:
+                    logger.exception('No se pudieron revisar los cambios de pedidos')
+        finally:
+            connections.close_all()
+            with self._lock:
+                if self._hilo is threading.current_thread():
+                    self._hilo = None
+
+    def _total(self):
+        return (
+            ContadorEstado.objects.using(self.using).aggregate(total=Sum('cantidad'))['total'] or 0
+        )
+
+    def revisar(self):
+        """Publica los pedidos modificados desde la revisión anterior."""
+        ahora = timezone.now()
+        if self.marca is None:
+            self.marca = ahora
+        filas = list(
+            Pedido.objects.using(self.using)
+            .filter(actualizado_en__gt=self.marca - SOLAPE)
+            .order_by('actualizado_en')
+            .values_list(
+                'pk', 'estado', 'valor_venta', 'valor_abonado', 'fecha_entrega', 'actualizado_en'
+            )[:MAXIMO_POR_REVISION + 1]
+        )
+        if len(filas) > MAXIMO_POR_REVISION:
+            publicar_refresco()
+            self.marca = ahora
+        else:
+            for pk, estado, venta, abonado, entrega, actualizado in filas:
+                canal.publicar(
+                    'pedido', evento_pedido(pk, estado, venta - abonado, entrega),
+                    clave=(pk, actualizado),
+                )
+                self.marca = max(self.marca, actualizado)
+
+        # Un borrado no deja fila que mirar: se nota en los contadores
+        total = self._total()
+        if self.total is not None and total < self.total:
+            publicar_refresco()
+        self.total = total
+
+
+vigia = Vigia()
+
+
+# ==========================================
+# CUERPO DE LA RESPUESTA SSE
+# ==========================================
+
+def suscribir(ultimo_id=None, loop=None):
+    suscripcion = canal.suscribir(ultimo_id, loop)
+    vigia.asegurar()
+    return suscripcion
+
+
+def flujo(ultimo_id, latido, duracion):
+    """
+    Eventos para la vista síncrona. Termina a los `duracion` segundos: en
+    WSGI cada conexión ocupa un hilo y EventSource se reconecta solo.
+    """
+    suscripcion = suscribir(ultimo_id)
+    try:
+        yield f'retry: {RECONEXION_MS}\n\n'
+        limite = time.monotonic() + duracion
+        while (restante := limite - time.monotonic()) > 0:
+            yield ''.join(suscripcion.esperar(min(latido, restante))) or LATIDO
+    finally:
+        suscripcion.cancelar()
+
+
+async def aflujo(ultimo_id, latido):
+    """Eventos para la vista async: dura lo que dure la conexión."""
+    suscripcion = suscribir(ultimo_id, asyncio.get_running_loop())
+    try:
+        yield f'retry: {RECONEXION_MS}\n\n'
+        while True:
+            yield ''.join(await suscripcion.aesperar(latido)) or LATIDO
+    finally:
+        suscripcion.cancelar()
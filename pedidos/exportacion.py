@@ -0,0 +1,242 @@
+"""
+Exportación de pedidos y clientes a CSV y XLSX en flujo.
+
+Las filas se leen con .iterator(chunk_size=...) y se escriben por bloques:
+la memoria usada no depende de cuántas filas tenga la exportación.
+"""
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+
+TAMANO_BLOQUE = 2000
+
+COLUMNAS_PEDIDOS = [
+    ('ID', 'id'),
+    ('Cliente', 'cliente__nombre'),
+    ('Teléfono', 'cliente__telefono'),
+    ('Resumen', 'resumen_pedido'),
+    ('Estado', 'estado'),
+    ('Valor Venta', 'valor_venta'),
+    ('Valor Abonado', 'valor_abonado'),
+    ('Valor Pendiente', 'pendiente'),
+    ('Fecha Solicitud', 'fecha_solicitud'),
+    ('Fecha Entrega', 'fecha_entrega'),
+]
+
+COLUMNAS_CLIENTES = [
+    ('ID', 'id'),
+    ('Nombre', 'nombre'),
+    ('Teléfono', 'telefono'),
+    ('Email', 'email'),
+    ('Pedidos', 'total_pedidos'),
+    ('Total Venta', 'total_venta'),
+    ('Total Pendiente', 'total_pendiente'),
+]
+
+
+# ==========================================
+# FILAS
+# ==========================================
+
+def filas_pedidos(queryset, chunk_size=TAMANO_BLOQUE):
+    """Tuplas con COLUMNAS_PEDIDOS, sin instanciar modelos."""
+    campos = [campo for _, campo in COLUMNAS_PEDIDOS]
+    return (
+        queryset.select_related(None)
+        .annotate(pendiente=F('valor_venta') - F('valor_abonado'))
+        .values_list(*campos)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def filas_clientes(queryset, chunk_size=TAMANO_BLOQUE):
+    """Tuplas con COLUMNAS_CLIENTES; los totales salen del contador por cliente."""
+    campos = [campo for _, campo in COLUMNAS_CLIENTES]
+    return (
+        queryset.annotate(
+            total_pedidos=Coalesce('contador__cantidad', Value(0)),
+            total_venta=Coalesce('contador__total_venta', Value(0)),
+            total_pendiente=Coalesce('contador__total_pendiente', Value(0)),
+        )
+        .values_list(*campos)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+# Un texto que empieza así se evalúa como fórmula al abrirlo en una
+# planilla (inyección de fórmulas): se le antepone un apóstrofo
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def quitar_escape_formula(texto):
+    """Lo inverso de _texto para la importación: un archivo exportado vuelve igual."""
+    if texto.startswith("'") and texto[1:].startswith(INICIO_FORMULA):
+        return texto[1:]
+    return texto
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat(sep=' ', timespec='seconds') if hasattr(valor, 'hour') else valor.isoformat()
+    if isinstance(valor, str):
+        # Solo el texto ingresado: los números negativos quedan como números
+        return f"'{valor}" if valor.startswith(INICIO_FORMULA) else valor
+    return str(valor)
+
+
+# ==========================================
+# CSV
+# ==========================================
+
+class _Eco:
+    """Pseudo-archivo: csv.writer devuelve lo escrito en vez de guardarlo."""
+
+    def write(self, valor):
+        return valor
+
+
+def csv_en_flujo(encabezados, filas, bloque=500):
+    escritor = csv.writer(_Eco())
+    # BOM: Excel reconoce el archivo como UTF-8 (tildes y ñ)
+    yield '\ufeff' + escritor.writerow(encabezados)
+
+    pendientes = []
+    for fila in filas:
+        pendientes.append(escritor.writerow([_texto(valor) for valor in fila]))
+        if len(pendientes) >= bloque:
+            yield ''.join(pendientes)
+            pendientes = []
+    if pendientes:
+        yield ''.join(pendientes)
+
+
+# ==========================================
+# XLSX (OOXML mínimo escrito a mano)
+# ==========================================
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_HOJA_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_HOJA_FIN = '</sheetData></worksheet>'
+
+# Caracteres de control que XML 1.0 no admite
+_NO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Tubo:
+    """Destino de escritura del zip: acumula bytes hasta que se retiran."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def _celda(valor):
+    if isinstance(valor, bool) or valor is None:
+        valor = _texto(valor)
+    if isinstance(valor, (int, float)):
+        return f'<c t="n"><v>{valor}</v></c>'
+    texto = escape(_NO_XML.sub('', _texto(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(valores):
+    return '<row>' + ''.join(_celda(valor) for valor in valores) + '</row>'
+
+
+def xlsx_en_flujo(encabezados, filas, hoja='Datos', bloque=500):
+    """
+    Genera un .xlsx por partes. El zip se escribe sobre un destino sin
+    seek (zipfile usa descriptores de datos), así nunca se arma el archivo
+    completo en memoria.
+    """
+    tubo = _Tubo()
+    with zipfile.ZipFile(tubo, 'w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        archivo.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archivo.writestr('_rels/.rels', _RELS)
+        archivo.writestr('xl/workbook.xml', _WORKBOOK.format(hoja=escape(hoja)))
+        archivo.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        yield tubo.retirar()
+
+        with archivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as destino:
+            destino.write((_HOJA_INICIO + _fila_xml(encabezados)).encode('utf-8'))
+            pendientes = []
+            for fila in filas:
+                pendientes.append(_fila_xml(fila))
+                if len(pendientes) >= bloque:
+                    destino.write(''.join(pendientes).encode('utf-8'))
+                    pendientes = []
+                    yield tubo.retirar()
+            destino.write((''.join(pendientes) + _HOJA_FIN).encode('utf-8'))
+    yield tubo.retirar()
+
+
+FORMATOS = {
+    'csv': (csv_en_flujo, 'text/csv; charset=utf-8'),
+    'xlsx': (xlsx_en_flujo, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+async def en_flujo_async(partes):
+    """
+    Adapta un generador de partes (csv_en_flujo, xlsx_en_flujo) para ASGI.
+    Django junta en memoria un iterador síncrono antes de enviarlo por ASGI;
+    aquí cada parte se pide con sync_to_async, en el hilo de la petición,
+    que es donde vive el cursor de la consulta.
+    """
+    siguiente = sync_to_async(next)
+    while (parte := await siguiente(partes, None)) is not None:
+        yield parte
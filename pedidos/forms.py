@@ -1,6 +1,29 @@
 from django import forms
+from django.urls import reverse_lazy
 from .models import Pedido, Cliente
 
+
+def error_abono(valor_venta, valor_abonado):
+    """Mensaje de error si el abono supera el total del pedido (None si cuadra)."""
+    if valor_venta is not None and valor_abonado is not None and valor_abonado > valor_venta:
+        return 'El abono no puede ser mayor al valor total del pedido.'
+    return None
+
+
+class SelectClienteAjax(forms.Select):
+    """
+    Select de clientes que solo renderiza la opción elegida (si hay una).
+    El resto llega por AJAX desde api_buscar_clientes, así el formulario
+    pesa lo mismo con 10 o con 100.000 clientes.
+    """
+
+    def optgroups(self, name, value, attrs=None):
+        ids = [v for v in value if str(v).isdigit()]
+        self.choices = [('', '')] + [
+            (cliente.pk, str(cliente)) for cliente in Cliente.objects.filter(pk__in=ids)
+        ]
+        return super().optgroups(name, value, attrs)
+
 class ClienteForm(forms.ModelForm):
     class Meta:
         model = Cliente
@@ -21,7 +44,11 @@ class PedidoForm(forms.ModelForm):
         fields = ['cliente', 'resumen_pedido', 'detalles_pedido', 'valor_venta', 'valor_abonado', 'fecha_entrega', 'imagen_referencia']
         widgets = {
             'fecha_entrega': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
-            'cliente': forms.Select(attrs={'class': 'form-select select2', 'data-placeholder': 'Busque un cliente...'}),
+            'cliente': SelectClienteAjax(attrs={
+                'class': 'form-select select2',
+                'data-placeholder': 'Busque un cliente...',
+                'data-autocompletar': reverse_lazy('api_buscar_clientes'),
+            }),
             'resumen_pedido': forms.TextInput(attrs={'class': 'form-control'}),
             'detalles_pedido': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'valor_venta': forms.NumberInput(attrs={'class': 'form-control'}),
@@ -35,9 +62,9 @@ class PedidoForm(forms.ModelForm):
         valor_venta = cleaned_data.get('valor_venta')
         valor_abonado = cleaned_data.get('valor_abonado')
 
-        # Validar que el abono no supere el total
-        if valor_venta is not None and valor_abonado is not None:
-            if valor_abonado > valor_venta:
-                self.add_error('valor_abonado', 'El abono no puede ser mayor al valor total del pedido.')
+        # Validar que el abono no supere el total (misma regla que `importar`)
+        error = error_abono(valor_venta, valor_abonado)
+        if error:
+            self.add_error('valor_abonado', error)
 
         return cleaned_data
\ No newline at end of file
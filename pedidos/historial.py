@@ -0,0 +1,139 @@
+"""
+Historial de pedidos (PedidoEvento): una fila por alta, cambio de estado o
+de montos y borrado, escrita en la misma transacción que el cambio.
+
+Un guardado suelto (vistas, admin) pasa por las señales de
+pedidos/signals.py y agrega una fila. Las operaciones masivas escriben las
+filas de todo el lote con un solo INSERT ... SELECT antes del UPDATE o
+DELETE (los valores anteriores no viajan a Python) y la importación con un
+bulk_create por lote.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connections
+from django.utils import timezone
+
+from . import registro
+from .models import PedidoEvento
+
+
+def usuario_actual():
+    """pk del usuario de la petición en curso (None fuera de una petición o si es anónimo)."""
+    request = registro.peticion_actual.get()
+    usuario = getattr(request, 'user', None)
+    if usuario is None or not usuario.is_authenticated:
+        return None
+    return usuario.pk
+
+
+def registrar(pk, anterior, nuevo, using=None):
+    """
+    Agrega la fila del pedido `pk` si cambió algo que se registra.
+    `anterior` y `nuevo` son dicts con estado, valor_venta y valor_abonado;
+    `anterior` es None al crear y `nuevo` es None al eliminar.
+    """
+    vacio = {'estado': None, 'valor_venta': 0, 'valor_abonado': 0}
+    antes, despues = anterior or vacio, nuevo or vacio
+    evento = PedidoEvento(
+        pedido_id=pk,
+        usuario_id=usuario_actual(),
+        estado_anterior=antes['estado'],
+        estado_nuevo=despues['estado'],
+        delta_venta=despues['valor_venta'] - antes['valor_venta'],
+        delta_abonado=despues['valor_abonado'] - antes['valor_abonado'],
+    )
+    sin_cambios = (
+        anterior is not None and nuevo is not None
+        and evento.estado_anterior == evento.estado_nuevo
+        and not evento.delta_venta and not evento.delta_abonado
+    )
+    if not sin_cambios:
+        evento.save(using=using)
+
+
+def registrar_altas(pedidos, using=None):
+    """Filas de pedidos recién creados con bulk_create (importación)."""
+    usuario = usuario_actual()
+    PedidoEvento.objects.using(using).bulk_create([
+        PedidoEvento(
+            pedido_id=pedido.pk, usuario_id=usuario, estado_nuevo=pedido.estado,
+            delta_venta=pedido.valor_venta, delta_abonado=pedido.valor_abonado,
+        )
+        for pedido in pedidos
+    ])
+
+
+# ==========================================
+# LOTES (INSERT ... SELECT)
+# ==========================================
+
+def _insertar_desde(pedidos, columnas, params, condicion='', params_condicion=(), using='default'):
+    """
+    Una fila por pedido del queryset `pedidos`, calculada en la BD.
+    `columnas` son las expresiones SQL de estado_anterior, estado_nuevo,
+    delta_venta y delta_abonado sobre la tabla de pedidos.
+    """
+    connection = connections[using]
+    ops = connection.ops
+    subconsulta, params_subconsulta = pedidos.order_by().values('pk').query.sql_with_params()
+    sql = (
+        f"INSERT INTO {ops.quote_name(PedidoEvento._meta.db_table)} "
+        "(pedido_id, usuario_id, creado_en, estado_anterior, estado_nuevo, delta_venta, delta_abonado) "
+        f"SELECT id, %s, %s, {columnas} FROM {ops.quote_name(pedidos.model._meta.db_table)} "
+        f"WHERE id IN ({subconsulta}){condicion}"
+    )
+    fecha = ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [usuario_actual(), fecha, *params, *params_subconsulta, *params_condicion])
+
+
+def registrar_cambio_estado(pedidos, nuevo_estado, terminado, using='default'):
+    """
+    Antes del UPDATE de operaciones.cambiar_estado: una fila por pedido que
+    cambia de estado o, si se termina, cuyo abono sube al total.
+    """
+    if terminado:
+        columnas = 'estado, %s, 0, valor_venta - valor_abonado'
+        condicion = ' AND (estado <> %s OR valor_abonado <> valor_venta)'
+    else:
+        columnas, condicion = 'estado, %s, 0, 0', ' AND estado <> %s'
+    _insertar_desde(pedidos, columnas, [nuevo_estado], condicion, [nuevo_estado], using=using)
+
+
+def registrar_eliminacion(pedidos, using='default'):
+    """Antes del DELETE de operaciones.eliminar: lo que cada pedido tenía."""
+    _insertar_desde(pedidos, 'estado, NULL, -valor_venta, -valor_abonado', [], using=using)
+
+
+# ==========================================
+# LECTURA
+# ==========================================
+
+def tiempo_por_estado(pedido, hasta=None):
+    """
+    Cuánto tiempo pasó el pedido en cada estado según su historial, hasta
+    ahora (o `hasta`). Se cuenta desde fecha_solicitud; un pedido anterior
+    al historial empieza en el estado_anterior de su primer evento.
+    """
+    hasta = hasta or timezone.now()
+    eventos = list(pedido.eventos.order_by('creado_en', 'id').values_list(
+        'creado_en', 'estado_anterior', 'estado_nuevo'
+    ))
+    if not eventos:
+        estado = pedido.estado
+    elif eventos[0][1] is None:
+        estado = eventos[0][2]
+    else:
+        estado = eventos[0][1]
+
+    tiempos = defaultdict(timedelta)
+    desde = pedido.fecha_solicitud
+    for creado_en, anterior, nuevo in eventos:
+        if anterior is None or anterior == nuevo:
+            continue
+        tiempos[estado] += creado_en - desde
+        desde, estado = creado_en, nuevo
+    if estado is not None:
+        tiempos[estado] += hasta - desde
+    return dict(tiempos)
@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import archivos
+from .models import Pedido
+
+logger = logging.getLogger(__name__)
+
+# Lado máximo (px) con que se guarda la imagen original
+MAX_LADO = 2560
+
+# Anchos de las variantes para srcset y formatos en que se generan
+ANCHOS = {'mini': 320, 'media': 960}
+FORMATOS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+CALIDAD = {'WEBP': 80, 'JPEG': 82}
+
+CARPETA_VARIANTES = 'pedidos/variantes'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# ==========================================
+# NOMBRES (DERIVADOS DEL CONTENIDO)
+# ==========================================
+
+def huella(datos):
+    """Hash corto del contenido: mismo archivo, mismos nombres."""
+    return hashlib.sha256(datos).hexdigest()[:16]
+
+
+def nombre_variante(huella_imagen, ancho, extension):
+    return f"{CARPETA_VARIANTES}/{huella_imagen}-{ancho}.{extension}"
+
+
+def nombres_variantes(huella_imagen):
+    return [
+        nombre_variante(huella_imagen, ancho, extension)
+        for ancho in ANCHOS.values()
+        for extension in FORMATOS
+    ]
+
+
+def variantes(pedido, extension='webp'):
+    """[(url, ancho), ...] de las variantes del pedido; vacío si aún no se procesa."""
+    if not pedido.imagen_referencia or not pedido.imagen_hash:
+        return []
+    # Las variantes ya llevan la huella en el nombre: van al storage por
+    # defecto, con nombres predecibles para armar el srcset
+    return [
+        (default_storage.url(nombre_variante(pedido.imagen_hash, ancho, extension)), ancho)
+        for ancho in sorted(ANCHOS.values())
+    ]
+
+
+# ==========================================
+# PROCESAMIENTO
+# ==========================================
+
+def _codificar(imagen, formato):
+    # Sin exif= ni info=: Pillow no copia metadatos (GPS, cámara, etc.)
+    salida = BytesIO()
+    if formato == 'JPEG' and imagen.mode != 'RGB':
+        fondo = Image.new('RGB', imagen.size, 'white')
+        fondo.paste(imagen, mask=imagen.getchannel('A') if 'A' in imagen.getbands() else None)
+        imagen = fondo
+    imagen.save(salida, formato, quality=CALIDAD.get(formato, 85), optimize=True)
+    return salida.getvalue()
+
+
+def _guardar_variante(nombre, datos):
+    # El nombre depende del contenido: si ya existe es el mismo archivo
+    if not default_storage.exists(nombre):
+        default_storage.save(nombre, ContentFile(datos))
+
+
+def generar(datos, storage):
+    """
+    Normaliza la imagen (orientación EXIF aplicada, lado máximo MAX_LADO,
+    sin metadatos) y genera sus variantes WebP/JPEG. Devuelve
+    (huella, nombre del original normalizado).
+    """
+    huella_imagen = huella(datos)
+
+    imagen = Image.open(BytesIO(datos))
+    imagen = ImageOps.exif_transpose(imagen)
+    con_transparencia = 'A' in imagen.getbands() or 'transparency' in imagen.info
+    imagen = imagen.convert('RGBA' if con_transparencia else 'RGB')
+    imagen.thumbnail((MAX_LADO, MAX_LADO), Image.LANCZOS)
+
+    # El storage de pedidos nombra el archivo por su contenido
+    formato_original, extension = ('PNG', 'png') if con_transparencia else ('JPEG', 'jpg')
+    nombre_original = storage.save(
+        f"pedidos/{huella_imagen}.{extension}", ContentFile(_codificar(imagen, formato_original))
+    )
+
+    for ancho in ANCHOS.values():
+        copia = imagen
+        if imagen.width > ancho:
+            copia = imagen.resize((ancho, max(1, round(imagen.height * ancho / imagen.width))), Image.LANCZOS)
+        for extension, formato in FORMATOS.items():
+            _guardar_variante(nombre_variante(huella_imagen, ancho, extension), _codificar(copia, formato))
+
+    return huella_imagen, nombre_original
+
+
+def procesar_pedido(pk, using='default'):
+    """
+    Procesa la imagen actual del pedido y apunta a la versión normalizada
+    todos los pedidos que compartían el archivo subido (ej: duplicados).
+    Devuelve la huella o None si no había nada que procesar.
+    """
+    pedido = Pedido.objects.using(using).only('pk', 'imagen_referencia', 'imagen_hash').filter(pk=pk).first()
+    if pedido is None or not pedido.imagen_referencia:
+        return None
+
+    archivo = pedido.imagen_referencia
+    nombre_subido = archivo.name
+    with archivo.storage.open(nombre_subido, 'rb') as entrada:
+        datos = entrada.read()
+
+    huella_imagen, nombre_final = generar(datos, archivo.storage)
+
+    # Si otro usuario cambió la imagen mientras tanto, no se pisa
+    with transaction.atomic(using=using):
+        movidos = Pedido.objects.using(using).filter(imagen_referencia=nombre_subido).update(
+            imagen_referencia=nombre_final, imagen_hash=huella_imagen, actualizado_en=timezone.now()
+        )
+        # Sin señales (es un UPDATE): la cuenta de referencias se mueve aquí
+        archivos.registrar_cambio(nombre_subido, nombre_final, using=using, cantidad=movidos)
+    return huella_imagen
+
+
+# ==========================================
+# COLA EN SEGUNDO PLANO
+# ==========================================
+
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PEDIDOS_IMAGENES_HILOS', 2),
+                thread_name_prefix='imagenes',
+            )
+        return _pool
+
+
+def _tarea(pk, using):
+    try:
+        procesar_pedido(pk, using=using)
+    except Exception:
+        logger.exception("No se pudo procesar la imagen del pedido %s", pk)
+    finally:
+        # Cada hilo abre su propia conexión: se cierra al terminar
+        connections.close_all()
+
+
+def encolar(pk, using='default'):
+    """
+    Procesa la imagen del pedido en el pool de hilos (o en línea si
+    PEDIDOS_IMAGENES_ASINCRONO es False, útil en pruebas).
+    """
+    if not getattr(settings, 'PEDIDOS_IMAGENES_ASINCRONO', True):
+        return procesar_pedido(pk, using=using)
+    return _obtener_pool().submit(_tarea, pk, using)
@@ -0,0 +1,274 @@
+"""
+Importación masiva de clientes y pedidos desde CSV o JSONL.
+
+El archivo se lee fila a fila y se escribe por lotes con bulk_create, cada
+lote en su propia transacción. bulk_create no dispara señales, así que lo
+que ellas harían (contadores KPI, historial) se hace aquí por lote;
+el índice FTS5 se mantiene solo porque sus triggers corren en cada INSERT.
+"""
+import csv
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import eventos, historial, kpis
+from .exportacion import quitar_escape_formula
+from .forms import error_abono
+from .models import Cliente, Pedido, normalizar_telefono
+
+TAMANO_LOTE = 1000
+
+# Nombre de columna aceptado -> campo. Incluye los encabezados que genera
+# la exportación, así un archivo exportado se puede volver a importar.
+COLUMNAS = {
+    'nombre': 'nombre',
+    'cliente': 'nombre',
+    'telefono': 'telefono',
+    'teléfono': 'telefono',
+    'email': 'email',
+    'resumen_pedido': 'resumen_pedido',
+    'resumen': 'resumen_pedido',
+    'detalles_pedido': 'detalles_pedido',
+    'detalles': 'detalles_pedido',
+    'estado': 'estado',
+    'valor_venta': 'valor_venta',
+    'valor venta': 'valor_venta',
+    'valor_abonado': 'valor_abonado',
+    'valor abonado': 'valor_abonado',
+    'fecha_entrega': 'fecha_entrega',
+    'fecha entrega': 'fecha_entrega',
+    'fecha_solicitud': 'fecha_solicitud',
+    'fecha solicitud': 'fecha_solicitud',
+}
+CAMPOS_PEDIDO = ('resumen_pedido', 'detalles_pedido', 'valor_venta', 'valor_abonado', 'fecha_entrega')
+
+
+# ==========================================
+# LECTURA
+# ==========================================
+
+def leer_csv(archivo):
+    """(número de línea, dict) por fila; la primera fila son los encabezados."""
+    lector = csv.DictReader(archivo)
+    for fila in lector:
+        yield lector.line_num, fila
+
+
+def leer_jsonl(archivo):
+    for numero, linea in enumerate(archivo, start=1):
+        if not linea.strip():
+            continue
+        try:
+            datos = json.loads(linea)
+        except ValueError as error:
+            datos = {'_error': f'JSON inválido: {error}'}
+        if not isinstance(datos, dict):
+            datos = {'_error': 'Cada línea debe ser un objeto JSON.'}
+        yield numero, datos
+
+
+LECTORES = {'csv': leer_csv, 'jsonl': leer_jsonl}
+
+
+# ==========================================
+# VALIDACIÓN
+# ==========================================
+
+def _normalizar_fila(datos):
+    fila = {}
+    for clave, valor in datos.items():
+        campo = COLUMNAS.get(str(clave).strip().lower())
+        if campo is None:
+            continue
+        if isinstance(valor, str):
+            valor = quitar_escape_formula(valor.strip())
+        fila[campo] = valor
+    return fila
+
+
+def _fecha_solicitud(valor):
+    if valor in (None, ''):
+        return None
+    fecha = parse_datetime(str(valor))
+    if fecha is None:
+        dia = parse_date(str(valor))
+        if dia is None:
+            raise ValidationError('Fecha inválida.')
+        fecha = datetime.datetime.combine(dia, datetime.time())
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def validar_fila(datos):
+    """
+    Devuelve (cliente, pedido) sin guardar; `pedido` es None si la fila solo
+    trae datos del cliente. Lanza ValidationError con los errores por campo.
+    Se usan las validaciones de los campos del modelo y la misma regla de
+    PedidoForm.clean (abono <= venta).
+    """
+    if '_error' in datos:
+        raise ValidationError(datos['_error'])
+    fila = _normalizar_fila(datos)
+    errores = {}
+
+    cliente = Cliente(nombre=fila.get('nombre', ''), telefono=fila.get('telefono', ''), email=fila.get('email') or None)
+    cliente.telefono_normalizado = normalizar_telefono(cliente.telefono)
+    try:
+        cliente.clean_fields()
+    except ValidationError as error:
+        errores.update(error.message_dict)
+    if cliente.telefono and not cliente.telefono_normalizado:
+        errores.setdefault('telefono', []).append('El teléfono no tiene dígitos.')
+
+    pedido = None
+    if any(fila.get(campo) not in (None, '') for campo in CAMPOS_PEDIDO):
+        pedido = Pedido(
+            resumen_pedido=fila.get('resumen_pedido', ''),
+            # La exportación no trae el detalle: se usa el resumen
+            detalles_pedido=fila.get('detalles_pedido') or fila.get('resumen_pedido', ''),
+            estado=str(fila.get('estado') or 'PENDIENTE').upper(),
+            valor_venta=fila.get('valor_venta'),
+            valor_abonado=fila.get('valor_abonado') or 0,
+            fecha_entrega=fila.get('fecha_entrega'),
+        )
+        try:
+            pedido.clean_fields(exclude=['cliente', 'fecha_solicitud', 'imagen_referencia', 'imagen_hash'])
+        except ValidationError as error:
+            errores.update(error.message_dict)
+        else:
+            error = error_abono(pedido.valor_venta, pedido.valor_abonado)
+            if error:
+                errores['valor_abonado'] = [error]
+        try:
+            pedido._fecha_importada = _fecha_solicitud(fila.get('fecha_solicitud'))
+        except ValidationError as error:
+            errores['fecha_solicitud'] = error.messages
+
+    if errores:
+        raise ValidationError(errores)
+    return cliente, pedido
+
+
+def describir_error(error):
+    if hasattr(error, 'error_dict'):
+        return '; '.join(f"{campo}: {' '.join(mensajes)}" for campo, mensajes in error.message_dict.items())
+    return ' '.join(error.messages)
+
+
+# ==========================================
+# ESCRITURA POR LOTES
+# ==========================================
+
+class Importador:
+    """
+    Valida y guarda filas por lotes. Los clientes se deduplican por
+    teléfono normalizado, contra la base y dentro del mismo archivo: la
+    primera aparición define nombre y email, y un cliente existente no se
+    modifica.
+    """
+
+    def __init__(self, using='default', lote=TAMANO_LOTE, simular=False, al_rechazar=None):
+        self.using = using
+        self.lote = lote
+        self.simular = simular
+        self.al_rechazar = al_rechazar
+        # telefono_normalizado -> pk, de los clientes ya resueltos
+        self.clientes = {}
+        self.leidas = self.rechazadas = self.clientes_creados = self.pedidos_creados = 0
+
+    def importar(self, filas):
+        pendientes = []
+        for numero, datos in filas:
+            self.leidas += 1
+            try:
+                cliente, pedido = validar_fila(datos)
+            except ValidationError as error:
+                self.rechazadas += 1
+                if self.al_rechazar:
+                    self.al_rechazar(numero, describir_error(error), datos)
+                continue
+
+            pendientes.append((cliente, pedido))
+            if len(pendientes) >= self.lote:
+                self._guardar(pendientes)
+                pendientes = []
+        if pendientes:
+            self._guardar(pendientes)
+        return self
+
+    def _resolver_clientes(self, pendientes):
+        faltantes = {
+            cliente.telefono_normalizado for cliente, _ in pendientes
+            if cliente.telefono_normalizado not in self.clientes
+        }
+        if not faltantes:
+            return
+        existentes = (
+            Cliente.objects.using(self.using)
+            .filter(telefono_normalizado__in=faltantes)
+            .order_by('pk').values_list('telefono_normalizado', 'pk')
+        )
+        for telefono, pk in existentes:
+            self.clientes.setdefault(telefono, pk)
+
+        nuevos = {}
+        for cliente, _ in pendientes:
+            if cliente.telefono_normalizado not in self.clientes:
+                nuevos.setdefault(cliente.telefono_normalizado, cliente)
+        if not nuevos:
+            return
+        if self.simular:
+            # Sin pk real: basta con no contarlos dos veces
+            self.clientes.update(dict.fromkeys(nuevos))
+        else:
+            Cliente.objects.using(self.using).bulk_create(nuevos.values())
+            self.clientes.update({telefono: cliente.pk for telefono, cliente in nuevos.items()})
+        self.clientes_creados += len(nuevos)
+
+    def _guardar(self, pendientes):
+        with transaction.atomic(using=self.using):
+            if not self.simular:
+                transaction.on_commit(eventos.publicar_refresco, using=self.using)
+            self._resolver_clientes(pendientes)
+            pedidos = [pedido for _, pedido in pendientes if pedido is not None]
+            self.pedidos_creados += len(pedidos)
+            if self.simular or not pedidos:
+                return
+
+            for cliente, pedido in pendientes:
+                if pedido is not None:
+                    pedido.cliente_id = self.clientes[cliente.telefono_normalizado]
+            Pedido.objects.using(self.using).bulk_create(pedidos)
+            historial.registrar_altas(pedidos, using=self.using)
+
+            # auto_now_add pisa fecha_solicitud al insertar: las fechas
+            # históricas se restauran en un segundo paso (executemany:
+            # bulk_update arma un CASE enorme y es varias veces más lento)
+            self._restaurar_fechas([pedido for pedido in pedidos if pedido._fecha_importada])
+
+            kpis.registrar_altas(
+                [kpis.aporte(p.estado, p.cliente_id, p.valor_venta, p.valor_abonado) for p in pedidos],
+                using=self.using,
+            )
+
+    def _restaurar_fechas(self, pedidos):
+        if not pedidos:
+            return
+        conexion = connections[self.using]
+        campo = Pedido._meta.get_field('fecha_solicitud')
+        sql = 'UPDATE {} SET {} = %s WHERE {} = %s'.format(
+            conexion.ops.quote_name(Pedido._meta.db_table),
+            conexion.ops.quote_name(campo.column),
+            conexion.ops.quote_name(Pedido._meta.pk.column),
+        )
+        with conexion.cursor() as cursor:
+            cursor.executemany(sql, [
+                (campo.get_db_prep_save(pedido._fecha_importada, conexion), pedido.pk) for pedido in pedidos
+            ])
+        for pedido in pedidos:
+            pedido.fecha_solicitud = pedido._fecha_importada
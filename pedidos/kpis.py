@@ -0,0 +1,284 @@
+from dataclasses import dataclass
+
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, Count, F, Sum, Value, When
+
+from .models import ContadorCliente, ContadorEstado, Pedido
+
+
+@dataclass(frozen=True)
+class ResumenKPIs:
+    """
+    Resultado tipado con las métricas globales de pedidos.
+    Lo comparten el dashboard y el listado de pedidos.
+    """
+    pendientes: int = 0
+    en_proceso: int = 0
+    completados: int = 0
+    ingresos_totales: int = 0
+    por_cobrar: int = 0
+
+    @property
+    def total_pedidos(self):
+        return self.pendientes + self.en_proceso + self.completados
+
+    def porcentaje(self, cantidad):
+        if self.total_pedidos == 0:
+            return 0
+        return (cantidad / self.total_pedidos) * 100
+
+    @property
+    def donut_stops(self):
+        """Puntos de corte acumulados para el conic-gradient del dashboard."""
+        stop_1 = self.porcentaje(self.pendientes)
+        stop_2 = stop_1 + self.porcentaje(self.en_proceso)
+        return stop_1, stop_2
+
+
+# ==========================================
+# CONTADORES MATERIALIZADOS
+# ==========================================
+
+ESTADOS_ACTIVOS = ('PENDIENTE', 'EN_PROCESO')
+
+
+def leer_kpis(using=None):
+    """
+    Lee los KPIs desde la tabla de contadores (a lo más 3 filas),
+    sin recorrer la tabla de pedidos.
+    """
+    return _resumen_contadores({c.estado: c for c in ContadorEstado.objects.using(using or 'default')})
+
+
+async def aleer_kpis(using=None):
+    """Versión async de leer_kpis, para las vistas async."""
+    return _resumen_contadores({c.estado: c async for c in ContadorEstado.objects.using(using or 'default')})
+
+
+def _resumen_contadores(filas):
+    vacio = ContadorEstado()
+
+    return ResumenKPIs(
+        pendientes=filas.get('PENDIENTE', vacio).cantidad,
+        en_proceso=filas.get('EN_PROCESO', vacio).cantidad,
+        completados=filas.get('TERMINADO', vacio).cantidad,
+        ingresos_totales=filas.get('TERMINADO', vacio).total_venta,
+        por_cobrar=sum(filas.get(estado, vacio).total_pendiente for estado in ESTADOS_ACTIVOS),
+    )
+
+
+def aporte(estado, cliente_id, valor_venta, valor_abonado):
+    """Lo que una fila de Pedido suma a los contadores."""
+    return {
+        'estado': estado,
+        'cliente_id': cliente_id,
+        'venta': valor_venta,
+        'pendiente': valor_venta - valor_abonado,
+    }
+
+
+def _acumular(deltas, dato, signo):
+    for clave in (('estado', dato['estado']), ('cliente', dato['cliente_id'])):
+        cantidad, venta, pendiente = deltas.get(clave, (0, 0, 0))
+        deltas[clave] = (
+            # Un aporte agrupado (aportes_agrupados) trae su propia cantidad
+            cantidad + signo * dato.get('cantidad', 1),
+            venta + signo * dato['venta'],
+            pendiente + signo * dato['pendiente'],
+        )
+
+
+def _aplicar_deltas(deltas, using):
+    for (tipo, valor), delta in deltas.items():
+        if delta == (0, 0, 0):
+            continue
+        if tipo == 'estado':
+            _aplicar_delta(ContadorEstado, {'estado': valor}, delta, using)
+        else:
+            _aplicar_delta(ContadorCliente, {'cliente_id': valor}, delta, using)
+
+
+def registrar_cambio(anterior=None, nuevo=None, using=None):
+    """
+    Aplica a los contadores la diferencia entre el aporte anterior y el nuevo
+    de un pedido. `anterior` es None al crear y `nuevo` es None al eliminar.
+    """
+    deltas = {}
+    if anterior:
+        _acumular(deltas, anterior, -1)
+    if nuevo:
+        _acumular(deltas, nuevo, 1)
+    _aplicar_deltas(deltas, using)
+
+
+def aportes_agrupados(queryset):
+    """
+    Aporte de todos los pedidos del queryset, agrupado por estado y cliente
+    (una consulta). Sirve como `anteriores`/`nuevos` de registrar_masivo.
+    """
+    return list(
+        queryset.order_by().values('estado', 'cliente_id').annotate(
+            cantidad=Count('id'),
+            venta=Sum('valor_venta'),
+            pendiente=Sum(F('valor_venta') - F('valor_abonado')),
+        )
+    )
+
+
+def _aplicar_en_bloque(modelo, campo, deltas, using):
+    """Aplica muchos deltas de `modelo` en un solo UPDATE con CASE."""
+    deltas = {valor: delta for valor, delta in deltas.items() if delta != (0, 0, 0)}
+    if len(deltas) <= 1:
+        for valor, delta in deltas.items():
+            _aplicar_delta(modelo, {campo: valor}, delta, using)
+        return
+
+    def por_fila(posicion):
+        return Case(
+            *[When(**{campo: valor}, then=Value(delta[posicion])) for valor, delta in deltas.items()],
+            default=Value(0), output_field=BigIntegerField(),
+        )
+
+    filas = modelo.objects.using(using).filter(**{f'{campo}__in': list(deltas)})
+    actualizados = filas.update(
+        cantidad=F('cantidad') + por_fila(0),
+        total_venta=F('total_venta') + por_fila(1),
+        total_pendiente=F('total_pendiente') + por_fila(2),
+    )
+    if actualizados < len(deltas):
+        existentes = set(filas.values_list(campo, flat=True))
+        for valor, delta in deltas.items():
+            if valor not in existentes:
+                _aplicar_delta(modelo, {campo: valor}, delta, using)
+
+
+def registrar_masivo(anteriores, nuevos=(), using=None):
+    """
+    Como registrar_cambio, pero para muchos pedidos a la vez (aportes
+    agrupados): un UPDATE para los estados y otro para los clientes.
+    """
+    using = using or 'default'
+    deltas = {}
+    for dato in anteriores:
+        _acumular(deltas, dato, -1)
+    for dato in nuevos:
+        _acumular(deltas, dato, 1)
+
+    for tipo, modelo, campo in (('estado', ContadorEstado, 'estado'), ('cliente', ContadorCliente, 'cliente_id')):
+        _aplicar_en_bloque(
+            modelo, campo, {valor: delta for (clave, valor), delta in deltas.items() if clave == tipo}, using
+        )
+
+
+def registrar_altas(aportes, using=None):
+    """
+    Suma a los contadores muchos pedidos nuevos de una vez (ej: bulk_create,
+    que no dispara señales): una actualización por estado y por cliente.
+    """
+    using = using or 'default'
+    deltas = {}
+    for aporte_pedido in aportes:
+        _acumular(deltas, aporte_pedido, 1)
+
+    # Los clientes sin contador (típico en una importación) se crean de una
+    # vez en lugar de UPDATE fallido + INSERT por cada uno
+    ids_clientes = [valor for tipo, valor in deltas if tipo == 'cliente']
+    existentes = set(
+        ContadorCliente.objects.using(using).filter(cliente_id__in=ids_clientes).values_list('cliente_id', flat=True)
+    )
+    nuevos = {
+        clave: deltas.pop(clave) for clave in list(deltas)
+        if clave[0] == 'cliente' and clave[1] not in existentes
+    }
+    try:
+        with transaction.atomic(using=using):
+            ContadorCliente.objects.using(using).bulk_create([
+                ContadorCliente(cliente_id=cliente_id, cantidad=cantidad, total_venta=venta, total_pendiente=pendiente)
+                for (_, cliente_id), (cantidad, venta, pendiente) in nuevos.items()
+            ], batch_size=500)
+    except IntegrityError:
+        # Otra petición creó alguno en paralelo: se aplican uno a uno
+        deltas.update(nuevos)
+    _aplicar_deltas(deltas, using)
+
+
+def _aplicar_delta(modelo, filtro, delta, using):
+    cantidad, venta, pendiente = delta
+    using = using or 'default'
+
+    actualizados = modelo.objects.using(using).filter(**filtro).update(
+        cantidad=F('cantidad') + cantidad,
+        total_venta=F('total_venta') + venta,
+        total_pendiente=F('total_pendiente') + pendiente,
+    )
+    # Si la fila no existe solo la creamos cuando el cambio suma pedidos;
+    # una resta sobre una fila inexistente (ej: cliente borrándose) se ignora.
+    if actualizados or cantidad <= 0:
+        return
+
+    try:
+        with transaction.atomic(using=using):
+            modelo.objects.using(using).create(
+                cantidad=cantidad, total_venta=venta, total_pendiente=pendiente, **filtro
+            )
+    except IntegrityError:
+        # Otra petición la creó en paralelo: basta con repetir el UPDATE
+        _aplicar_delta(modelo, filtro, delta, using)
+
+
+def _agregados_contador():
+    return dict(
+        cantidad=Count('id'),
+        total_venta=Sum('valor_venta'),
+        total_pendiente=Sum(F('valor_venta') - F('valor_abonado')),
+    )
+
+
+def reconstruir_contadores(using=None):
+    """
+    Recalcula todos los contadores desde cero a partir de la tabla de pedidos.
+    """
+    using = using or 'default'
+    pedidos = Pedido.objects.using(using).order_by()
+    agregados = _agregados_contador()
+
+    with transaction.atomic(using=using):
+        ContadorEstado.objects.using(using).all().delete()
+        ContadorCliente.objects.using(using).all().delete()
+
+        ContadorEstado.objects.using(using).bulk_create([
+            ContadorEstado(**fila) for fila in pedidos.values('estado').annotate(**agregados)
+        ])
+        ContadorCliente.objects.using(using).bulk_create([
+            ContadorCliente(**fila) for fila in pedidos.values('cliente_id').annotate(**agregados)
+        ], batch_size=500)
+
+
+def verificar_contadores(using=None):
+    """
+    Compara los contadores materializados contra un recálculo completo.
+    Devuelve una lista de diferencias legibles (vacía si todo cuadra).
+    """
+    using = using or 'default'
+    pedidos = Pedido.objects.using(using).order_by()
+    campos = ('cantidad', 'total_venta', 'total_pendiente')
+    agregados = _agregados_contador()
+    diferencias = []
+
+    for modelo, clave in ((ContadorEstado, 'estado'), (ContadorCliente, 'cliente_id')):
+        esperado = {
+            fila[clave]: tuple(fila[c] or 0 for c in campos)
+            for fila in pedidos.values(clave).annotate(**agregados)
+        }
+        actual = {
+            fila[clave]: tuple(fila[c] for c in campos)
+            for fila in modelo.objects.using(using).values(clave, *campos)
+        }
+        for llave in esperado.keys() | actual.keys():
+            # Una fila en cero equivale a una fila inexistente
+            if esperado.get(llave, (0, 0, 0)) != actual.get(llave, (0, 0, 0)):
+                diferencias.append(
+                    f"{modelo.__name__}[{llave}]: esperado={esperado.get(llave)} actual={actual.get(llave)}"
+                )
+
+    return diferencias
@@ -0,0 +1,92 @@
+"""
+Utilidades compartidas por los comandos benchmark_*.
+
+Los benchmarks trabajan sobre una base SQLite temporal (migrada desde cero),
+nunca sobre la base de datos real.
+"""
+import datetime
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.db import connections
+
+from pedidos.models import Cliente, Pedido
+
+
+@contextmanager
+def base_temporal(alias='benchmark', opciones=None):
+    """
+    Registra una conexión `alias` hacia un archivo SQLite temporal, la migra
+    y la elimina al terminar. `opciones` reemplaza OPTIONS de la conexión.
+    """
+    directorio = tempfile.mkdtemp(prefix='manzagrafica_bench_')
+    config = dict(connections.databases['default'])
+    config['NAME'] = os.path.join(directorio, 'benchmark.sqlite3')
+    if opciones is not None:
+        config['OPTIONS'] = opciones
+    connections.databases[alias] = config
+
+    try:
+        call_command('migrate', database=alias, verbosity=0)
+        yield alias
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def sembrar(alias, pedidos, pedidos_por_cliente=20, lote=5000, salida=None):
+    """Inserta `pedidos` pedidos sintéticos (y sus clientes) con bulk_create."""
+    hoy = datetime.date.today()
+    estados = [opcion[0] for opcion in Pedido.ESTADO_CHOICES]
+    inicio = time.perf_counter()
+
+    total_clientes = max(1, -(-pedidos // pedidos_por_cliente))
+    ids_clientes = []
+    for desde in range(0, total_clientes, lote):
+        creados = Cliente.objects.using(alias).bulk_create([
+            Cliente(
+                nombre=f'Cliente {n:07d}',
+                telefono=f'+56 9 {n // 10000:04d} {n % 10000:04d}',
+                telefono_normalizado=f'569{n // 10000:04d}{n % 10000:04d}',
+                email=f'cliente{n}@ejemplo.cl',
+            )
+            for n in range(desde, min(desde + lote, total_clientes))
+        ])
+        ids_clientes.extend(c.pk for c in creados)
+
+    for desde in range(0, pedidos, lote):
+        hasta = min(desde + lote, pedidos)
+        Pedido.objects.using(alias).bulk_create([
+            Pedido(
+                cliente_id=ids_clientes[i // pedidos_por_cliente],
+                resumen_pedido=f'Poleras estampadas lote {i}',
+                detalles_pedido=f'<p>Detalle del trabajo número {i}, diseño a color.</p>',
+                estado=estados[i % len(estados)],
+                valor_venta=10000 + (i % 50) * 1000,
+                valor_abonado=(i % 7) * 1000,
+                fecha_entrega=hoy + datetime.timedelta(days=(i % 120) - 60),
+            )
+            for i in range(desde, hasta)
+        ])
+        if salida:
+            salida.write(f"\r  sembrados {hasta}/{pedidos} pedidos", ending='')
+
+    if salida:
+        salida.write(f"  ({time.perf_counter() - inicio:.1f} s)")
+
+
+def cronometrar(funcion, repeticiones=5):
+    """Ejecuta `funcion` varias veces y devuelve la mediana en milisegundos."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from pedidos.kpis import reconstruir_contadores
+from pedidos.metricas import percentil
+
+from ._bench import base_temporal, sembrar
+
+RUTAS = ['dashboard', 'lista_pedidos', 'trabajo_semanal', 'api_clientes']
+MODOS = {'wsgi': 'False', 'asgi': 'True'}
+
+
+# ==========================================
+# CLIENTES DE CARGA (sin red: se llama directo a la aplicación)
+# ==========================================
+
+def _carga_wsgi(rutas, cookie, concurrencia, peticiones):
+    """Un hilo por usuario concurrente, como gunicorn con --threads."""
+    from django.core.wsgi import get_wsgi_application
+
+    aplicacion = get_wsgi_application()
+    host = settings.ALLOWED_HOSTS[0]
+    contador = iter(range(peticiones))
+    candado = threading.Lock()
+
+    def peticion(ruta):
+        estado = []
+        entorno = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': ruta, 'QUERY_STRING': '',
+            'SERVER_NAME': host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': host, 'HTTP_COOKIE': cookie,
+            'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        }
+        respuesta = aplicacion(entorno, lambda status, headers: estado.append(status))
+        try:
+            for _ in respuesta:
+                pass
+        finally:
+            respuesta.close()
+        return estado[0].startswith('200')
+
+    def usuario():
+        tiempos, errores = [], 0
+        while True:
+            with candado:
+                numero = next(contador, None)
+            if numero is None:
+                return tiempos, errores
+            inicio = time.perf_counter()
+            if peticion(rutas[numero % len(rutas)]):
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            else:
+                errores += 1
+
+    with ThreadPoolExecutor(concurrencia) as hilos:
+        return list(hilos.map(lambda _: usuario(), range(concurrencia)))
+
+
+def _carga_asgi(rutas, cookie, concurrencia, peticiones):
+    """Una corrutina por usuario concurrente sobre un solo event loop."""
+    from django.core.asgi import get_asgi_application
+
+    aplicacion = get_asgi_application()
+    host = settings.ALLOWED_HOSTS[0].encode()
+    contador = iter(range(peticiones))
+
+    async def peticion(ruta):
+        recibido = False
+        estado = []
+
+        async def recibir():
+            nonlocal recibido
+            if not recibido:
+                recibido = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Nunca se desconecta: Django cancela la espera al responder
+            await asyncio.Event().wait()
+
+        async def enviar(mensaje):
+            if mensaje['type'] == 'http.response.start':
+                estado.append(mensaje['status'])
+
+        await aplicacion({
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(),
+            'query_string': b'', 'root_path': '',
+            'headers': [(b'host', host), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 50000), 'server': (host.decode(), 80),
+        }, recibir, enviar)
+        return estado[0] == 200
+
+    async def usuario():
+        tiempos, errores = [], 0
+        for numero in contador:
+            inicio = time.perf_counter()
+            if await peticion(rutas[numero % len(rutas)]):
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            else:
+                errores += 1
+        return tiempos, errores
+
+    async def todos():
+        return await asyncio.gather(*(usuario() for _ in range(concurrencia)))
+
+    return asyncio.run(todos())
+
+
+CARGAS = {'wsgi': _carga_wsgi, 'asgi': _carga_asgi}
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de las páginas de lectura por la ruta WSGI (vistas "
+        "síncronas, un hilo por usuario) y por la ASGI (vistas async, un event "
+        "loop): peticiones por segundo y latencia p50/p99 por nivel de concurrencia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=5_000)
+        parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones por nivel de concurrencia.')
+        parser.add_argument('--rutas', nargs='+', default=RUTAS, help='Nombres de URL a recorrer en rotación.')
+        parser.add_argument(
+            '--sin-cache', action='store_true',
+            help='Cada petición recalcula (TTL 0): mide las consultas y no solo el cache.',
+        )
+        # Uso interno: cada modo corre en un proceso aparte, porque las URLs
+        # eligen entre vistas síncronas y async al importarse
+        parser.add_argument('--medir', help=argparse.SUPPRESS)
+
+    def medir(self, parametros):
+        connections.databases['default']['NAME'] = parametros['base']
+        if parametros['sin_cache']:
+            settings.PEDIDOS_CACHE_TTL = 0
+
+        cliente = Client()
+        cliente.force_login(get_user_model().objects.get(username='benchmark'))
+        cookie = f"{settings.SESSION_COOKIE_NAME}={cliente.cookies[settings.SESSION_COOKIE_NAME].value}"
+        rutas = [reverse(nombre) for nombre in parametros['rutas']]
+        connections.close_all()
+
+        cargar = CARGAS[parametros['modo']]
+        # Calentamiento: templates compilados y detección de FTS5
+        cargar(rutas, cookie, 1, len(rutas))
+
+        resultados = {}
+        for concurrencia in parametros['concurrencia']:
+            inicio = time.perf_counter()
+            por_usuario = cargar(rutas, cookie, concurrencia, parametros['peticiones'])
+            segundos = time.perf_counter() - inicio
+            tiempos = [t for datos, _ in por_usuario for t in datos]
+            resultados[concurrencia] = {
+                'por_segundo': len(tiempos) / segundos,
+                'p50': percentil(tiempos, 50),
+                'p99': percentil(tiempos, 99),
+                'errores': sum(errores for _, errores in por_usuario),
+            }
+        self.stdout.write(json.dumps(resultados))
+
+    def handle(self, *args, **options):
+        if options['medir']:
+            return self.medir(json.loads(options['medir']))
+
+        with base_temporal() as alias:
+            sembrar(alias, options['pedidos'], salida=self.stdout)
+            reconstruir_contadores(using=alias)
+            get_user_model().objects.db_manager(alias).create_user('benchmark', password='benchmark')
+            connections[alias].close()
+
+            medidas = {}
+            for modo, activar in MODOS.items():
+                salida = subprocess.run(
+                    [sys.executable, sys.argv[0], 'benchmark_asgi', '--medir', json.dumps({
+                        'modo': modo,
+                        'base': str(connections.databases[alias]['NAME']),
+                        'rutas': options['rutas'],
+                        'concurrencia': options['concurrencia'],
+                        'peticiones': options['peticiones'],
+                        'sin_cache': options['sin_cache'],
+                    })],
+                    env=dict(os.environ, PEDIDOS_ASGI=activar),
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                medidas[modo] = json.loads(salida.strip().splitlines()[-1])
+
+        for concurrencia in options['concurrencia']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{concurrencia} usuarios concurrentes"))
+            for modo in MODOS:
+                medida = medidas[modo][str(concurrencia)]
+                self.stdout.write(
+                    f"  {modo:<5} {medida['por_segundo']:8.1f} pet/s  "
+                    f"p50 {medida['p50']:7.1f} ms  p99 {medida['p99']:7.1f} ms  "
+                    f"errores {medida['errores']}"
+                )
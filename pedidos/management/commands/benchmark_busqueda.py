@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from pedidos import busqueda
+from pedidos.models import Cliente, Pedido
+
+from ._bench import base_temporal, cronometrar, sembrar
+
+TERMINOS = ['Cliente 00012', '+56 9 0001', 'estampadas lote 4711', 'cliente1234@ejemplo']
+
+
+class Command(BaseCommand):
+    help = "Compara la latencia de búsqueda con icontains (LIKE) contra FTS5 a distintos tamaños."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', type=int, nargs='+', default=[1_000, 200_000])
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for tamano in options['tamanos']:
+            with base_temporal() as alias:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n{tamano} pedidos"))
+                sembrar(alias, tamano, salida=self.stdout)
+
+                if not busqueda.fts_disponible(alias):
+                    self.stdout.write(self.style.WARNING("  FTS5 no disponible en este SQLite."))
+                    return
+
+                pedidos = Pedido.objects.using(alias).select_related('cliente').order_by('-fecha_solicitud')
+                clientes = Cliente.objects.using(alias)
+
+                for termino in TERMINOS:
+                    like_pedidos = pedidos.filter(
+                        Q(cliente__nombre__icontains=termino) | Q(cliente__telefono__icontains=termino)
+                    )
+                    like_clientes = clientes.filter(
+                        Q(nombre__icontains=termino) | Q(email__icontains=termino) | Q(telefono__icontains=termino)
+                    )
+                    fts_pedidos = busqueda.filtrar_pedidos(pedidos, termino)
+                    fts_clientes = busqueda.filtrar_clientes(clientes, termino)
+
+                    filas = [
+                        ('lista_pedidos LIKE', lambda: list(like_pedidos[:10])),
+                        ('lista_pedidos FTS5', lambda: list(fts_pedidos[:10])),
+                        ('lista_clientes LIKE', lambda: list(like_clientes.all())),
+                        ('lista_clientes FTS5', lambda: list(fts_clientes.all())),
+                    ]
+                    self.stdout.write(f"  '{termino}'")
+                    for nombre, funcion in filas:
+                        ms = cronometrar(funcion, options['repeticiones'])
+                        self.stdout.write(f"    {nombre:<22} {ms:9.2f} ms")
@@ -0,0 +1,206 @@
+import gzip
+import os
+import urllib.parse
+import urllib.request
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from pedidos import estaticos
+from pedidos.kpis import reconstruir_contadores
+
+from ._bench import base_temporal, cronometrar, sembrar
+
+PAGINAS = ['dashboard', 'lista_pedidos']
+MODOS = ['cdn', 'locales']
+
+# Conexión nueva a un origen: DNS + TCP + TLS
+RTT_POR_ORIGEN = 3
+
+
+class Recursos(HTMLParser):
+    """CSS y JS de una página; `bloqueantes` son los que frenan el primer render."""
+
+    def __init__(self):
+        super().__init__()
+        self.en_head = False
+        self.recursos = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'head':
+            self.en_head = True
+        elif tag == 'link' and attrs.get('rel') == 'stylesheet' and attrs.get('href'):
+            self.recursos.append((attrs['href'], True))
+        elif tag == 'script' and attrs.get('src'):
+            bloqueante = self.en_head and 'defer' not in attrs and 'async' not in attrs
+            self.recursos.append((attrs['src'], bloqueante))
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.en_head = False
+
+
+# ==========================================
+# TAMAÑO DE CADA RECURSO
+# ==========================================
+
+def _peso_local(url):
+    """(bytes, bytes transferidos) del archivo en STATIC_ROOT o en las apps."""
+    nombre = urllib.parse.urlparse(url).path[len('/' + settings.STATIC_URL.lstrip('/')):]
+    ruta = os.path.join(settings.STATIC_ROOT, nombre)
+    if not os.path.isfile(ruta):
+        ruta = finders.find(nombre)
+    if not ruta:
+        return None
+    tamano = os.path.getsize(ruta)
+    # Lo que envía EstaticosMiddleware: la copia .br/.gz si existe
+    for extension in ('.br', '.gz'):
+        if os.path.isfile(ruta + extension):
+            return tamano, os.path.getsize(ruta + extension)
+    return tamano, tamano
+
+
+def _peso_remoto(url):
+    peticion = urllib.request.Request(url, headers={
+        'Accept-Encoding': 'gzip',
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) Chrome/120.0',
+    })
+    try:
+        with urllib.request.urlopen(peticion, timeout=15) as respuesta:
+            transferido = respuesta.read()
+            comprimido = respuesta.headers.get('Content-Encoding') == 'gzip'
+    except OSError:
+        return None
+    return (len(gzip.decompress(transferido)) if comprimido else len(transferido)), len(transferido)
+
+
+def _origen(url):
+    partes = urllib.parse.urlparse(url)
+    return partes.netloc or 'propio'
+
+
+def _primer_render(servidor_ms, html_transferido, recursos, kbps, rtt):
+    """
+    Estimación simple, no una medición de navegador: conexión y HTML, luego
+    los recursos bloqueantes en paralelo por origen (cada origen nuevo paga
+    su conexión) compartiendo el ancho de banda.
+    """
+    por_ms = kbps * 1000 / 8 / 1000
+    html = RTT_POR_ORIGEN * rtt + rtt + servidor_ms + html_transferido / por_ms
+    bloqueantes = [r for r in recursos if r['bloqueante'] and r['peso']]
+    if not bloqueantes:
+        return html
+    espera = max(
+        (0 if r['origen'] == 'propio' else RTT_POR_ORIGEN * rtt) + rtt for r in bloqueantes
+    )
+    return html + espera + sum(r['peso'][1] for r in bloqueantes) / por_ms
+
+
+class Command(BaseCommand):
+    help = (
+        "Peso de página y tiempo estimado hasta el primer render de dashboard y "
+        "lista_pedidos, con los estáticos desde los CDN y con los propios "
+        "(manage.py construir_estaticos)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=5_000)
+        parser.add_argument('--repeticiones', type=int, default=10)
+        parser.add_argument('--kbps', type=int, default=10_000, help='Ancho de banda del perfil de red.')
+        parser.add_argument('--rtt', type=float, default=60, help='Latencia de ida y vuelta (ms).')
+        parser.add_argument('--sin-red', action='store_true', help='No descarga los recursos de los CDN.')
+
+    def medir_pagina(self, cliente, nombre, modo, opciones):
+        url = reverse(nombre)
+        with override_settings(PEDIDOS_ESTATICOS=modo):
+            respuesta = cliente.get(url)
+            if respuesta.status_code != 200:
+                raise CommandError(f'{url} respondió {respuesta.status_code}')
+            html = respuesta.content
+            servidor_ms = cronometrar(lambda: cliente.get(url), opciones['repeticiones'])
+
+        lector = Recursos()
+        lector.feed(html.decode('utf-8'))
+        recursos = []
+        for direccion, bloqueante in lector.recursos:
+            origen = _origen(direccion)
+            if origen == 'propio':
+                peso = _peso_local(direccion)
+            else:
+                peso = None if opciones['sin_red'] else self.remotos.setdefault(direccion, _peso_remoto(direccion))
+            recursos.append({'url': direccion, 'origen': origen, 'bloqueante': bloqueante, 'peso': peso})
+
+        html_transferido = len(gzip.compress(html))
+        return {
+            'servidor_ms': servidor_ms,
+            'html': (len(html), html_transferido),
+            'recursos': recursos,
+            'render_ms': _primer_render(servidor_ms, html_transferido, recursos, opciones['kbps'], opciones['rtt']),
+        }
+
+    def informar(self, nombre, modo, medida):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{nombre} ({modo})"))
+        self.stdout.write(
+            f"  servidor {medida['servidor_ms']:7.1f} ms   HTML {medida['html'][0] / 1024:7.1f} KB "
+            f"({medida['html'][1] / 1024:.1f} KB gzip)"
+        )
+        total, transferido, sin_dato = medida['html'][0], medida['html'][1], 0
+        for recurso in medida['recursos']:
+            marca = '*' if recurso['bloqueante'] else ' '
+            if recurso['peso'] is None:
+                sin_dato += 1
+                self.stdout.write(f"  {marca} {'?':>8}            {recurso['url']}")
+                continue
+            bruto, enviado = recurso['peso']
+            total += bruto
+            transferido += enviado
+            self.stdout.write(f"  {marca} {bruto / 1024:7.1f} KB ({enviado / 1024:6.1f})  {recurso['url']}")
+        self.stdout.write(
+            f"  peso total {total / 1024:.1f} KB, transferido {transferido / 1024:.1f} KB"
+            + (f" (+{sin_dato} sin dato)" if sin_dato else '')
+        )
+        self.stdout.write(f"  primer render estimado {medida['render_ms']:7.0f} ms")
+
+    def handle(self, *args, **options):
+        self.remotos = {}
+        estaticos._construidos.cache_clear()
+        if not estaticos._construidos():
+            self.stdout.write(self.style.WARNING(
+                "Faltan archivos propios (manage.py construir_estaticos): en modo 'locales' "
+                "se listan sin tamaño."
+            ))
+
+        default = connections.databases['default']
+        original = default['NAME']
+        with base_temporal() as alias:
+            sembrar(alias, options['pedidos'], salida=self.stdout)
+            reconstruir_contadores(using=alias)
+            connections[alias].close()
+            # Las vistas usan la conexión default: se apunta a la base temporal
+            connections['default'].close()
+            default['NAME'] = connections.databases[alias]['NAME']
+            try:
+                cliente = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+                cliente.force_login(get_user_model().objects.create_user('benchmark', password='benchmark'))
+                medidas = {
+                    (nombre, modo): self.medir_pagina(cliente, nombre, modo, options)
+                    for nombre in PAGINAS for modo in MODOS
+                }
+            finally:
+                connections['default'].close()
+                default['NAME'] = original
+
+        for (nombre, modo), medida in medidas.items():
+            self.informar(nombre, modo, medida)
+        self.stdout.write(
+            f"\n* bloquea el primer render. Tiempos de render estimados con {options['kbps']} kbps y "
+            f"RTT {options['rtt']:.0f} ms (no incluyen la compilación de Tailwind en el navegador "
+            "que hace el script del CDN)."
+        )
@@ -0,0 +1,90 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from pedidos import exportacion
+from pedidos.models import Cliente, Pedido
+
+from ._bench import base_temporal, sembrar
+
+
+def _rss_kb():
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo // 1024 if sys.platform == 'darwin' else maximo
+
+
+def _exportar(alias, formato, modelo):
+    generar, _ = exportacion.FORMATOS[formato]
+    if modelo == 'pedidos':
+        columnas = exportacion.COLUMNAS_PEDIDOS
+        filas = exportacion.filas_pedidos(Pedido.objects.using(alias).order_by('-fecha_solicitud', '-id'))
+    else:
+        columnas = exportacion.COLUMNAS_CLIENTES
+        filas = exportacion.filas_clientes(Cliente.objects.using(alias).order_by('nombre', 'id'))
+
+    rss_inicial = _rss_kb()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    total = 0
+    for parte in generar([titulo for titulo, _ in columnas], filas):
+        total += len(parte)
+    segundos = time.perf_counter() - inicio
+    _, pico_python = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'segundos': segundos,
+        'bytes': total,
+        'rss_kb': _rss_kb() - rss_inicial,
+        'python_kb': pico_python // 1024,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide tiempo y pico de memoria (RSS y tracemalloc) de las exportaciones "
+        "CSV/XLSX a distintos tamaños: la memoria no debería crecer con las filas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--formatos', nargs='+', choices=sorted(exportacion.FORMATOS), default=['csv', 'xlsx'])
+        # Uso interno: cada medición corre en un proceso nuevo, así el pico
+        # de RSS es solo el de la exportación y no el de la siembra
+        parser.add_argument('--medir', nargs=3, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['medir']:
+            nombre_base, formato, modelo = options['medir']
+            connections.databases['benchmark'] = dict(connections.databases['default'], NAME=nombre_base)
+            self.stdout.write(json.dumps(_exportar('benchmark', formato, modelo)))
+            return
+
+        for tamano in options['tamanos']:
+            with base_temporal() as alias:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n{tamano} pedidos"))
+                sembrar(alias, tamano, salida=self.stdout)
+                self.stdout.write('')
+                connections[alias].close()
+
+                for modelo in ('pedidos', 'clientes'):
+                    for formato in options['formatos']:
+                        salida = subprocess.run(
+                            [sys.executable, sys.argv[0], 'benchmark_exportacion',
+                             '--medir', connections.databases[alias]['NAME'], formato, modelo],
+                            capture_output=True, text=True, check=True,
+                        ).stdout
+                        medida = json.loads(salida.strip().splitlines()[-1])
+                        self.stdout.write(
+                            f"  {modelo:<9}{formato:<5} {medida['segundos']:8.2f} s  "
+                            f"{medida['bytes'] / 1024 / 1024:9.1f} MB  "
+                            f"pico RSS +{medida['rss_kb'] / 1024:7.1f} MB  "
+                            f"tracemalloc {medida['python_kb'] / 1024:7.1f} MB"
+                        )
@@ -0,0 +1,74 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from pedidos.kpis import ESTADOS_ACTIVOS
+from pedidos.models import Pedido
+
+from ._bench import base_temporal, cronometrar, sembrar
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara planes de consulta (EXPLAIN QUERY PLAN) y tiempos de los filtros "
+        "más usados de Pedido, sin y con los índices compuestos, sobre datos sintéticos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=500_000)
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def consultas(self, alias):
+        hoy = datetime.date.today()
+        pedidos = Pedido.objects.using(alias)
+        activos = pedidos.filter(estado__in=ESTADOS_ACTIVOS)
+
+        return {
+            'trabajo_semanal: atrasados': activos.filter(fecha_entrega__lt=hoy).order_by('fecha_entrega'),
+            'trabajo_semanal: semana': activos.filter(
+                fecha_entrega__range=[hoy, hoy + datetime.timedelta(days=7)]
+            ).order_by('fecha_entrega'),
+            'lista_pedidos: por defecto': pedidos.order_by('-fecha_solicitud')[:10],
+            'lista_pedidos: estado': pedidos.filter(estado='PENDIENTE').order_by('-fecha_solicitud')[:10],
+            'dashboard: conteo estado': pedidos.filter(estado='EN_PROCESO'),
+        }
+
+    def medir(self, alias, repeticiones):
+        resultados = {}
+        for nombre, queryset in self.consultas(alias).items():
+            if nombre.startswith('dashboard'):
+                ejecutar = queryset.count
+            else:
+                ejecutar = lambda qs=queryset: list(qs.values_list('id', flat=True))
+            plan = queryset.explain()
+            resultados[nombre] = (plan, cronometrar(ejecutar, repeticiones))
+        return resultados
+
+    def handle(self, *args, **options):
+        with base_temporal() as alias:
+            self.stdout.write(f"Sembrando {options['pedidos']} pedidos sintéticos...")
+            sembrar(alias, options['pedidos'], salida=self.stdout)
+
+            indices = Pedido._meta.indexes
+            with connections[alias].schema_editor() as editor:
+                for indice in indices:
+                    editor.remove_index(Pedido, indice)
+            connections[alias].cursor().execute('ANALYZE')
+            antes = self.medir(alias, options['repeticiones'])
+
+            with connections[alias].schema_editor() as editor:
+                for indice in indices:
+                    editor.add_index(Pedido, indice)
+            connections[alias].cursor().execute('ANALYZE')
+            despues = self.medir(alias, options['repeticiones'])
+
+        for nombre, (plan_antes, ms_antes) in antes.items():
+            plan_despues, ms_despues = despues[nombre]
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{nombre}"))
+            self.stdout.write(f"  SIN índices ({ms_antes:.2f} ms):")
+            self.stdout.write("    " + plan_antes.replace("\n", "\n    "))
+            self.stdout.write(f"  CON índices ({ms_despues:.2f} ms):")
+            self.stdout.write("    " + plan_despues.replace("\n", "\n    "))
+            mejora = ms_antes / ms_despues if ms_despues else float('inf')
+            self.stdout.write(self.style.SUCCESS(f"  x{mejora:.1f}"))
@@ -0,0 +1,87 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+
+from pedidos import views
+from pedidos.kpis import leer_kpis, reconstruir_contadores
+from pedidos.models import Pedido
+from pedidos.paginacion import PaginadorCursor
+
+from ._bench import base_temporal, sembrar
+
+
+def _plantillas(cacheadas):
+    """TEMPLATES de settings con o sin cached.Loader."""
+    config = dict(settings.TEMPLATES[0])
+    config['OPTIONS'] = dict(config['OPTIONS'], loaders=(
+        [("django.template.loaders.cached.Loader", settings.CARGADORES_PLANTILLAS)] if cacheadas
+        else settings.CARGADORES_PLANTILLAS
+    ))
+    return [config]
+
+
+class Command(BaseCommand):
+    help = (
+        "Tiempo de render de pedido_list.html con N filas: sin y con cached.Loader, "
+        "y con el cache de fragmentos desactivado, frío (cada render vacía el "
+        "cache) y tibio (todas las filas ya cacheadas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=5_000)
+        parser.add_argument('--filas', type=int, default=100)
+        parser.add_argument('--repeticiones', type=int, default=30)
+
+    def contexto(self, alias, filas):
+        request = RequestFactory().get('/pedidos/')
+        request.user = get_user_model()(username='benchmark')
+        pedidos = Pedido.objects.using(alias).select_related('cliente')
+        pagina = PaginadorCursor(pedidos, '-fecha_solicitud', por_pagina=filas).pagina()
+        kpis = leer_kpis(using=alias)
+        contexto = views._contexto_lista_pedidos(
+            request, kpis, pagina, '-fecha_solicitud', None, None, kpis.total_pedidos
+        )
+        return request, contexto
+
+    def medir(self, request, contexto, repeticiones, vaciar):
+        def render():
+            return render_to_string('pedidos/pedido_list.html', contexto, request)
+
+        # Primer render fuera de la medición: compila (o carga) las plantillas
+        render()
+        tiempos = []
+        for _ in range(repeticiones):
+            if vaciar:
+                cache.clear()
+            inicio = time.perf_counter()
+            render()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tiempos)
+
+    def handle(self, *args, **options):
+        with base_temporal() as alias:
+            sembrar(alias, options['pedidos'], salida=self.stdout)
+            reconstruir_contadores(using=alias)
+            request, contexto = self.contexto(alias, options['filas'])
+
+        escenarios = {
+            'sin cache de fragmentos': (0, False),
+            'fragmentos en frío': (3600, True),
+            'fragmentos en tibio': (3600, False),
+        }
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\npedido_list.html con {len(contexto['pedidos'])} filas (mediana de {options['repeticiones']})"
+        ))
+        for cacheadas, cargador in ((False, 'cargadores simples'), (True, 'cached.Loader')):
+            for nombre, (ttl, vaciar) in escenarios.items():
+                with override_settings(TEMPLATES=_plantillas(cacheadas), PEDIDOS_FRAGMENTOS_TTL=ttl):
+                    cache.clear()
+                    ms = self.medir(request, contexto, options['repeticiones'], vaciar)
+                self.stdout.write(f"  {cargador:<19} {nombre:<24} {ms:8.2f} ms")
+        cache.clear()
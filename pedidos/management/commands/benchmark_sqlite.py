@@ -0,0 +1,145 @@
+import argparse
+import datetime
+import json
+import random
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from pedidos.metricas import percentil
+from pedidos.models import Pedido
+
+from ._bench import base_temporal, sembrar
+
+ESTADOS = [opcion[0] for opcion in Pedido.ESTADO_CHOICES]
+
+
+def _leer(alias, azar):
+    # Página del listado: la lectura más frecuente de la app
+    list(Pedido.objects.using(alias).select_related('cliente').order_by('-fecha_solicitud')[:10])
+
+
+def _escribir(alias, azar):
+    # Lectura seguida de escritura en la misma transacción (como cambiar
+    # estado o editar): el caso que falla con "database is locked"
+    with transaction.atomic(using=alias):
+        if azar.random() < 0.5:
+            pedido = Pedido.objects.using(alias).filter(pk__lte=azar.randint(1, 1000)).order_by('-pk').first()
+            pedido.estado = azar.choice(ESTADOS)
+            pedido.save(using=alias)
+        else:
+            Pedido.objects.using(alias).create(
+                cliente_id=azar.randint(1, 50),
+                resumen_pedido='Pedido de carga',
+                detalles_pedido='Generado por benchmark_sqlite',
+                valor_venta=10000,
+                fecha_entrega=datetime.date.today(),
+            )
+
+
+OPERACIONES = {'leer': _leer, 'escribir': _escribir}
+
+
+def _trabajar(alias, operacion, desde, hasta, semilla, pausa):
+    azar = random.Random(semilla)
+    tiempos, bloqueos = [], 0
+    # Todos los procesos arrancan a la vez, ya con Django cargado
+    time.sleep(max(0, desde - time.time()))
+    while time.time() < hasta:
+        inicio = time.perf_counter()
+        try:
+            OPERACIONES[operacion](alias, azar)
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            bloqueos += 1
+        else:
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        # Tiempo entre peticiones de un usuario: sin pausa los escritores
+        # saturan la base y el p99 solo mide la cola
+        time.sleep(azar.expovariate(1000 / pausa) if pausa else 0)
+    return {'tiempos': tiempos, 'bloqueos': bloqueos}
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga concurrente de lecturas y escrituras sobre SQLite: compara la tasa "
+        "de 'database is locked' y la latencia p99 con la configuración de fábrica "
+        "y con la de settings (WAL, PRAGMAs, transacciones IMMEDIATE)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=20_000)
+        parser.add_argument('--lectores', type=int, default=4)
+        parser.add_argument('--escritores', type=int, default=4)
+        parser.add_argument('--segundos', type=float, default=10)
+        parser.add_argument('--pausa', type=float, default=20, help='Pausa media (ms) entre operaciones.')
+        # Uso interno: cada trabajador es un proceso aparte, como los
+        # workers de gunicorn (con hilos el GIL distorsiona las latencias)
+        parser.add_argument('--trabajador', help=argparse.SUPPRESS)
+
+    def configuraciones(self):
+        # La configuración "de fábrica" conserva solo el timeout por defecto
+        # del driver (5 s), sin PRAGMAs ni modo de transacción
+        return {
+            'por defecto': {},
+            'ajustada': settings.DATABASES['default'].get('OPTIONS', {}),
+        }
+
+    def trabajador(self, parametros):
+        configuracion = self.configuraciones()[parametros['configuracion']]
+        connections.databases['benchmark'] = dict(
+            connections.databases['default'], NAME=parametros['base'], OPTIONS=configuracion
+        )
+        resultado = _trabajar(
+            'benchmark', parametros['operacion'], parametros['desde'], parametros['hasta'],
+            parametros['semilla'], parametros['pausa'],
+        )
+        self.stdout.write(json.dumps(resultado))
+
+    def handle(self, *args, **options):
+        if options['trabajador']:
+            return self.trabajador(json.loads(options['trabajador']))
+
+        for nombre, opciones in self.configuraciones().items():
+            with base_temporal(opciones=opciones) as alias:
+                sembrar(alias, options['pedidos'], salida=self.stdout)
+                modo = connections[alias].cursor().execute('PRAGMA journal_mode').fetchone()[0]
+                connections[alias].close()
+
+                desde = time.time() + 3
+                operaciones = ['leer'] * options['lectores'] + ['escribir'] * options['escritores']
+                procesos = [
+                    (operacion, subprocess.Popen(
+                        [sys.executable, sys.argv[0], 'benchmark_sqlite', '--trabajador', json.dumps({
+                            'configuracion': nombre,
+                            'base': str(connections.databases[alias]['NAME']),
+                            'operacion': operacion,
+                            'desde': desde,
+                            'hasta': desde + options['segundos'],
+                            'semilla': semilla,
+                            'pausa': options['pausa'],
+                        })],
+                        stdout=subprocess.PIPE, text=True,
+                    ))
+                    for semilla, operacion in enumerate(operaciones)
+                ]
+                resultados = [
+                    (operacion, json.loads(proceso.communicate()[0].strip().splitlines()[-1]))
+                    for operacion, proceso in procesos
+                ]
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\nConfiguración {nombre} (journal_mode={modo})"))
+            for operacion in OPERACIONES:
+                tiempos = [t for op, datos in resultados if op == operacion for t in datos['tiempos']]
+                bloqueos = sum(datos['bloqueos'] for op, datos in resultados if op == operacion)
+                intentos = len(tiempos) + bloqueos
+                self.stdout.write(
+                    f"  {operacion:<9} {len(tiempos) / options['segundos']:8.1f} ops/s  "
+                    f"bloqueos {bloqueos:5d} ({100 * bloqueos / max(intentos, 1):5.1f} %)  "
+                    f"p50 {percentil(tiempos, 50):7.1f} ms  p99 {percentil(tiempos, 99):7.1f} ms"
+                )
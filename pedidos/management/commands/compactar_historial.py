@@ -0,0 +1,90 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from pedidos.models import PedidoEvento
+
+
+class Command(BaseCommand):
+    help = (
+        "Acota el historial de pedidos (PedidoEvento): borra los eventos más "
+        "viejos que la retención y, de los que quedan, funde en uno por pedido "
+        "los cambios de montos antiguos que no cambiaron el estado. Los cambios "
+        "de estado se conservan: con ellos se mide el tiempo en cada estado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retencion', type=int, default=730,
+            help='Días de historial que se conservan (0 = todo).',
+        )
+        parser.add_argument(
+            '--compactar', type=int, default=90,
+            help='Días tras los cuales se funden los cambios de montos (0 = no compactar).',
+        )
+        parser.add_argument('--lote', type=int, default=5_000, help='Filas por DELETE.')
+        parser.add_argument('--dry-run', action='store_true', help='Solo informa: no borra ni funde nada.')
+        parser.add_argument('--database', default='default')
+
+    def borrar_por_lotes(self, queryset, lote):
+        # Lotes cortos: cada DELETE bloquea la base poco tiempo
+        borrados = 0
+        while ids := list(queryset.values_list('pk', flat=True)[:lote]):
+            borrados += queryset.model.objects.using(queryset.db).filter(pk__in=ids).delete()[0]
+        return borrados
+
+    def retener(self, db, dias, lote, simulacion):
+        viejos = PedidoEvento.objects.using(db).filter(creado_en__lt=timezone.now() - datetime.timedelta(days=dias))
+        if simulacion:
+            return viejos.count()
+        return self.borrar_por_lotes(viejos, lote)
+
+    def compactar(self, db, dias, lote, simulacion):
+        """
+        Los cambios de montos sin cambio de estado más viejos que `dias` se
+        suman en el último de cada pedido. Se pierde quién y cuándo hizo
+        cada uno; el total de cada delta queda igual.
+        """
+        montos = PedidoEvento.objects.using(db).filter(
+            creado_en__lt=timezone.now() - datetime.timedelta(days=dias),
+            estado_anterior=F('estado_nuevo'),
+        )
+        grupos = list(
+            montos.values('pedido_id')
+            .annotate(eventos=Count('id'), ultimo=Max('id'), venta=Sum('delta_venta'), abonado=Sum('delta_abonado'))
+            .filter(eventos__gt=1).order_by()
+        )
+        fundidos = sum(grupo['eventos'] - 1 for grupo in grupos)
+        if simulacion:
+            return fundidos
+
+        for inicio in range(0, len(grupos), lote):
+            tanda = grupos[inicio:inicio + lote]
+            with transaction.atomic(using=db):
+                PedidoEvento.objects.using(db).bulk_update([
+                    PedidoEvento(pk=grupo['ultimo'], delta_venta=grupo['venta'], delta_abonado=grupo['abonado'])
+                    for grupo in tanda
+                ], ['delta_venta', 'delta_abonado'], batch_size=500)
+                montos.filter(pedido_id__in=[grupo['pedido_id'] for grupo in tanda]).exclude(
+                    pk__in=[grupo['ultimo'] for grupo in tanda]
+                ).delete()
+        return fundidos
+
+    def handle(self, *args, **options):
+        db = options['database']
+        simulacion = options['dry_run']
+        verbo = 'se borrarían' if simulacion else 'borrados'
+
+        if options['retencion']:
+            borrados = self.retener(db, options['retencion'], options['lote'], simulacion)
+            self.stdout.write(f"Eventos de más de {options['retencion']} días {verbo}: {borrados}.")
+        if options['compactar']:
+            fundidos = self.compactar(db, options['compactar'], options['lote'], simulacion)
+            verbo = 'se fundirían' if simulacion else 'fundidos'
+            self.stdout.write(f"Cambios de montos de más de {options['compactar']} días {verbo}: {fundidos}.")
+
+        total = PedidoEvento.objects.using(db).count()
+        self.stdout.write(self.style.SUCCESS(f"Historial: {total} eventos."))
@@ -0,0 +1,124 @@
+import re
+import shutil
+import subprocess
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from pedidos import estaticos
+
+STATIC = Path(settings.BASE_DIR) / 'pedidos' / 'static'
+
+# Google Fonts responde .woff2 solo a navegadores que lo soportan
+AGENTE = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+# url(...) de un CSS, sin data: URIs
+URL_CSS = re.compile(r"""url\(\s*['"]?(?!data:)([^'")]+?)['"]?\s*\)""")
+
+
+def _descargar(url):
+    peticion = urllib.request.Request(url, headers={'User-Agent': AGENTE})
+    try:
+        with urllib.request.urlopen(peticion, timeout=30) as respuesta:
+            return respuesta.read()
+    except OSError as error:
+        raise CommandError(f'No se pudo descargar {url}: {error}')
+
+
+def _guardar(ruta, contenido):
+    destino = STATIC / ruta
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_bytes(contenido)
+
+
+class Command(BaseCommand):
+    help = (
+        "Descarga jQuery, select2, summernote y las fuentes a pedidos/static/, "
+        "compila el CSS de Tailwind (purgado y minificado) y corre collectstatic, "
+        "que agrega el hash a los nombres y genera las copias .gz/.br."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true', help='Vuelve a descargar lo que ya existe.')
+        parser.add_argument('--sin-css', action='store_true', help='No compila Tailwind (no requiere npm).')
+        parser.add_argument('--sin-collectstatic', action='store_true')
+
+    # ==========================================
+    # TERCEROS
+    # ==========================================
+
+    def vendor(self, forzar):
+        for ruta, url in estaticos.ARCHIVOS.items():
+            if (STATIC / ruta).exists() and not forzar:
+                continue
+            contenido = _descargar(url)
+            _guardar(ruta, contenido)
+            self.stdout.write(f'  {ruta} ({len(contenido) // 1024} KB)')
+            if ruta.endswith('.css'):
+                self.recursos_css(ruta, url, contenido.decode('utf-8'))
+
+    def recursos_css(self, ruta, url, css):
+        """Fuentes e imágenes referenciadas con rutas relativas."""
+        base = Path(ruta).parent
+        for relativa in set(URL_CSS.findall(css)):
+            limpia = relativa.split('#')[0].split('?')[0]
+            if not limpia or '//' in limpia:
+                continue
+            destino = (base / limpia).as_posix()
+            _guardar(destino, _descargar(urllib.parse.urljoin(url, limpia)))
+            self.stdout.write(f'    {destino}')
+
+    def fuentes(self, forzar):
+        if (STATIC / estaticos.CSS_FUENTES).exists() and not forzar:
+            return
+        carpeta = Path(estaticos.CSS_FUENTES).parent
+        hojas = []
+        for url in estaticos.FUENTES:
+            css = _descargar(url).decode('utf-8')
+            # Cada .woff2 se guarda local y el CSS apunta a la copia
+            for remota in set(URL_CSS.findall(css)):
+                nombre = Path(urllib.parse.urlparse(remota).path).name
+                _guardar((carpeta / nombre).as_posix(), _descargar(remota))
+                css = css.replace(remota, nombre)
+            hojas.append(css)
+        _guardar(estaticos.CSS_FUENTES, '\n'.join(hojas).encode('utf-8'))
+        self.stdout.write(f'  {estaticos.CSS_FUENTES}')
+
+    # ==========================================
+    # TAILWIND
+    # ==========================================
+
+    def css(self):
+        npm = shutil.which('npm')
+        if npm is None:
+            raise CommandError('Falta npm para compilar Tailwind (o use --sin-css).')
+        raiz = Path(settings.BASE_DIR)
+        if not (raiz / 'node_modules' / 'tailwindcss').exists():
+            subprocess.run([npm, 'install', '--no-audit', '--no-fund'], cwd=raiz, check=True)
+        subprocess.run([npm, 'run', 'build:css'], cwd=raiz, check=True)
+        tamano = (STATIC / estaticos.CSS_TAILWIND).stat().st_size
+        self.stdout.write(f'  {estaticos.CSS_TAILWIND} ({tamano // 1024} KB)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING('Archivos de terceros'))
+        self.vendor(options['forzar'])
+        self.fuentes(options['forzar'])
+
+        if not options['sin_css']:
+            self.stdout.write(self.style.MIGRATE_HEADING('CSS de Tailwind'))
+            try:
+                self.css()
+            except subprocess.CalledProcessError as error:
+                raise CommandError(f'Falló el build de Tailwind: {error}')
+
+        if not options['sin_collectstatic']:
+            self.stdout.write(self.style.MIGRATE_HEADING('collectstatic'))
+            call_command('collectstatic', interactive=False, verbosity=options['verbosity'])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Listo. Reinicie el servidor para que las plantillas usen los archivos propios.'
+        ))
@@ -0,0 +1,82 @@
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pedidos import importacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa clientes y pedidos desde un CSV o JSONL, por lotes con bulk_create. "
+        "Los clientes se deduplican por teléfono normalizado; las filas inválidas "
+        "se informan y no detienen la importación."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument(
+            '--formato', choices=sorted(importacion.LECTORES),
+            help='Por defecto se deduce de la extensión del archivo.',
+        )
+        parser.add_argument(
+            '--lote', type=int, default=importacion.TAMANO_LOTE,
+            help='Filas válidas por transacción.',
+        )
+        parser.add_argument('--rechazados', help='CSV donde escribir las filas rechazadas y su motivo.')
+        parser.add_argument('--dry-run', action='store_true', help='Solo valida: no escribe nada.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        formato = options['formato'] or os.path.splitext(ruta)[1].lstrip('.').lower()
+        if formato not in importacion.LECTORES:
+            raise CommandError(f"Formato no soportado: '{formato}'. Use --formato csv o jsonl.")
+        if options['lote'] < 1:
+            raise CommandError("--lote debe ser mayor que cero.")
+
+        try:
+            # utf-8-sig: acepta el BOM que agrega la exportación CSV
+            archivo = open(ruta, encoding='utf-8-sig', newline='')
+        except OSError as error:
+            raise CommandError(f"No se pudo abrir {ruta}: {error}")
+
+        reporte = escritor = None
+        if options['rechazados']:
+            reporte = open(options['rechazados'], 'w', encoding='utf-8', newline='')
+            escritor = csv.writer(reporte)
+            escritor.writerow(['linea', 'errores', 'datos'])
+
+        def al_rechazar(numero, errores, datos):
+            if escritor:
+                escritor.writerow([numero, errores, json.dumps(datos, ensure_ascii=False)])
+            elif importador.rechazadas <= 20:
+                self.stderr.write(f"  línea {numero}: {errores}")
+
+        importador = importacion.Importador(
+            using=options['database'],
+            lote=options['lote'],
+            simular=options['dry_run'],
+            al_rechazar=al_rechazar,
+        )
+        inicio = time.perf_counter()
+        try:
+            with archivo:
+                importador.importar(importacion.LECTORES[formato](archivo))
+        finally:
+            if reporte:
+                reporte.close()
+        segundos = time.perf_counter() - inicio
+
+        if importador.rechazadas and escritor:
+            self.stderr.write(f"{importador.rechazadas} filas rechazadas, detalle en {options['rechazados']}.")
+        elif importador.rechazadas > 20:
+            self.stderr.write(f"  ... y {importador.rechazadas - 20} más (use --rechazados para verlas todas).")
+
+        accion = "validadas (simulación)" if options['dry_run'] else "importadas"
+        self.stdout.write(self.style.SUCCESS(
+            f"{importador.leidas - importador.rechazadas} de {importador.leidas} filas {accion} en {segundos:.1f} s: "
+            f"{importador.clientes_creados} clientes nuevos, {importador.pedidos_creados} pedidos."
+        ))
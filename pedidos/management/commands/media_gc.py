@@ -0,0 +1,90 @@
+import datetime
+import posixpath
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from pedidos import imagenes
+from pedidos.almacenamiento import almacenamiento_pedidos
+from pedidos.models import ArchivoMedia, Pedido
+
+
+def _recorrer(storage, carpeta, excluir=()):
+    """Rutas de todos los archivos bajo `carpeta` (recursivo)."""
+    if not storage.exists(carpeta):
+        return
+    directorios, archivos = storage.listdir(carpeta)
+    for archivo in archivos:
+        yield posixpath.join(carpeta, archivo)
+    for directorio in directorios:
+        ruta = posixpath.join(carpeta, directorio)
+        if ruta not in excluir:
+            yield from _recorrer(storage, ruta, excluir)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula la cuenta de referencias de las imágenes de pedidos y borra "
+        "los archivos (y variantes) que ningún pedido usa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Solo informa: no borra ni corrige nada.')
+        parser.add_argument(
+            '--min-edad', type=int, default=60,
+            help='Minutos de antigüedad mínima para borrar (protege subidas en curso).',
+        )
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        db = options['database']
+        simulacion = options['dry_run']
+        limite = timezone.now() - datetime.timedelta(minutes=options['min_edad'])
+
+        # 1. La tabla de pedidos manda: se corrigen las cuentas desfasadas
+        reales = dict(
+            Pedido.objects.using(db)
+            .exclude(imagen_referencia='').exclude(imagen_referencia__isnull=True)
+            .values_list('imagen_referencia').annotate(total=Count('id')).order_by()
+        )
+        guardadas = dict(ArchivoMedia.objects.using(db).values_list('nombre', 'referencias'))
+        corregidas = {nombre: total for nombre, total in reales.items() if guardadas.get(nombre) != total}
+        sobrantes = set(guardadas) - set(reales)
+        if not simulacion:
+            for nombre, total in corregidas.items():
+                ArchivoMedia.objects.using(db).update_or_create(nombre=nombre, defaults={'referencias': total})
+            ArchivoMedia.objects.using(db).filter(nombre__in=sobrantes).delete()
+        self.stdout.write(f"Cuentas corregidas: {len(corregidas)}, filas sin pedidos: {len(sobrantes)}.")
+
+        # 2. Archivos huérfanos: originales sin pedido y variantes sin huella viva
+        huellas = set(
+            Pedido.objects.using(db).exclude(imagen_hash__isnull=True).values_list('imagen_hash', flat=True)
+        )
+        storage = almacenamiento_pedidos()
+        huerfanos = [
+            (storage, nombre)
+            for nombre in _recorrer(storage, 'pedidos', excluir={imagenes.CARPETA_VARIANTES})
+            if nombre not in reales
+        ]
+        huerfanos += [
+            (default_storage, nombre)
+            for nombre in _recorrer(default_storage, imagenes.CARPETA_VARIANTES)
+            if posixpath.basename(nombre).split('-')[0] not in huellas
+        ]
+
+        total_bytes = borrados = 0
+        for storage_archivo, nombre in huerfanos:
+            if storage_archivo.get_modified_time(nombre) > limite:
+                continue
+            total_bytes += storage_archivo.size(nombre)
+            borrados += 1
+            self.stdout.write(f"  {'(simulación) ' if simulacion else ''}{nombre}")
+            if not simulacion:
+                storage_archivo.delete(nombre)
+
+        accion = "se borrarían" if simulacion else "borrados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{borrados} archivos huérfanos {accion} ({total_bytes / 1024 / 1024:.1f} MB)."
+        ))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from pedidos.models import Cliente, normalizar_telefono
+
+
+class Command(BaseCommand):
+    help = "Recalcula Cliente.telefono_normalizado por lotes (para filas cargadas sin pasar por save())."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help='Clientes leídos por lote.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        db = options['database']
+        clientes = Cliente.objects.using(db).only('pk', 'telefono', 'telefono_normalizado').order_by('pk')
+
+        revisados = actualizados = 0
+        ultimo = 0
+        while True:
+            # Paginación por pk: cada lote cuesta lo mismo aunque la tabla sea enorme
+            lote = list(clientes.filter(pk__gt=ultimo)[:options['lote']])
+            if not lote:
+                break
+
+            cambiados = []
+            # bulk_update no pasa por auto_now: sin esto la versión del cache
+            # (y el ETag) no cambia y el autocompletado sigue con el dato viejo
+            ahora = timezone.now()
+            for cliente in lote:
+                normalizado = normalizar_telefono(cliente.telefono)
+                if cliente.telefono_normalizado != normalizado:
+                    cliente.telefono_normalizado = normalizado
+                    cliente.actualizado_en = ahora
+                    cambiados.append(cliente)
+
+            if cambiados:
+                with transaction.atomic(using=db):
+                    Cliente.objects.using(db).bulk_update(cambiados, ['telefono_normalizado', 'actualizado_en'])
+
+            revisados += len(lote)
+            actualizados += len(cambiados)
+            ultimo = lote[-1].pk
+            self.stdout.write(f"\r  revisados {revisados} clientes, {actualizados} actualizados", ending='')
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Teléfonos normalizados: {actualizados} de {revisados} clientes actualizados."
+        ))
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Min
+
+from pedidos import imagenes
+from pedidos.models import Pedido
+
+
+def _procesar(pk, using):
+    try:
+        return imagenes.procesar_pedido(pk, using=using)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Normaliza las imágenes de referencia existentes y genera sus variantes WebP/JPEG."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help='Reprocesa también las que ya tienen variantes.')
+        parser.add_argument('--hilos', type=int, default=4, help='Con 1 se procesa en el hilo principal.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        db = options['database']
+        pedidos = Pedido.objects.using(db).exclude(imagen_referencia='').exclude(imagen_referencia__isnull=True)
+        if not options['todas']:
+            pedidos = pedidos.filter(imagen_hash__isnull=True)
+
+        # Un archivo por grupo: los pedidos duplicados comparten la imagen
+        ids = list(
+            pedidos.order_by().values('imagen_referencia')
+            .annotate(primero=Min('pk')).values_list('primero', flat=True)
+        )
+        self.stdout.write(f"{len(ids)} imágenes por procesar.")
+
+        procesadas = errores = 0
+        if options['hilos'] > 1:
+            pool = ThreadPoolExecutor(max_workers=options['hilos'])
+            resultados = [pool.submit(_procesar, pk, db) for pk in ids]
+        else:
+            pool = None
+            resultados = ids
+
+        for resultado in resultados:
+            try:
+                if pool:
+                    resultado.result()
+                else:
+                    imagenes.procesar_pedido(resultado, using=db)
+                procesadas += 1
+            except Exception as error:
+                errores += 1
+                self.stderr.write(f"  error: {error}")
+            self.stdout.write(f"\r  {procesadas + errores}/{len(ids)}", ending='')
+
+        if pool:
+            pool.shutdown()
+        self.stdout.write('')
+        estilo = self.style.WARNING if errores else self.style.SUCCESS
+        self.stdout.write(estilo(f"Imágenes procesadas: {procesadas}, con error: {errores}."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pedidos.kpis import reconstruir_contadores, verificar_contadores
+
+
+class Command(BaseCommand):
+    help = "Recalcula los contadores KPI materializados y verifica que cuadren con los pedidos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--solo-verificar',
+            action='store_true',
+            help='No modifica nada: solo informa diferencias (termina con error si las hay).',
+        )
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        db = options['database']
+
+        if options['solo_verificar']:
+            diferencias = verificar_contadores(using=db)
+            for diferencia in diferencias:
+                self.stdout.write(diferencia)
+            if diferencias:
+                raise CommandError(f"{len(diferencias)} contadores no cuadran. Ejecute rebuild_kpis sin --solo-verificar.")
+            self.stdout.write(self.style.SUCCESS("Los contadores KPI cuadran con los pedidos."))
+            return
+
+        reconstruir_contadores(using=db)
+
+        diferencias = verificar_contadores(using=db)
+        if diferencias:
+            raise CommandError("Los contadores siguen sin cuadrar tras la reconstrucción: " + "; ".join(diferencias))
+        self.stdout.write(self.style.SUCCESS("Contadores KPI reconstruidos y verificados."))
@@ -0,0 +1,142 @@
+"""
+Métricas por vista: tiempo total, consultas SQL, tiempo en SQL y tamaño de
+la respuesta de cada petición.
+
+Se guardan en memoria del proceso (cada worker tiene las suyas), con una
+ventana de las últimas PEDIDOS_METRICAS_MUESTRAS peticiones por vista: la
+memoria no crece con el tráfico y los percentiles reflejan lo reciente.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+CAMPOS = ('tiempo_ms', 'consultas', 'sql_ms', 'bytes')
+PERCENTILES = (50, 95, 99)
+
+_series = {}
+_lock = threading.Lock()
+
+
+def percentil(valores, p):
+    """Percentil `p` (0-100) por el método del rango más cercano."""
+    if not valores:
+        return 0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def _maximo_muestras():
+    return getattr(settings, 'PEDIDOS_METRICAS_MUESTRAS', 500)
+
+
+def registrar(vista, tiempo_ms, consultas, sql_ms, tamano):
+    with _lock:
+        serie = _series.get(vista)
+        if serie is None:
+            # [peticiones totales, ventana de muestras recientes]
+            serie = _series[vista] = [0, deque(maxlen=_maximo_muestras())]
+        serie[0] += 1
+        serie[1].append((tiempo_ms, consultas, sql_ms, tamano))
+
+
+def resumen():
+    """{vista: {'peticiones', 'muestras', campo: {p50, p95, p99, max}}}"""
+    with _lock:
+        copia = {vista: (total, list(muestras)) for vista, (total, muestras) in _series.items()}
+
+    datos = {}
+    for vista, (total, muestras) in sorted(copia.items()):
+        datos[vista] = {'peticiones': total, 'muestras': len(muestras)}
+        for posicion, campo in enumerate(CAMPOS):
+            valores = [muestra[posicion] for muestra in muestras]
+            datos[vista][campo] = {
+                **{f'p{p}': round(percentil(valores, p), 2) for p in PERCENTILES},
+                'max': round(max(valores, default=0), 2),
+            }
+    return datos
+
+
+def reiniciar():
+    with _lock:
+        _series.clear()
+
+
+class Medicion:
+    """Mide una petición; se engancha a las conexiones con execute_wrapper."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.sql_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - inicio) * 1000
+            self.consultas += 1
+
+    def _enganchar(self, pila):
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(self))
+
+    @contextmanager
+    def capturar(self):
+        with ExitStack() as pila:
+            self._enganchar(pila)
+            yield self
+
+    @asynccontextmanager
+    async def acapturar(self):
+        """
+        capturar() para la cadena async. Las conexiones son por hilo: el
+        wrapper se pone y se quita con sync_to_async, en el mismo hilo donde
+        corre el ORM de la petición (ASGI usa uno por petición).
+        """
+        pila = ExitStack()
+        await sync_to_async(self._enganchar)(pila)
+        try:
+            yield self
+        finally:
+            await sync_to_async(pila.close)()
+
+    @property
+    def tiempo_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def registrar(self, vista, tamano):
+        registrar(vista, self.tiempo_ms, self.consultas, self.sql_ms, tamano)
+
+    def server_timing(self):
+        return (
+            f'app;dur={self.tiempo_ms:.1f}, '
+            f'db;dur={self.sql_ms:.1f};desc="{self.consultas} consultas"'
+        )
+
+    def medir_flujo(self, contenido, vista):
+        """
+        Envuelve el contenido de una StreamingHttpResponse: sus consultas y su
+        tamaño recién se conocen cuando termina de enviarse.
+        """
+        tamano = 0
+        with self.capturar():
+            for parte in contenido:
+                tamano += len(parte)
+                yield parte
+        self.registrar(vista, tamano)
+
+    async def amedir_flujo(self, contenido, vista):
+        """medir_flujo() para contenido async (StreamingHttpResponse bajo ASGI)."""
+        tamano = 0
+        async with self.acapturar():
+            async for parte in contenido:
+                tamano += len(parte)
+                yield parte
+        self.registrar(vista, tamano)
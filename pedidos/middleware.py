@@ -1,21 +1,199 @@
+import logging
+import mimetypes
+import os
+import re
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import storages
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from . import metricas, registro
+
+logger = logging.getLogger(__name__)
+
+# Un X-Request-ID entrante (ej: del proxy) solo se acepta si es razonable
+_REQUEST_ID_VALIDO = re.compile(r'^[\w.-]{1,64}$')
+
 
+class MiddlewareSyncAsync:
+    """
+    Base para los middlewares propios: sirven igual bajo WSGI y ASGI. Con
+    una cadena async, __call__ devuelve la corrutina de aprocesar() y las
+    vistas async no pasan por un hilo solo por culpa del middleware.
+    """
+    sync_capable = True
+    async_capable = True
 
-class ErrorHandlingMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.aprocesar(request)
+        return self.procesar(request)
+
+
+class EstaticosMiddleware(MiddlewareSyncAsync):
+    """
+    Sirve lo que dejó collectstatic en STATIC_ROOT sin pasar por el resto
+    de la cadena. Los nombres con hash van con cache de un año (immutable) y,
+    si el navegador lo acepta, se envía la copia .br o .gz precomprimida.
+    Se desactiva con PEDIDOS_SERVIR_ESTATICOS=False (si los sirve el proxy).
+    """
+
+    CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.prefijo = '/' + settings.STATIC_URL.lstrip('/') if settings.STATIC_URL else None
+        self.raiz = settings.STATIC_ROOT
+        self.activo = bool(getattr(settings, 'PEDIDOS_SERVIR_ESTATICOS', True) and self.raiz and self.prefijo)
+        self._inmutables = None
+
+    def inmutables(self):
+        if self._inmutables is None:
+            almacenamiento = storages['staticfiles']
+            self._inmutables = almacenamiento.inmutables() if hasattr(almacenamiento, 'inmutables') else set()
+        return self._inmutables
+
+    def respuesta(self, request):
+        if not self.activo or request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefijo):
+            return None
+        nombre = request.path[len(self.prefijo):]
+        try:
+            ruta = safe_join(self.raiz, nombre)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(ruta):
+            return None
+
+        aceptadas = request.headers.get('Accept-Encoding', '')
+        codificacion = None
+        for nombre_codificacion, extension in self.CODIFICACIONES:
+            if nombre_codificacion in aceptadas and os.path.isfile(ruta + extension):
+                codificacion, ruta = nombre_codificacion, ruta + extension
+                break
+
+        estado = os.stat(ruta)
+        if not was_modified_since(request.headers.get('If-Modified-Since'), estado.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            tipo, _ = mimetypes.guess_type(nombre)
+            # Se leen enteros: son archivos chicos y así la misma respuesta
+            # sirve en WSGI y ASGI (sin iteradores síncronos)
+            with open(ruta, 'rb') as archivo:
+                response = HttpResponse(archivo.read(), content_type=tipo or 'application/octet-stream')
+            if codificacion:
+                response['Content-Encoding'] = codificacion
+        response['Last-Modified'] = http_date(estado.st_mtime)
+        response['Vary'] = 'Accept-Encoding'
+        if nombre in self.inmutables():
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = f"public, max-age={getattr(settings, 'PEDIDOS_ESTATICOS_MAX_AGE', 60)}"
+        return response
+
+    def procesar(self, request):
+        return self.respuesta(request) or self.get_response(request)
+
+    async def aprocesar(self, request):
+        return self.respuesta(request) or await self.get_response(request)
+
+
+class ContextoPeticionMiddleware(MiddlewareSyncAsync):
+    """
+    Asigna un request_id a cada petición (o respeta el X-Request-ID que
+    llegue) y deja la petición disponible para los registros de log.
+    """
+
+    def _entrar(self, request):
+        entrante = request.headers.get('X-Request-ID', '')
+        request.request_id = entrante if _REQUEST_ID_VALIDO.match(entrante) else uuid.uuid4().hex
+        return registro.peticion_actual.set(request)
+
+    def procesar(self, request):
+        token = self._entrar(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            registro.peticion_actual.reset(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+    async def aprocesar(self, request):
+        token = self._entrar(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            registro.peticion_actual.reset(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+
+class MetricasMiddleware(MiddlewareSyncAsync):
+    """
+    Registra tiempo, consultas SQL y tamaño de respuesta por vista (ver
+    pedidos/metricas.py) y, si PEDIDOS_SERVER_TIMING está activo, los
+    expone en la cabecera Server-Timing.
+    """
+
+    def procesar(self, request):
+        medicion = metricas.Medicion()
+        with medicion.capturar():
+            response = self.get_response(request)
+        return self._registrar(request, response, medicion)
+
+    async def aprocesar(self, request):
+        medicion = metricas.Medicion()
+        async with medicion.acapturar():
+            response = await self.get_response(request)
+        return self._registrar(request, response, medicion)
+
+    def _registrar(self, request, response, medicion):
+        # Solo URLs resueltas: así la cantidad de series está acotada
+        if request.resolver_match is not None:
+            vista = request.resolver_match.view_name
+            if response.streaming and response.is_async:
+                response.streaming_content = medicion.amedir_flujo(response.streaming_content, vista)
+            elif response.streaming:
+                response.streaming_content = medicion.medir_flujo(response.streaming_content, vista)
+            else:
+                medicion.registrar(vista, len(response.content))
+
+        if getattr(settings, 'PEDIDOS_SERVER_TIMING', False):
+            response['Server-Timing'] = medicion.server_timing()
+        return response
+
+
+class ErrorHandlingMiddleware(MiddlewareSyncAsync):
+    def procesar(self, request):
         try:
             response = self.get_response(request)
             return response
         except Exception as e:
             # Aquí capturamos cualquier error que ocurra en las vistas
-            print(f"🔴 Error capturado por Middleware: {str(e)}")  # Log en consola para ti
+            logger.exception("Error capturado por Middleware: %s", e)
 
             # Delegamos el manejo a nuestra función personalizada
             return self.handle_exception(request, e)
 
+    async def aprocesar(self, request):
+        try:
+            return await self.get_response(request)
+        except Exception as e:
+            logger.exception("Error capturado por Middleware: %s", e)
+            # El template puede tocar la sesión y el usuario (ORM síncrono)
+            return await sync_to_async(self.handle_exception)(request, e)
+
     def handle_exception(self, request, exception):
         """
         Renderiza la página de error 500 amigable en lugar de dejar que Django explote.
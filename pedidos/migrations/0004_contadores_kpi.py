@@ -0,0 +1,91 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def poblar_contadores(apps, schema_editor):
+    Pedido = apps.get_model("pedidos", "Pedido")
+    ContadorEstado = apps.get_model("pedidos", "ContadorEstado")
+    ContadorCliente = apps.get_model("pedidos", "ContadorCliente")
+    db = schema_editor.connection.alias
+
+    pedidos = Pedido.objects.using(db).order_by()
+    agregados = dict(
+        cantidad=Count("id"),
+        total_venta=Sum("valor_venta"),
+        total_pendiente=Sum(F("valor_venta") - F("valor_abonado")),
+    )
+    ContadorEstado.objects.using(db).bulk_create(
+        [ContadorEstado(**fila) for fila in pedidos.values("estado").annotate(**agregados)]
+    )
+    ContadorCliente.objects.using(db).bulk_create(
+        [ContadorCliente(**fila) for fila in pedidos.values("cliente_id").annotate(**agregados)],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pedidos", "0003_pedido_imagen_referencia"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContadorEstado",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[
+                            ("PENDIENTE", "Pendiente"),
+                            ("EN_PROCESO", "En Proceso"),
+                            ("TERMINADO", "Terminado"),
+                        ],
+                        max_length=20,
+                        unique=True,
+                    ),
+                ),
+                ("cantidad", models.IntegerField(default=0)),
+                ("total_venta", models.BigIntegerField(default=0)),
+                ("total_pendiente", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ContadorCliente",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("cantidad", models.IntegerField(db_index=True, default=0)),
+                ("total_venta", models.BigIntegerField(default=0)),
+                ("total_pendiente", models.BigIntegerField(default=0)),
+                (
+                    "cliente",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="contador",
+                        to="pedidos.cliente",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
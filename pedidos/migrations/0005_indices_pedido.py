@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pedidos", "0004_contadores_kpi"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pedido",
+            index=models.Index(
+                fields=["estado", "fecha_entrega"], name="pedido_estado_entrega_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pedido",
+            index=models.Index(
+                fields=["estado", "-fecha_solicitud"],
+                name="pedido_estado_solicitud_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pedido",
+            index=models.Index(
+                fields=["-fecha_solicitud"], name="pedido_solicitud_idx"
+            ),
+        ),
+    ]
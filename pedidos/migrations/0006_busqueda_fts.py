@@ -0,0 +1,117 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:40
+
+from django.db import migrations
+
+# Teléfono solo con dígitos (mismo criterio que Cliente.telefono_whatsapp)
+TELEFONO_NORMALIZADO = (
+    "replace(replace(replace(replace(replace(replace({col}, ' ', ''), '+', ''), "
+    "'-', ''), '(', ''), ')', ''), '.', '')"
+)
+
+CREAR_FTS = [
+    """
+    CREATE VIRTUAL TABLE pedidos_cliente_fts USING fts5(
+        nombre, telefono, email, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE pedidos_pedido_fts USING fts5(
+        resumen, detalles, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    # --- Sincronización de clientes ---
+    f"""
+    CREATE TRIGGER pedidos_cliente_fts_ai AFTER INSERT ON pedidos_cliente BEGIN
+        INSERT INTO pedidos_cliente_fts(rowid, nombre, telefono, email)
+        VALUES (new.id, new.nombre, {TELEFONO_NORMALIZADO.format(col='new.telefono')}, coalesce(new.email, ''));
+    END
+    """,
+    f"""
+    CREATE TRIGGER pedidos_cliente_fts_au AFTER UPDATE OF nombre, telefono, email ON pedidos_cliente BEGIN
+        UPDATE pedidos_cliente_fts
+        SET nombre = new.nombre,
+            telefono = {TELEFONO_NORMALIZADO.format(col='new.telefono')},
+            email = coalesce(new.email, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_cliente_fts_ad AFTER DELETE ON pedidos_cliente BEGIN
+        DELETE FROM pedidos_cliente_fts WHERE rowid = old.id;
+    END
+    """,
+    # --- Sincronización de pedidos ---
+    """
+    CREATE TRIGGER pedidos_pedido_fts_ai AFTER INSERT ON pedidos_pedido BEGIN
+        INSERT INTO pedidos_pedido_fts(rowid, resumen, detalles)
+        VALUES (new.id, new.resumen_pedido, new.detalles_pedido);
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_pedido_fts_au AFTER UPDATE OF resumen_pedido, detalles_pedido ON pedidos_pedido BEGIN
+        UPDATE pedidos_pedido_fts
+        SET resumen = new.resumen_pedido, detalles = new.detalles_pedido
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_pedido_fts_ad AFTER DELETE ON pedidos_pedido BEGIN
+        DELETE FROM pedidos_pedido_fts WHERE rowid = old.id;
+    END
+    """,
+    # --- Carga inicial ---
+    f"""
+    INSERT INTO pedidos_cliente_fts(rowid, nombre, telefono, email)
+    SELECT id, nombre, {TELEFONO_NORMALIZADO.format(col='telefono')}, coalesce(email, '')
+    FROM pedidos_cliente
+    """,
+    """
+    INSERT INTO pedidos_pedido_fts(rowid, resumen, detalles)
+    SELECT id, resumen_pedido, detalles_pedido FROM pedidos_pedido
+    """,
+]
+
+BORRAR_FTS = [
+    "DROP TRIGGER IF EXISTS pedidos_cliente_fts_ai",
+    "DROP TRIGGER IF EXISTS pedidos_cliente_fts_au",
+    "DROP TRIGGER IF EXISTS pedidos_cliente_fts_ad",
+    "DROP TRIGGER IF EXISTS pedidos_pedido_fts_ai",
+    "DROP TRIGGER IF EXISTS pedidos_pedido_fts_au",
+    "DROP TRIGGER IF EXISTS pedidos_pedido_fts_ad",
+    "DROP TABLE IF EXISTS pedidos_cliente_fts",
+    "DROP TABLE IF EXISTS pedidos_pedido_fts",
+]
+
+
+def soporta_fts5(connection):
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any("ENABLE_FTS5" in fila[0] for fila in cursor.fetchall())
+
+
+def crear_fts(apps, schema_editor):
+    # Sin FTS5 la búsqueda sigue funcionando con icontains (ver pedidos/busqueda.py)
+    if not soporta_fts5(schema_editor.connection):
+        return
+    for sentencia in CREAR_FTS:
+        schema_editor.execute(sentencia)
+
+
+def borrar_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sentencia in BORRAR_FTS:
+        schema_editor.execute(sentencia)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pedidos", "0005_indices_pedido"),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_fts, borrar_fts),
+    ]
@@ -0,0 +1,134 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:30
+
+import re
+
+from django.db import migrations, models
+
+LOTE = 2000
+
+# AddField reconstruye la tabla pedidos_cliente en SQLite y con ella se
+# pierden sus triggers FTS: se vuelven a crear, ahora copiando la columna
+# normalizada en vez de limpiar el teléfono con replace() en SQL.
+TRIGGER_BORRADO = """
+    CREATE TRIGGER pedidos_cliente_fts_ad AFTER DELETE ON pedidos_cliente BEGIN
+        DELETE FROM pedidos_cliente_fts WHERE rowid = old.id;
+    END
+    """
+
+TRIGGERS_NUEVOS = [
+    """
+    CREATE TRIGGER pedidos_cliente_fts_ai AFTER INSERT ON pedidos_cliente BEGIN
+        INSERT INTO pedidos_cliente_fts(rowid, nombre, telefono, email)
+        VALUES (new.id, new.nombre, new.telefono_normalizado, coalesce(new.email, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_cliente_fts_au
+    AFTER UPDATE OF nombre, telefono_normalizado, email ON pedidos_cliente BEGIN
+        UPDATE pedidos_cliente_fts
+        SET nombre = new.nombre,
+            telefono = new.telefono_normalizado,
+            email = coalesce(new.email, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    TRIGGER_BORRADO,
+]
+
+TELEFONO_SQL = (
+    "replace(replace(replace(replace(replace(replace({col}, ' ', ''), '+', ''), "
+    "'-', ''), '(', ''), ')', ''), '.', '')"
+)
+
+TRIGGERS_ANTERIORES = [
+    f"""
+    CREATE TRIGGER pedidos_cliente_fts_ai AFTER INSERT ON pedidos_cliente BEGIN
+        INSERT INTO pedidos_cliente_fts(rowid, nombre, telefono, email)
+        VALUES (new.id, new.nombre, {TELEFONO_SQL.format(col='new.telefono')}, coalesce(new.email, ''));
+    END
+    """,
+    f"""
+    CREATE TRIGGER pedidos_cliente_fts_au AFTER UPDATE OF nombre, telefono, email ON pedidos_cliente BEGIN
+        UPDATE pedidos_cliente_fts
+        SET nombre = new.nombre,
+            telefono = {TELEFONO_SQL.format(col='new.telefono')},
+            email = coalesce(new.email, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    TRIGGER_BORRADO,
+]
+
+
+def tiene_fts(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = 'pedidos_cliente_fts'"
+        )
+        return cursor.fetchone()[0] == 1
+
+
+def normalizar_telefonos(apps, schema_editor):
+    Cliente = apps.get_model("pedidos", "Cliente")
+    db = schema_editor.connection.alias
+
+    ultimo = 0
+    while True:
+        lote = list(
+            Cliente.objects.using(db)
+            .filter(pk__gt=ultimo)
+            .order_by("pk")
+            .only("pk", "telefono")[:LOTE]
+        )
+        if not lote:
+            break
+        for cliente in lote:
+            cliente.telefono_normalizado = re.sub(r"\D", "", cliente.telefono or "")
+        Cliente.objects.using(db).bulk_update(lote, ["telefono_normalizado"])
+        ultimo = lote[-1].pk
+
+
+def _cambiar_triggers(schema_editor, triggers):
+    if schema_editor.connection.vendor != "sqlite" or not tiene_fts(schema_editor.connection):
+        return
+    for sufijo in ("ai", "au", "ad"):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS pedidos_cliente_fts_{sufijo}")
+    for sentencia in triggers:
+        schema_editor.execute(sentencia)
+
+
+def usar_columna_normalizada(apps, schema_editor):
+    _cambiar_triggers(schema_editor, TRIGGERS_NUEVOS)
+    if schema_editor.connection.vendor == "sqlite" and tiene_fts(schema_editor.connection):
+        schema_editor.execute(
+            """
+            UPDATE pedidos_cliente_fts
+            SET telefono = (SELECT telefono_normalizado FROM pedidos_cliente WHERE id = pedidos_cliente_fts.rowid)
+            """
+        )
+
+
+def usar_replace_sql(apps, schema_editor):
+    _cambiar_triggers(schema_editor, TRIGGERS_ANTERIORES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pedidos", "0007_indice_cliente_nombre"),
+    ]
+
+    operations = [
+        # Al revertir, RemoveField también reconstruye la tabla: los triggers
+        # anteriores se recrean recién al final (esta operación va primero)
+        migrations.RunPython(migrations.RunPython.noop, usar_replace_sql),
+        migrations.AddField(
+            model_name="cliente",
+            name="telefono_normalizado",
+            field=models.CharField(
+                blank=True, db_index=True, default="", editable=False, max_length=20
+            ),
+        ),
+        migrations.RunPython(normalizar_telefonos, migrations.RunPython.noop),
+        migrations.RunPython(usar_columna_normalizada, migrations.RunPython.noop),
+    ]
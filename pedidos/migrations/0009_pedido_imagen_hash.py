@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pedidos", "0008_cliente_telefono_normalizado"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pedido",
+            name="imagen_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=16, null=True
+            ),
+        ),
+    ]
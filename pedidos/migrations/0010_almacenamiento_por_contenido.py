@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:45
+
+import pedidos.almacenamiento
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def contar_referencias(apps, schema_editor):
+    Pedido = apps.get_model("pedidos", "Pedido")
+    ArchivoMedia = apps.get_model("pedidos", "ArchivoMedia")
+    db = schema_editor.connection.alias
+
+    # Los archivos existentes conservan su nombre; solo se cuentan
+    ArchivoMedia.objects.using(db).bulk_create(
+        [
+            ArchivoMedia(nombre=fila["imagen_referencia"], referencias=fila["total"])
+            for fila in Pedido.objects.using(db)
+            .exclude(imagen_referencia="")
+            .exclude(imagen_referencia__isnull=True)
+            .values("imagen_referencia")
+            .annotate(total=Count("id"))
+            .order_by()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pedidos", "0009_pedido_imagen_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivoMedia",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("nombre", models.CharField(max_length=255, unique=True)),
+                ("referencias", models.IntegerField(default=0)),
+            ],
+        ),
+        # El storage no existe en la base: solo cambia el estado (en SQLite
+        # un AlterField reconstruiría la tabla y sus triggers FTS)
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="pedido",
+                    name="imagen_referencia",
+                    field=models.ImageField(
+                        blank=True,
+                        null=True,
+                        storage=pedidos.almacenamiento.almacenamiento_pedidos,
+                        upload_to="pedidos/",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(contar_referencias, migrations.RunPython.noop),
+    ]
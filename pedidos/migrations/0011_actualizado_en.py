@@ -0,0 +1,109 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:20
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+# AddField de un DateTimeField con auto_now reconstruye las tablas en SQLite
+# y se pierden sus triggers FTS: se recrean tal como quedaron en 0006 y 0008.
+TRIGGERS = [
+    """
+    CREATE TRIGGER pedidos_cliente_fts_ai AFTER INSERT ON pedidos_cliente BEGIN
+        INSERT INTO pedidos_cliente_fts(rowid, nombre, telefono, email)
+        VALUES (new.id, new.nombre, new.telefono_normalizado, coalesce(new.email, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_cliente_fts_au
+    AFTER UPDATE OF nombre, telefono_normalizado, email ON pedidos_cliente BEGIN
+        UPDATE pedidos_cliente_fts
+        SET nombre = new.nombre,
+            telefono = new.telefono_normalizado,
+            email = coalesce(new.email, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_cliente_fts_ad AFTER DELETE ON pedidos_cliente BEGIN
+        DELETE FROM pedidos_cliente_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_pedido_fts_ai AFTER INSERT ON pedidos_pedido BEGIN
+        INSERT INTO pedidos_pedido_fts(rowid, resumen, detalles)
+        VALUES (new.id, new.resumen_pedido, new.detalles_pedido);
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_pedido_fts_au AFTER UPDATE OF resumen_pedido, detalles_pedido ON pedidos_pedido BEGIN
+        UPDATE pedidos_pedido_fts
+        SET resumen = new.resumen_pedido, detalles = new.detalles_pedido
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_pedido_fts_ad AFTER DELETE ON pedidos_pedido BEGIN
+        DELETE FROM pedidos_pedido_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+
+def tiene_fts(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = 'pedidos_pedido_fts'"
+        )
+        return cursor.fetchone()[0] == 1
+
+
+def recrear_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite" or not tiene_fts(
+        schema_editor.connection
+    ):
+        return
+    for tabla in ("cliente", "pedido"):
+        for sufijo in ("ai", "au", "ad"):
+            schema_editor.execute(
+                f"DROP TRIGGER IF EXISTS pedidos_{tabla}_fts_{sufijo}"
+            )
+    for sentencia in TRIGGERS:
+        schema_editor.execute(sentencia)
+
+
+def desde_fecha_solicitud(apps, schema_editor):
+    # Sin historial, lo más cercano a la última modificación es el ingreso
+    Pedido = apps.get_model("pedidos", "Pedido")
+    Pedido.objects.using(schema_editor.connection.alias).update(
+        actualizado_en=F("fecha_solicitud")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pedidos", "0010_almacenamiento_por_contenido"),
+    ]
+
+    operations = [
+        # Al revertir, RemoveField también reconstruye las tablas
+        migrations.RunPython(migrations.RunPython.noop, recrear_triggers),
+        migrations.AddField(
+            model_name="cliente",
+            name="actualizado_en",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="pedido",
+            name="actualizado_en",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(desde_fecha_solicitud, migrations.RunPython.noop),
+        migrations.RunPython(recrear_triggers, migrations.RunPython.noop),
+    ]
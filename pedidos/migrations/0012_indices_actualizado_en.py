@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pedidos", "0011_actualizado_en"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cliente",
+            index=models.Index(
+                fields=["-actualizado_en"], name="cliente_actualizado_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pedido",
+            index=models.Index(
+                fields=["-actualizado_en"], name="pedido_actualizado_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pedidos", "0012_indices_actualizado_en"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PedidoEvento",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("creado_en", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "estado_anterior",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("PENDIENTE", "Pendiente"),
+                            ("EN_PROCESO", "En Proceso"),
+                            ("TERMINADO", "Terminado"),
+                        ],
+                        max_length=20,
+                        null=True,
+                    ),
+                ),
+                (
+                    "estado_nuevo",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("PENDIENTE", "Pendiente"),
+                            ("EN_PROCESO", "En Proceso"),
+                            ("TERMINADO", "Terminado"),
+                        ],
+                        max_length=20,
+                        null=True,
+                    ),
+                ),
+                ("delta_venta", models.IntegerField(default=0)),
+                ("delta_abonado", models.IntegerField(default=0)),
+                (
+                    "pedido",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="eventos",
+                        to="pedidos.pedido",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["pedido", "creado_en"], name="evento_pedido_fecha_idx"
+                    ),
+                    models.Index(fields=["creado_en"], name="evento_fecha_idx"),
+                ],
+            },
+        ),
+    ]
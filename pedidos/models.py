@@ -1,27 +1,47 @@
-from django.db import models
+import re
+
+from django.conf import settings
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from .almacenamiento import almacenamiento_pedidos
+
+
+def normalizar_telefono(telefono):
+    """
+    Deja solo los dígitos del teléfono (ej: '+56 9 1234-5678' -> '56912345678'),
+    listo para la URL de WhatsApp y para buscar por prefijo.
+    """
+    return re.sub(r'\D', '', telefono or '')
 
 class Cliente(models.Model):
     nombre = models.CharField(max_length=100)
     telefono = models.CharField(max_length=20, help_text='Formato WhatsApp')
     email = models.CharField(max_length=100, blank=True, null=True)
+    # Copia solo con dígitos de `telefono`, se recalcula en save()
+    telefono_normalizado = models.CharField(max_length=20, blank=True, default='', editable=False, db_index=True)
+    # Última modificación: clave del cache de fragmentos de sus pedidos y
+    # parte del ETag de las páginas de lectura
+    actualizado_en = models.DateTimeField(auto_now=True)
 
-    # --- Función que permite limpiar el número telefónico al vuelo para la API WhatsApp ---
-    @property
-    def telefono_whatsapp(self):
-        """
-        Toma el teléfono (ej: '+56 9 1234-5678') y lo deja limpio
-        para la URL de WhatsApp (ej: '56912345678').
-        """
-        if not self.telefono:
-            return ""
-
-        # Quitamos espacios, el signo +, guiones y paréntesis
-        limpio = self.telefono.replace(" ", "").replace("+", "").replace("-", "").replace("(", "").replace(")", "")
-        return limpio
+    def save(self, *args, **kwargs):
+        self.telefono_normalizado = normalizar_telefono(self.telefono)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'telefono' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'telefono_normalizado'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.nombre
 
+    class Meta:
+        indexes = [
+            # Listado de clientes paginado por cursor en orden alfabético
+            models.Index(fields=['nombre', 'id'], name='cliente_nombre_idx'),
+            # Última modificación de clientes (ETag de los listados)
+            models.Index(fields=['-actualizado_en'], name='cliente_actualizado_idx'),
+        ]
+
 class Pedido(models.Model):
     ESTADO_CHOICES = [
         ('PENDIENTE', 'Pendiente'),
@@ -37,11 +57,137 @@ class Pedido(models.Model):
     valor_abonado = models.IntegerField(default=0)
     fecha_solicitud = models.DateTimeField(auto_now_add=True)
     fecha_entrega = models.DateField()
-    imagen_referencia = models.ImageField(upload_to='pedidos/', blank=True, null=True)
+    imagen_referencia = models.ImageField(upload_to='pedidos/', storage=almacenamiento_pedidos, blank=True, null=True)
+    # Huella del contenido de la imagen procesada; nombra sus variantes
+    # (ver pedidos/imagenes.py). Vacía mientras no se procesa.
+    imagen_hash = models.CharField(max_length=16, blank=True, null=True, editable=False)
+    # Última modificación (auto_now en save; los UPDATE masivos la fijan a
+    # mano). Forma parte de la clave de las filas y tarjetas cacheadas y
+    # del ETag de las páginas de lectura.
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Trabajo semanal: estado activo + rangos de fecha de entrega
+            models.Index(fields=['estado', 'fecha_entrega'], name='pedido_estado_entrega_idx'),
+            # Listado filtrado por estado con el orden por defecto (más nuevo primero)
+            models.Index(fields=['estado', '-fecha_solicitud'], name='pedido_estado_solicitud_idx'),
+            # Listado sin filtro con el orden por defecto
+            models.Index(fields=['-fecha_solicitud'], name='pedido_solicitud_idx'),
+            # MAX(actualizado_en) para el ETag de listado y trabajo semanal
+            models.Index(fields=['-actualizado_en'], name='pedido_actualizado_idx'),
+        ]
+
+    # Campos cuyo valor "original" se compara con el nuevo al guardar o
+    # eliminar (contadores KPI e historial).
+    CAMPOS_RASTREADOS = ('estado', 'cliente_id', 'valor_venta', 'valor_abonado')
+
+    def releer_original(self, using):
+        """
+        Lee de la BD los valores que se van a sobrescribir. Se llama ya dentro
+        de la transacción (BEGIN IMMEDIATE toma el lock de escritura): dos
+        guardados del mismo pedido cargado a la vez no parten del mismo
+        estado viejo.
+        """
+        original = (
+            Pedido.objects.using(using)
+            .filter(pk=self.pk)
+            .values(*self.CAMPOS_RASTREADOS, 'imagen_referencia')
+            .first()
+        )
+        # Archivo de imagen guardado (para la cuenta de referencias de media)
+        self._imagen_original = (original.pop('imagen_referencia') or '') if original else None
+        self._original = original
+
+    def save(self, *args, **kwargs):
+        # Los contadores KPI se actualizan en post_save: la transacción
+        # garantiza que el pedido y sus contadores se guardan juntos.
+        using = kwargs.get('using') or router.db_for_write(Pedido, instance=self)
+        with transaction.atomic(using=using):
+            if self._state.adding:
+                self._original = self._imagen_original = None
+            else:
+                self.releer_original(using)
+            super().save(*args, **kwargs)
 
     @property
     def valor_pendiente(self):
         return self.valor_venta - self.valor_abonado
 
     def __str__(self):
-        return f"{self.resumen_pedido} - {self.cliente.nombre}"
\ No newline at end of file
+        return f"{self.resumen_pedido} - {self.cliente.nombre}"
+
+
+class ContadorEstado(models.Model):
+    """
+    Contador desnormalizado por estado (una fila por estado).
+    Se mantiene incrementalmente desde las señales de Pedido.
+    """
+    estado = models.CharField(max_length=20, choices=Pedido.ESTADO_CHOICES, unique=True)
+    cantidad = models.IntegerField(default=0)
+    total_venta = models.BigIntegerField(default=0)
+    total_pendiente = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.estado}: {self.cantidad}"
+
+
+class ContadorCliente(models.Model):
+    """
+    Contador desnormalizado por cliente (pedidos, ventas y deuda acumulada).
+    """
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, related_name='contador')
+    cantidad = models.IntegerField(default=0, db_index=True)
+    total_venta = models.BigIntegerField(default=0)
+    total_pendiente = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.cliente_id}: {self.cantidad}"
+
+
+class ArchivoMedia(models.Model):
+    """
+    Cuenta cuántos pedidos apuntan a cada archivo de imagen. Cuando llega
+    a cero el archivo se borra (ver pedidos/archivos.py).
+    """
+    nombre = models.CharField(max_length=255, unique=True)
+    referencias = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.referencias})"
+
+
+class PedidoEvento(models.Model):
+    """
+    Historial de un pedido, solo de inserción: quién y cuándo cambió su
+    estado o sus montos (ver pedidos/historial.py). Sobrevive al pedido y al
+    usuario: no hay FK en la BD. `manage.py compactar_historial` acota su
+    tamaño.
+    """
+    # Sin índices propios: los cubren los compuestos de Meta (o no hacen falta).
+    # Borrar un pedido o un usuario no toca el historial (sin SET_NULL, que
+    # recorrería la tabla entera): el id queda como registro de quién fue.
+    pedido = models.ForeignKey(
+        Pedido, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='eventos'
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        db_index=False, related_name='+',
+    )
+    creado_en = models.DateTimeField(default=timezone.now)
+    # None al crear (anterior) y al eliminar (nuevo)
+    estado_anterior = models.CharField(max_length=20, choices=Pedido.ESTADO_CHOICES, null=True, blank=True)
+    estado_nuevo = models.CharField(max_length=20, choices=Pedido.ESTADO_CHOICES, null=True, blank=True)
+    delta_venta = models.IntegerField(default=0)
+    delta_abonado = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Línea de tiempo de un pedido
+            models.Index(fields=['pedido', 'creado_en'], name='evento_pedido_fecha_idx'),
+            # Rangos de fechas (informes, retención y compactación)
+            models.Index(fields=['creado_en'], name='evento_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pedido_id}: {self.estado_anterior} -> {self.estado_nuevo}"
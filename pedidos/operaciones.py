@@ -0,0 +1,85 @@
+"""
+Operaciones masivas sobre pedidos (cambio de estado y borrado de una
+selección del listado).
+
+Cada operación corre en una transacción y cuesta un número fijo de
+consultas: los contadores KPI, el historial y las referencias de imágenes se
+actualizan una vez por lote en lugar de una vez por pedido.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import archivos, eventos, historial, kpis
+from .models import Pedido
+
+# Mientras es True, las señales de pedidos/signals.py no hacen el trabajo
+# por pedido: la operación masiva lo hace agrupado al final
+operacion_masiva = ContextVar('operacion_masiva', default=False)
+
+
+@contextmanager
+def en_operacion_masiva():
+    token = operacion_masiva.set(True)
+    try:
+        yield
+    finally:
+        operacion_masiva.reset(token)
+
+
+def cambiar_estado(ids, nuevo_estado, using='default'):
+    """Pasa los pedidos `ids` a `nuevo_estado`. Devuelve cuántos cambiaron."""
+    with transaction.atomic(using=using):
+        pedidos = Pedido.objects.using(using).filter(pk__in=ids)
+        antes = kpis.aportes_agrupados(pedidos)
+        if not antes:
+            return 0
+
+        # UPDATE no pasa por auto_now: sin esto las filas cacheadas no cambian
+        cambios = {'estado': nuevo_estado, 'actualizado_en': timezone.now()}
+        # REGLA DE NEGOCIO (igual que cambiar_estado_pedido): si se termina, se asume pagado
+        terminado = nuevo_estado == 'TERMINADO'
+        if terminado:
+            cambios['valor_abonado'] = F('valor_venta')
+        # El historial de todo el lote en un INSERT ... SELECT, antes de pisar los valores
+        historial.registrar_cambio_estado(pedidos, nuevo_estado, terminado, using=using)
+        actualizados = pedidos.update(**cambios)
+
+        # El aporte nuevo se deduce del anterior, sin volver a agrupar
+        despues = [
+            dict(grupo, estado=nuevo_estado, pendiente=0 if terminado else grupo['pendiente'])
+            for grupo in antes
+        ]
+        kpis.registrar_masivo(antes, despues, using=using)
+        # Sin releer las filas: el evento lleva el estado y, si se terminó,
+        # el pendiente en cero (lo demás no cambió)
+        transaction.on_commit(lambda: eventos.publicar_cambio_masivo(
+            ids, nuevo_estado, 0 if terminado else None, cambios['actualizado_en']
+        ), using=using)
+    return actualizados
+
+
+def eliminar(ids, using='default'):
+    """Elimina los pedidos `ids`. Devuelve cuántos se eliminaron."""
+    with transaction.atomic(using=using):
+        pedidos = Pedido.objects.using(using).filter(pk__in=ids)
+        antes = kpis.aportes_agrupados(pedidos)
+        if not antes:
+            return 0
+
+        imagenes = list(
+            pedidos.exclude(imagen_referencia='').exclude(imagen_referencia__isnull=True)
+            .values_list('imagen_referencia', 'imagen_hash').annotate(total=Count('id')).order_by()
+        )
+        historial.registrar_eliminacion(pedidos, using=using)
+        with en_operacion_masiva():
+            _, por_modelo = pedidos.delete()
+
+        kpis.registrar_masivo(antes, using=using)
+        for nombre, huella, total in imagenes:
+            archivos.registrar_cambio(nombre, '', using=using, hash_anterior=huella, cantidad=total)
+        transaction.on_commit(lambda: eventos.publicar_eliminados(ids), using=using)
+    return por_modelo.get(Pedido._meta.label, 0)
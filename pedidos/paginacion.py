@@ -0,0 +1,152 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class PaginaCursor:
+    """
+    Una página de resultados con cursores opacos hacia la página siguiente
+    y la anterior (None si no existen).
+    """
+
+    def __init__(self, objetos, siguiente=None, anterior=None):
+        self.objetos = objetos
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    @property
+    def tiene_otras_paginas(self):
+        return bool(self.siguiente or self.anterior)
+
+
+class PaginadorCursor:
+    """
+    Paginación por cursor (keyset): en vez de OFFSET filtra por el último
+    valor visto del campo de orden, usando el id como desempate. El costo
+    de cada página es el mismo sin importar cuán profunda sea, y no
+    requiere COUNT(*).
+    """
+
+    def __init__(self, queryset, orden, por_pagina=10):
+        self.queryset = queryset
+        self.orden = orden
+        self.por_pagina = por_pagina
+        self.campo = orden.lstrip('-')
+        self.descendente = orden.startswith('-')
+        self.modelo_campo = self._resolver_campo(queryset.model, self.campo)
+
+    @staticmethod
+    def _resolver_campo(modelo, ruta):
+        *relaciones, nombre = ruta.split('__')
+        for relacion in relaciones:
+            modelo = modelo._meta.get_field(relacion).related_model
+        return modelo._meta.get_field(nombre)
+
+    # ==========================================
+    # CURSORES
+    # ==========================================
+
+    def _valor(self, objeto):
+        for parte in self.campo.split('__'):
+            objeto = getattr(objeto, parte)
+        return objeto
+
+    def _codificar(self, objeto, direccion):
+        valor = self._valor(objeto)
+        datos = {
+            'o': self.orden,
+            'd': direccion,
+            'id': objeto.pk,
+            'v': valor.isoformat() if hasattr(valor, 'isoformat') else valor,
+        }
+        crudo = json.dumps(datos, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+    def _decodificar(self, cursor):
+        """Devuelve (dirección, valor, id) o None si el cursor no sirve."""
+        try:
+            relleno = '=' * (-len(cursor) % 4)
+            datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+            # Un cursor de otro orden no sirve para este listado
+            if datos['o'] != self.orden or datos['d'] not in ('sig', 'ant'):
+                return None
+            valor = self.modelo_campo.to_python(datos['v'])
+            # Sin valor no hay con qué comparar (campo__lt=None no es válido)
+            if valor is None:
+                return None
+            return datos['d'], valor, int(datos['id'])
+        except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+            return None
+
+    # ==========================================
+    # PÁGINAS
+    # ==========================================
+
+    def _despues_de(self, valor, pk, hacia_adelante):
+        # "Adelante" respeta el sentido del orden; "atrás" lo invierte
+        mayor = hacia_adelante != self.descendente
+        operador = 'gt' if mayor else 'lt'
+        if self.campo in ('id', 'pk'):
+            return Q(**{f'pk__{operador}': pk})
+        return (
+            Q(**{f'{self.campo}__{operador}': valor}) |
+            Q(**{self.campo: valor, f'pk__{operador}': pk})
+        )
+
+    def _ordenar(self, queryset, hacia_adelante):
+        descendente = self.descendente if hacia_adelante else not self.descendente
+        signo = '-' if descendente else ''
+        if self.campo in ('id', 'pk'):
+            return queryset.order_by(f'{signo}pk')
+        return queryset.order_by(f'{signo}{self.campo}', f'{signo}pk')
+
+    def pagina(self, cursor=None):
+        consulta, decodificado, hacia_adelante = self._consulta(cursor)
+        return self._armar(list(consulta), decodificado, hacia_adelante)
+
+    async def apagina(self, cursor=None):
+        """Versión async de pagina(), para las vistas async."""
+        consulta, decodificado, hacia_adelante = self._consulta(cursor)
+        return self._armar([objeto async for objeto in consulta], decodificado, hacia_adelante)
+
+    def _consulta(self, cursor):
+        decodificado = self._decodificar(cursor) if cursor else None
+        queryset = self.queryset
+
+        if decodificado is None:
+            hacia_adelante = True
+        else:
+            direccion, valor, pk = decodificado
+            hacia_adelante = direccion == 'sig'
+            queryset = queryset.filter(self._despues_de(valor, pk, hacia_adelante))
+
+        # Se pide una fila extra solo para saber si hay más páginas
+        return self._ordenar(queryset, hacia_adelante)[:self.por_pagina + 1], decodificado, hacia_adelante
+
+    def _armar(self, filas, decodificado, hacia_adelante):
+        hay_mas = len(filas) > self.por_pagina
+        objetos = filas[:self.por_pagina]
+
+        if hacia_adelante:
+            hay_siguiente, hay_anterior = hay_mas, decodificado is not None
+        else:
+            objetos.reverse()
+            hay_siguiente, hay_anterior = True, hay_mas
+
+        if not objetos:
+            return PaginaCursor([])
+
+        return PaginaCursor(
+            objetos,
+            siguiente=self._codificar(objetos[-1], 'sig') if hay_siguiente else None,
+            anterior=self._codificar(objetos[0], 'ant') if hay_anterior else None,
+        )
@@ -0,0 +1,177 @@
+"""
+Registro (logging) estructurado en JSON y sin bloquear las peticiones.
+
+- ColaHandler solo encola el registro: la escritura a disco/consola la
+  hace un QueueListener en su propio hilo.
+- FiltroContexto agrega request_id, vista, usuario y ruta de la petición
+  en curso (ver ContextoPeticionMiddleware).
+- FiltroRepetidos limita los errores idénticos por ventana de tiempo: una
+  avalancha del mismo error no satura disco ni CPU.
+"""
+import atexit
+import datetime
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+# Petición en curso (la fija ContextoPeticionMiddleware)
+peticion_actual = ContextVar('peticion_actual', default=None)
+
+# Atributos estándar de LogRecord: lo demás viene de extra={...}. `request`
+# (lo agrega django.request) se omite: ya van request_id, metodo y ruta.
+_ATRIBUTOS_ESTANDAR = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request'}
+
+
+# ==========================================
+# CONTEXTO DE LA PETICIÓN
+# ==========================================
+
+def _usuario(request):
+    usuario = getattr(request, 'user', None)
+    if usuario is None or not usuario.is_authenticated:
+        return None
+    return usuario.get_username()
+
+
+class FiltroContexto(logging.Filter):
+    """Copia al registro los datos de la petición en curso (si hay una)."""
+
+    def filter(self, record):
+        request = peticion_actual.get()
+        if request is not None:
+            record.request_id = getattr(request, 'request_id', None)
+            record.metodo = request.method
+            record.ruta = request.path
+            coincidencia = getattr(request, 'resolver_match', None)
+            record.vista = coincidencia.view_name if coincidencia else None
+            try:
+                record.usuario = _usuario(request)
+            except Exception:
+                # Sesión o base caídas: el registro no debe fallar por eso
+                record.usuario = None
+        return True
+
+
+# ==========================================
+# DEDUPLICACIÓN CON LÍMITE DE FRECUENCIA
+# ==========================================
+
+def _firma(record):
+    if record.exc_info and record.exc_info[0]:
+        tipo, _, rastro = record.exc_info
+        ultimo = traceback.extract_tb(rastro)[-1] if rastro else None
+        lugar = (ultimo.filename, ultimo.lineno) if ultimo else None
+        return (record.name, tipo.__name__, lugar)
+    return (record.name, record.levelno, record.getMessage())
+
+
+class FiltroRepetidos(logging.Filter):
+    """
+    Deja pasar a lo más `maximo` registros idénticos cada `ventana`
+    segundos. El primero que pasa tras una supresión informa cuántos se
+    omitieron (repeticiones_suprimidas). Solo afecta a WARNING o más.
+    """
+
+    def __init__(self, maximo=5, ventana=60, firmas=1000):
+        super().__init__()
+        self.maximo = maximo
+        self.ventana = ventana
+        self.firmas = firmas
+        self._vistos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+
+        firma = _firma(record)
+        ahora = time.monotonic()
+        with self._lock:
+            inicio, emitidos, suprimidos = self._vistos.pop(firma, (ahora, 0, 0))
+            if ahora - inicio >= self.ventana:
+                inicio, emitidos = ahora, 0
+            pasa = emitidos < self.maximo
+            if pasa:
+                if suprimidos:
+                    record.repeticiones_suprimidas = suprimidos
+                emitidos, suprimidos = emitidos + 1, 0
+            else:
+                suprimidos += 1
+            self._vistos[firma] = (inicio, emitidos, suprimidos)
+            # Memoria acotada: se olvidan las firmas más antiguas
+            while len(self._vistos) > self.firmas:
+                self._vistos.popitem(last=False)
+        return pasa
+
+
+# ==========================================
+# FORMATO JSON
+# ==========================================
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro."""
+
+    def format(self, record):
+        datos = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'origen': f'{record.module}:{record.lineno}',
+        }
+        if record.exc_info:
+            datos['traceback'] = self.formatException(record.exc_info)
+        elif getattr(record, 'traceback', None):
+            datos['traceback'] = record.traceback
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_ESTANDAR and clave not in datos and valor is not None:
+                datos[clave] = valor
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+# ==========================================
+# HANDLER CON COLA
+# ==========================================
+
+class ColaHandler(QueueHandler):
+    """
+    Encola los registros (sin esperar E/S) y los escribe en otro hilo con
+    FormatoJSON, a `archivo` o a stderr. Si la cola se llena los registros
+    nuevos se descartan en vez de frenar la petición.
+    """
+
+    def __init__(self, archivo=None, capacidad=10000, maximo_repetidos=5, ventana_repetidos=60):
+        super().__init__(queue.Queue(maxsize=capacidad))
+        destino = logging.FileHandler(archivo, encoding='utf-8') if archivo else logging.StreamHandler(sys.stderr)
+        destino.setFormatter(FormatoJSON())
+        self.descartados = 0
+        self.addFilter(FiltroContexto())
+        self.addFilter(FiltroRepetidos(maximo_repetidos, ventana_repetidos))
+        self.listener = QueueListener(self.queue, destino, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # El traceback se formatea aquí (en la petición, una sola vez por
+        # error que pasa el filtro): el LogRecord encolado no guarda frames
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.traceback = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        record.exc_text = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import archivos, eventos, historial, imagenes, kpis
+from .models import Pedido
+from .operaciones import operacion_masiva
+
+
+def _aporte_actual(pedido):
+    return kpis.aporte(pedido.estado, pedido.cliente_id, pedido.valor_venta, pedido.valor_abonado)
+
+
+def _montos(pedido):
+    return {'estado': pedido.estado, 'valor_venta': pedido.valor_venta, 'valor_abonado': pedido.valor_abonado}
+
+
+@receiver(pre_delete, sender=Pedido)
+def releer_valores_al_eliminar(sender, instance, using, **kwargs):
+    """
+    Lo que se descuenta al eliminar se lee dentro de la transacción del
+    borrado, como en Pedido.save(). En un borrado masivo no se usa.
+    """
+    if not operacion_masiva.get():
+        instance.releer_original(using)
+
+
+@receiver(pre_save, sender=Pedido)
+def detectar_imagen_nueva(sender, instance, **kwargs):
+    """
+    Un archivo recién subido aún no está guardado en el storage (_committed
+    es False): sus variantes quedan pendientes hasta que se procese.
+    """
+    imagen = instance.imagen_referencia
+    instance._hash_anterior = instance.imagen_hash
+    instance._imagen_nueva = bool(imagen) and not imagen._committed
+    if instance._imagen_nueva or not imagen:
+        instance.imagen_hash = None
+
+
+@receiver(post_save, sender=Pedido)
+def procesar_imagen_nueva(sender, instance, using, **kwargs):
+    # Fuera de la petición: el usuario no espera el redimensionado
+    if getattr(instance, '_imagen_nueva', False):
+        pk = instance.pk
+        transaction.on_commit(lambda: imagenes.encolar(pk, using=using), using=using)
+
+
+@receiver(post_save, sender=Pedido)
+def actualizar_referencias_imagen(sender, instance, created, using, **kwargs):
+    anterior = '' if created else (getattr(instance, '_imagen_original', None) or '')
+    archivos.registrar_cambio(
+        anterior, instance.imagen_referencia.name or '',
+        using=using, hash_anterior=getattr(instance, '_hash_anterior', None),
+    )
+
+
+@receiver(post_delete, sender=Pedido)
+def liberar_imagen_al_eliminar(sender, instance, using, **kwargs):
+    # En un borrado masivo esto se hace agrupado (pedidos/operaciones.py)
+    if operacion_masiva.get():
+        return
+    nombre = getattr(instance, '_imagen_original', None) or instance.imagen_referencia.name
+    archivos.registrar_cambio(nombre, '', using=using, hash_anterior=instance.imagen_hash)
+
+
+@receiver(post_save, sender=Pedido)
+def actualizar_contadores_al_guardar(sender, instance, created, using, **kwargs):
+    original = None if created else getattr(instance, '_original', None)
+    anterior = kpis.aporte(**original) if original else None
+    kpis.registrar_cambio(anterior, _aporte_actual(instance), using=using)
+
+
+@receiver(post_delete, sender=Pedido)
+def actualizar_contadores_al_eliminar(sender, instance, using, **kwargs):
+    if operacion_masiva.get():
+        return
+    # Se descuenta lo que el pedido aportaba según la BD (releído al borrar)
+    original = getattr(instance, '_original', None)
+    anterior = kpis.aporte(**original) if original else _aporte_actual(instance)
+    kpis.registrar_cambio(anterior, None, using=using)
+
+
+@receiver(post_save, sender=Pedido)
+def registrar_historial_al_guardar(sender, instance, created, using, **kwargs):
+    # Dentro del atomic de Pedido.save(): el evento se guarda con el cambio
+    original = None if created else getattr(instance, '_original', None)
+    if not created and original is None:
+        return
+    historial.registrar(instance.pk, original, _montos(instance), using=using)
+
+
+@receiver(post_delete, sender=Pedido)
+def registrar_historial_al_eliminar(sender, instance, using, **kwargs):
+    # En un borrado masivo las filas se escriben por lote (pedidos/operaciones.py)
+    if operacion_masiva.get():
+        return
+    original = getattr(instance, '_original', None) or _montos(instance)
+    historial.registrar(instance.pk, original, None, using=using)
+
+
+@receiver(post_save, sender=Pedido)
+def publicar_cambio(sender, instance, using, **kwargs):
+    # Al confirmar: un navegador que refresca al recibirlo ya ve el cambio
+    transaction.on_commit(lambda: eventos.publicar_pedido(instance), using=using)
+
+
+@receiver(post_delete, sender=Pedido)
+def publicar_eliminacion(sender, instance, using, **kwargs):
+    if operacion_masiva.get():
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: eventos.publicar_eliminados([pk]), using=using)
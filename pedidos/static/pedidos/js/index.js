@@ -27,6 +27,22 @@ document.addEventListener('DOMContentLoaded', function() {
     if (document.getElementById('modal-confirmacion')) {
         initDetailModals();
     }
+
+    // G. Scroll infinito del directorio de clientes
+    if (document.getElementById('clientes-cargar-mas')) {
+        initScrollClientes();
+    }
+
+    // H. Selección múltiple en el listado de pedidos
+    if (document.getElementById('form-masivo')) {
+        initAccionesMasivas();
+    }
+
+    // I. Cambios en vivo (dashboard y trabajo semanal)
+    const enVivo = document.querySelector('[data-en-vivo]');
+    if (enVivo && window.EventSource) {
+        initEnVivo(enVivo);
+    }
 });
 
 /* =========================================
@@ -68,10 +84,27 @@ function initThemeToggle() {
 function initPlugins() {
     // A. Configuración Select2
     if ($('.select2').length) {
-        $('.select2').select2({
-            width: '100%',
-            placeholder: "Seleccione una opción...",
-            allowClear: true
+        $('.select2').each(function() {
+            const opciones = {
+                width: '100%',
+                placeholder: "Seleccione una opción...",
+                allowClear: true
+            };
+
+            // Selects con autocompletado: las opciones se piden al servidor
+            // mientras el usuario escribe (con espera para no saturar la API)
+            const urlAutocompletar = this.getAttribute('data-autocompletar');
+            if (urlAutocompletar) {
+                opciones.ajax = {
+                    url: urlAutocompletar,
+                    dataType: 'json',
+                    delay: 250,
+                    cache: true,
+                    data: params => ({ q: params.term || '' })
+                };
+            }
+
+            $(this).select2(opciones);
         });
     }
 
@@ -329,4 +362,124 @@ function initDetailModals() {
     if(btnCancelar) {
         btnCancelar.addEventListener('click', closeModal);
     }
-}
\ No newline at end of file
+}
+
+/* =========================================
+   9. SCROLL INFINITO DE CLIENTES
+   ========================================= */
+function initScrollClientes() {
+    const boton = document.getElementById('clientes-cargar-mas');
+    const tbody = document.getElementById('clientes-filas');
+    let apiUrl = boton.getAttribute('data-api');
+    let cargando = false;
+
+    function cargarSiguiente() {
+        if (cargando || !apiUrl) return;
+        cargando = true;
+
+        fetch(apiUrl, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+            .then(response => response.json())
+            .then(data => {
+                tbody.insertAdjacentHTML('beforeend', data.html);
+                if (data.siguiente) {
+                    apiUrl = boton.getAttribute('data-api').split('?')[0] + data.siguiente;
+                } else {
+                    apiUrl = null;
+                    observador.disconnect();
+                    boton.remove();
+                }
+            })
+            .catch(error => console.error('Error:', error))
+            .finally(() => { cargando = false; });
+    }
+
+    // Sin JS el botón navega a la página siguiente; con JS agrega las filas
+    boton.addEventListener('click', function(e) {
+        e.preventDefault();
+        cargarSiguiente();
+    });
+
+    const observador = new IntersectionObserver(entradas => {
+        if (entradas.some(entrada => entrada.isIntersecting)) {
+            cargarSiguiente();
+        }
+    }, { rootMargin: '200px' });
+    observador.observe(boton);
+}
+
+/* =========================================
+   10. ACCIONES MASIVAS DEL LISTADO DE PEDIDOS
+   ========================================= */
+function initAccionesMasivas() {
+    const form = document.getElementById('form-masivo');
+    const barra = document.getElementById('acciones-masivas');
+    const contador = document.getElementById('seleccionados-cantidad');
+    const todos = document.getElementById('seleccionar-todos');
+    const casillas = Array.from(form.querySelectorAll('input.seleccion-pedido'));
+
+    function actualizarBarra() {
+        const marcadas = casillas.filter(casilla => casilla.checked).length;
+        contador.textContent = marcadas;
+        barra.classList.toggle('hidden', marcadas === 0);
+        barra.classList.toggle('flex', marcadas > 0);
+        todos.checked = marcadas > 0 && marcadas === casillas.length;
+        todos.indeterminate = marcadas > 0 && marcadas < casillas.length;
+    }
+
+    todos.addEventListener('change', function() {
+        casillas.forEach(casilla => { casilla.checked = todos.checked; });
+        actualizarBarra();
+    });
+    casillas.forEach(casilla => casilla.addEventListener('change', actualizarBarra));
+
+    // Confirmación antes de acciones destructivas (ej: eliminar)
+    form.addEventListener('submit', function(e) {
+        const confirmar = e.submitter && e.submitter.getAttribute('data-confirmar');
+        if (confirmar && !window.confirm(confirmar)) {
+            e.preventDefault();
+        }
+    });
+}
+
+/* =========================================
+   11. CAMBIOS EN VIVO (SERVER-SENT EVENTS)
+   ========================================= */
+function initEnVivo(contenedor) {
+    const fuente = new EventSource(contenedor.getAttribute('data-en-vivo'));
+    let refresco = null;
+
+    // Contadores, zonas e histograma dependen de todos los pedidos: la página
+    // se vuelve a pedir (GET condicional) y se reemplaza el contenido. Varios
+    // eventos seguidos se resuelven con una sola petición.
+    function refrescar() {
+        clearTimeout(refresco);
+        refresco = setTimeout(function() {
+            fetch(window.location.href, { cache: 'no-cache' })
+                .then(response => response.ok ? response.text() : null)
+                .then(html => {
+                    if (!html) return;
+                    const nuevo = new DOMParser().parseFromString(html, 'text/html').querySelector('[data-en-vivo]');
+                    if (nuevo && nuevo.innerHTML !== contenedor.innerHTML) {
+                        contenedor.innerHTML = nuevo.innerHTML;
+                    }
+                })
+                .catch(error => console.error('Error:', error));
+        }, 1000);
+    }
+
+    // La fila del pedido cambia al instante, antes del refresco
+    fuente.addEventListener('pedido', function(e) {
+        const evento = JSON.parse(e.data);
+        contenedor.querySelectorAll(`[data-pedido="${evento.id}"]`).forEach(fila => {
+            if (evento.eliminado) {
+                fila.remove();
+                return;
+            }
+            fila.querySelectorAll('[data-campo="estado"]').forEach(campo => {
+                campo.textContent = evento.etiqueta;
+            });
+        });
+        refrescar();
+    });
+    fuente.addEventListener('refrescar', refrescar);
+}
@@ -0,0 +1,18 @@
+from django import template
+from django.conf import settings
+from django.urls import reverse
+
+from pedidos import eventos
+
+register = template.Library()
+
+
+@register.simple_tag
+def url_eventos():
+    """
+    Flujo de cambios a partir del último evento, que la página ya refleja.
+    Vacío si los cambios en vivo están apagados (PEDIDOS_EN_VIVO).
+    """
+    if not settings.PEDIDOS_EN_VIVO:
+        return ''
+    return f"{reverse('eventos_pedidos')}?desde={eventos.canal.ultimo_id()}"
@@ -0,0 +1,11 @@
+from django import template
+
+from pedidos import estaticos
+
+register = template.Library()
+
+
+@register.simple_tag
+def estaticos_locales():
+    """True si CSS, JS y fuentes de terceros se sirven desde el propio sitio."""
+    return estaticos.locales()
@@ -0,0 +1,10 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+
+@register.simple_tag
+def fragmentos_ttl():
+    """Segundos para {% cache %} de filas y tarjetas de pedido (0 = sin cache)."""
+    return settings.PEDIDOS_FRAGMENTOS_TTL
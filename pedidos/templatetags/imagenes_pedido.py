@@ -0,0 +1,30 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from pedidos import imagenes
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(pedido, extension='webp'):
+    """Valor del atributo srcset con las variantes del pedido ('url 320w, url 960w')."""
+    return ', '.join(f'{url} {ancho}w' for url, ancho in imagenes.variantes(pedido, extension))
+
+
+@register.simple_tag
+def imagen_pedido(pedido, sizes='320px', **atributos):
+    """
+    <picture> con las variantes WebP (y JPEG de respaldo) del pedido. Mientras
+    la imagen no se procesa muestra el archivo original.
+    """
+    extra = format_html_join('', ' {}="{}"', atributos.items())
+    if not pedido.imagen_hash:
+        return format_html('<img src="{}"{}>', pedido.imagen_referencia.url, extra)
+
+    jpg = imagenes.variantes(pedido, 'jpg')
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" loading="lazy" decoding="async"{}></picture>',
+        srcset(pedido, 'webp'), sizes, jpg[0][0], srcset(pedido, 'jpg'), sizes, extra,
+    )
@@ -1,3 +1,1416 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import datetime
+import gzip
+import json
+import logging
+import posixpath
+import re
+import shutil
+import sys
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from . import busqueda, estaticos, eventos, exportacion, historial, imagenes, metricas, operaciones, registro, views
+from . import cache as cache_pedidos
+from . import checks
+from . import urls as pedidos_urls
+from .almacenamiento import EstaticosComprimidos
+from .decorators import transaccion_segura
+from .kpis import reconstruir_contadores, verificar_contadores
+from .models import ArchivoMedia, Cliente, ContadorEstado, Pedido, PedidoEvento
+from .paginacion import PaginadorCursor
+
+
+def sembrar_pedidos(cantidad, pedidos_por_cliente=5):
+    """Crea `cantidad` pedidos repartidos entre clientes (sin pasar por señales)."""
+    hoy = datetime.date.today()
+    estados = [opcion[0] for opcion in Pedido.ESTADO_CHOICES]
+    inicio = Pedido.objects.count()
+
+    clientes = Cliente.objects.bulk_create([
+        Cliente(
+            nombre=f'Cliente {inicio + i}',
+            telefono=f'+56 9 {inicio + i:08d}',
+            telefono_normalizado=f'569{inicio + i:08d}',
+        )
+        for i in range(0, cantidad, pedidos_por_cliente)
+    ])
+    Pedido.objects.bulk_create([
+        Pedido(
+            cliente=clientes[i // pedidos_por_cliente],
+            resumen_pedido=f'Pedido {inicio + i}',
+            detalles_pedido='Detalle',
+            estado=estados[i % len(estados)],
+            valor_venta=10000,
+            valor_abonado=2000,
+            # Repartidos entre atrasados, urgentes y futuros
+            fecha_entrega=hoy + datetime.timedelta(days=(i % 30) - 10),
+        )
+        for i in range(cantidad)
+    ])
+    reconstruir_contadores()
+
+
+class PresupuestoConsultasTests(TestCase):
+    """
+    Cada URL de pedidos/urls.py debe costar un número FIJO de consultas,
+    sin importar cuántos pedidos existan (detecta consultas N+1).
+    Las 2 primeras consultas de cada petición son la sesión y el usuario.
+    Las páginas con GET condicional suman una más: la versión para el ETag.
+    Lo que sale del cache de pedidos también (su versión se lee de la BD),
+    salvo en esas páginas, que reutilizan la del ETag.
+    """
+
+    TAMANOS = (10, 100, 1000)
+
+    # (nombre de la URL, método, presupuesto de consultas)
+    PRESUPUESTOS = [
+        ('dashboard', 'get', 6),
+        ('lista_pedidos', 'get', 5),
+        ('trabajo_semanal', 'get', 5),
+        ('lista_clientes', 'get', 6),
+        ('api_clientes', 'get', 3),
+        ('api_buscar_clientes', 'get', 4),
+        ('crear_pedido', 'get', 2),
+        ('crear_cliente', 'get', 2),
+        ('api_estadisticas_cache', 'get', 3),
+        ('api_metricas', 'get', 2),
+    ]
+
+    PRESUPUESTOS_PEDIDO = [
+        ('detalle_pedido', 'get', 4),
+        ('editar_pedido', 'get', 4),
+        ('eliminar_pedido', 'get', 3),
+    ]
+
+    PRESUPUESTOS_CLIENTE = [
+        ('editar_cliente', 'get', 3),
+        ('eliminar_cliente', 'get', 3),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        # La detección de FTS5 se hace una sola vez por proceso: no cuenta
+        busqueda.fts_disponible()
+
+    def assertPresupuesto(self, presupuesto, metodo, url, data=None):
+        # Se mide el camino "en frío": sin nada en el cache de pedidos
+        cache.clear()
+        with self.assertNumQueries(presupuesto):
+            respuesta = getattr(self.client, metodo)(url, data)
+        self.assertLess(respuesta.status_code, 400, url)
+
+    def test_presupuesto_fijo_por_url(self):
+        sembrados = 0
+        for tamano in self.TAMANOS:
+            sembrar_pedidos(tamano - sembrados)
+            sembrados = tamano
+            pedido = Pedido.objects.order_by('id').first()
+
+            for nombre, metodo, presupuesto in self.PRESUPUESTOS:
+                with self.subTest(url=nombre, pedidos=tamano):
+                    self.assertPresupuesto(presupuesto, metodo, reverse(nombre))
+
+            for nombre, metodo, presupuesto in self.PRESUPUESTOS_PEDIDO:
+                with self.subTest(url=nombre, pedidos=tamano):
+                    self.assertPresupuesto(presupuesto, metodo, reverse(nombre, args=[pedido.pk]))
+
+            for nombre, metodo, presupuesto in self.PRESUPUESTOS_CLIENTE:
+                with self.subTest(url=nombre, pedidos=tamano):
+                    self.assertPresupuesto(presupuesto, metodo, reverse(nombre, args=[pedido.cliente_id]))
+
+            with self.subTest(url='admin PedidoAdmin', pedidos=tamano):
+                self.assertPresupuesto(5, 'get', reverse('admin:pedidos_pedido_changelist'))
+
+            with self.subTest(url='lista_pedidos (filtrado)', pedidos=tamano):
+                self.assertPresupuesto(
+                    6, 'get', reverse('lista_pedidos'),
+                    {'estado': 'PENDIENTE', 'busqueda': 'Cliente', 'orden': 'cliente__nombre'},
+                )
+
+            with self.subTest(url='lista_pedidos (con cursor)', pedidos=tamano):
+                ultimo = Pedido.objects.order_by('id')[1]
+                cursor = PaginadorCursor(Pedido.objects.all(), 'id')._codificar(ultimo, 'ant')
+                self.assertPresupuesto(5, 'get', reverse('lista_pedidos'), {'orden': 'id', 'cursor': cursor})
+
+    def test_presupuesto_fijo_en_acciones(self):
+        # Cada escritura suma el INSERT de su fila de historial (PedidoEvento);
+        # guardar o eliminar un pedido existente relee sus valores en la transacción
+        for tamano in self.TAMANOS:
+            sembrar_pedidos(tamano - Pedido.objects.count())
+            pedido = Pedido.objects.filter(estado='PENDIENTE').order_by('id').first()
+
+            with self.subTest(url='cambiar_estado', pedidos=tamano):
+                self.assertPresupuesto(
+                    10, 'get', reverse('cambiar_estado', args=[pedido.pk, 'EN_PROCESO'])
+                )
+            with self.subTest(url='duplicar_pedido', pedidos=tamano):
+                self.assertPresupuesto(9, 'get', reverse('duplicar_pedido', args=[pedido.pk]))
+            with self.subTest(url='eliminar_pedido (POST)', pedidos=tamano):
+                self.assertPresupuesto(
+                    8, 'post', reverse('eliminar_pedido', args=[Pedido.objects.latest('id').pk])
+                )
+            with self.subTest(url='api_crear_cliente_rapido', pedidos=tamano):
+                self.assertPresupuesto(
+                    3, 'post', reverse('api_crear_cliente_rapido'),
+                    {'nombre': 'Cliente Rápido', 'telefono': '+56 9 0000 0000'},
+                )
+
+
+class PaginacionCursorTests(TestCase):
+    """El listado de pedidos se pagina por cursor: sin huecos ni repetidos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        # Muchas fechas de entrega repetidas para forzar el desempate por id
+        sembrar_pedidos(47)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        busqueda.fts_disponible()
+
+    def recorrer(self, parametros):
+        vistos, paginas = [], []
+        url = reverse('lista_pedidos') + '?' + parametros
+        while url:
+            respuesta = self.client.get(url)
+            paginas.append(respuesta.context['url_anterior'])
+            vistos.extend(pedido.pk for pedido in respuesta.context['pedidos'])
+            siguiente = respuesta.context['url_siguiente']
+            url = reverse('lista_pedidos') + siguiente if siguiente else None
+        return vistos, respuesta
+
+    def test_recorre_todos_los_pedidos_una_vez(self):
+        for orden in ('-fecha_solicitud', 'fecha_entrega', '-cliente__nombre', 'id'):
+            with self.subTest(orden=orden):
+                vistos, ultima = self.recorrer(f'orden={orden}')
+                self.assertEqual(len(vistos), 47)
+                self.assertEqual(set(vistos), set(Pedido.objects.values_list('pk', flat=True)))
+
+                # Volver una página atrás desde la última devuelve la penúltima
+                anterior = self.client.get(reverse('lista_pedidos') + ultima.context['url_anterior'])
+                self.assertEqual([p.pk for p in anterior.context['pedidos']], vistos[30:40])
+                self.assertIn(f'orden={orden}', anterior.context['url_siguiente'])
+
+    def test_conserva_filtros_y_total_aproximado(self):
+        vistos, ultima = self.recorrer('estado=PENDIENTE')
+        esperados = Pedido.objects.filter(estado='PENDIENTE').count()
+        self.assertEqual(len(vistos), esperados)
+        self.assertEqual(ultima.context['total_aproximado'], esperados)
+
+    def test_cursor_invalido_vuelve_a_la_primera_pagina(self):
+        # Bien formados, pero con un valor que no es del campo de orden
+        adulterados = [
+            base64.urlsafe_b64encode(json.dumps(
+                {'o': '-fecha_solicitud', 'd': 'sig', 'id': 1, 'v': valor}
+            ).encode()).decode()
+            for valor in ('nope', None)
+        ]
+        for cursor in ('no-es-un-cursor', *adulterados):
+            with self.subTest(cursor=cursor):
+                respuesta = self.client.get(reverse('lista_pedidos'), {'cursor': cursor})
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertIsNone(respuesta.context['url_anterior'])
+                self.assertEqual(len(respuesta.context['pedidos']), 10)
+
+
+class DirectorioClientesTests(TestCase):
+    """El directorio de clientes se entrega por páginas (HTML y JSON)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        sembrar_pedidos(120, pedidos_por_cliente=2)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        cache.clear()
+
+    def test_api_recorre_todo_el_directorio(self):
+        respuesta = self.client.get(reverse('lista_clientes'))
+        self.assertEqual(len(respuesta.context['clientes']), 25)
+        self.assertEqual(respuesta.context['total_clientes'], 60)
+
+        vistos = [cliente.pk for cliente in respuesta.context['clientes']]
+        siguiente = respuesta.context['url_siguiente']
+        while siguiente:
+            datos = self.client.get(reverse('api_clientes') + siguiente).json()
+            vistos.extend(cliente['id'] for cliente in datos['clientes'])
+            self.assertEqual(datos['html'].count('<tr'), len(datos['clientes']))
+            siguiente = datos['siguiente']
+
+        esperados = list(Cliente.objects.order_by('nombre', 'id').values_list('pk', flat=True))
+        self.assertEqual(vistos, esperados)
+
+    def test_estadisticas_usan_los_contadores(self):
+        self.client.get(reverse('lista_clientes'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Pedido.objects.filter(cliente=Cliente.objects.order_by('id').first()).delete()
+        respuesta = self.client.get(reverse('lista_clientes'))
+        self.assertEqual(respuesta.context['clientes_activos'], 59)
+        self.assertEqual(respuesta.context['top_cliente'].total_pedidos, 2)
+
+    def test_cambios_de_otro_proceso_se_ven(self):
+        self.client.get(reverse('lista_clientes'))
+        # Sin señales ni on_commit en este proceso: como si escribiera otro worker
+        Cliente.objects.bulk_create([Cliente(nombre='Nuevo', telefono='1')])
+        self.assertEqual(self.client.get(reverse('lista_clientes')).context['total_clientes'], 61)
+
+
+class TrabajoSemanalTests(TestCase):
+    """Zonas con Case/When e histograma de carga por día en consultas fijas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        sembrar_pedidos(90)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        cache.clear()
+        self.hoy = timezone.now().date()
+
+    def test_zonas_y_dia_peak(self):
+        contexto = self.client.get(reverse('trabajo_semanal')).context
+        activos = Pedido.objects.filter(estado__in=['PENDIENTE', 'EN_PROCESO'])
+        semana = self.hoy + datetime.timedelta(days=7)
+
+        def ids(pedidos):
+            return sorted(pedido.pk for pedido in pedidos)
+
+        self.assertEqual(ids(contexto['criticos']), ids(activos.filter(fecha_entrega__lt=self.hoy)))
+        self.assertEqual(ids(contexto['urgentes']), ids(activos.filter(fecha_entrega__range=[self.hoy, semana])))
+        self.assertEqual(ids(contexto['normales']), ids(activos.filter(fecha_entrega__gt=semana)))
+
+        fechas = [pedido.fecha_entrega for pedido in contexto['urgentes']]
+        self.assertEqual(contexto['dia_peak_cantidad'], max(fechas.count(fecha) for fecha in fechas))
+        self.assertEqual(fechas.count(contexto['dia_peak_date']), contexto['dia_peak_cantidad'])
+
+    @override_settings(PEDIDOS_CAPACIDAD_DIARIA=1)
+    def test_histograma_cubre_todo_el_horizonte(self):
+        contexto = self.client.get(reverse('trabajo_semanal'), {'dias': 20}).context
+        histograma = contexto['histograma']
+        self.assertEqual(contexto['horizonte'], 20)
+        self.assertEqual([dia['fecha'] for dia in histograma], [self.hoy + datetime.timedelta(days=n) for n in range(21)])
+        for dia in histograma:
+            esperado = Pedido.objects.filter(estado__in=['PENDIENTE', 'EN_PROCESO'], fecha_entrega=dia['fecha']).count()
+            self.assertEqual(dia['cantidad'], esperado, dia['fecha'])
+            self.assertEqual(dia['excede'], esperado > 1)
+        self.assertEqual(max(dia['altura'] for dia in histograma), 100)
+
+    def test_horizonte_acotado_y_consultas_fijas(self):
+        for dias, esperado in (('3', 7), ('500', 90), ('x', 14)):
+            with self.subTest(dias=dias):
+                self.assertEqual(self.client.get(reverse('trabajo_semanal'), {'dias': dias}).context['horizonte'], esperado)
+        sembrar_pedidos(300)
+        cache.clear()
+        # Sesión + usuario + versión (ETag y cache) + pedidos clasificados +
+        # carga por día
+        with self.assertNumQueries(5):
+            self.client.get(reverse('trabajo_semanal'), {'dias': 60})
+
+
+class ExportacionTests(TestCase):
+    """Las exportaciones salen en flujo, con los filtros del listado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        sembrar_pedidos(40, pedidos_por_cliente=4)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def descargar(self, nombre, formato, data=None):
+        respuesta = self.client.get(reverse(nombre, args=[formato]), data)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        self.assertIn('attachment;', respuesta['Content-Disposition'])
+        return b''.join(respuesta.streaming_content)
+
+    def filas_csv(self, contenido):
+        return list(csv.reader(StringIO(contenido.decode('utf-8-sig'))))
+
+    def test_csv_pedidos_respeta_filtros_y_orden(self):
+        filas = self.filas_csv(self.descargar('exportar_pedidos', 'csv', {'estado': 'PENDIENTE', 'orden': 'id'}))
+        esperados = list(Pedido.objects.filter(estado='PENDIENTE').order_by('id').values_list('id', flat=True))
+        self.assertEqual(filas[0][0], 'ID')
+        self.assertEqual([int(fila[0]) for fila in filas[1:]], esperados)
+        self.assertEqual({fila[4] for fila in filas[1:]}, {'PENDIENTE'})
+        self.assertEqual(filas[1][7], '8000')
+
+    def test_csv_clientes_con_totales(self):
+        filas = self.filas_csv(self.descargar('exportar_clientes', 'csv'))
+        self.assertEqual(len(filas), 1 + Cliente.objects.count())
+        self.assertEqual(filas[1][4:], ['4', '40000', '32000'])
+
+    def test_xlsx_es_un_libro_valido(self):
+        contenido = self.descargar('exportar_pedidos', 'xlsx')
+        with zipfile.ZipFile(BytesIO(contenido)) as libro:
+            self.assertIsNone(libro.testzip())
+            hoja = libro.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(hoja.count('<row>'), 1 + Pedido.objects.count())
+
+    def test_textos_no_se_evaluan_como_formulas(self):
+        cliente = Cliente.objects.create(nombre='=HYPERLINK("http://x","y")', telefono='+56 9 1111 1111')
+        Pedido.objects.create(
+            cliente=cliente, resumen_pedido='@SUM(A1)', detalles_pedido='-', valor_venta=100,
+            valor_abonado=0, fecha_entrega=datetime.date.today(),
+        )
+        filas = self.filas_csv(self.descargar('exportar_pedidos', 'csv', {'orden': '-id'}))
+        self.assertEqual(filas[1][1:4], ['\'=HYPERLINK("http://x","y")', "'+56 9 1111 1111", "'@SUM(A1)"])
+        self.assertEqual(filas[1][5], '100')
+        # Al volver a importar el archivo se quita el apóstrofo
+        self.assertEqual(exportacion.quitar_escape_formula(filas[1][1]), cliente.nombre)
+
+        contenido = self.descargar('exportar_pedidos', 'xlsx', {'orden': '-id'})
+        with zipfile.ZipFile(BytesIO(contenido)) as libro:
+            hoja = libro.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn("<t xml:space=\"preserve\">'@SUM(A1)</t>", hoja)
+        self.assertNotIn('<t xml:space="preserve">=', hoja)
+
+    def test_formato_desconocido(self):
+        respuesta = self.client.get(reverse('exportar_pedidos', args=['pdf']))
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_una_consulta_sin_importar_el_tamano(self):
+        # Sesión + usuario + la consulta de las filas (leída por bloques)
+        for nombre in ('exportar_pedidos', 'exportar_clientes'):
+            for formato in ('csv', 'xlsx'):
+                with self.subTest(url=nombre, formato=formato), self.assertNumQueries(3):
+                    self.descargar(nombre, formato)
+
+
+class ImportacionTests(TestCase):
+    """`importar` carga CSV/JSONL por lotes sin saltarse reglas ni contadores."""
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.directorio = directorio
+        self.existente = Cliente.objects.create(nombre='Ana', telefono='+56 9 1111 2222')
+
+    def archivo(self, nombre, contenido):
+        ruta = posixpath.join(self.directorio, nombre)
+        with open(ruta, 'w', encoding='utf-8') as destino:
+            destino.write(contenido)
+        return ruta
+
+    def importar(self, ruta, **opciones):
+        salida, errores = StringIO(), StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('importar', ruta, stdout=salida, stderr=errores, **opciones)
+        return salida.getvalue(), errores.getvalue()
+
+    def test_csv_deduplica_clientes_y_rechaza_abonos(self):
+        ruta = self.archivo('pedidos.csv', (
+            'nombre,telefono,resumen_pedido,valor_venta,valor_abonado,fecha_entrega,fecha_solicitud\n'
+            'Ana Pérez,56911112222,Poleras,10000,2000,2026-11-01,2024-03-05 10:00\n'
+            'Bruno,+56 9 3333 4444,Tazas,5000,,2026-11-02,\n'
+            'Bruno B.,(569) 3333-4444,Gorros,8000,9000,2026-11-03,\n'
+            'Bruno,+56 9 3333 4444,Llaveros,abc,0,2026-11-04,\n'
+            'Bruno,+56 9 3333 4444,Chapitas,3000,3000,2026-11-05,\n'
+        ))
+        rechazados = posixpath.join(self.directorio, 'rechazados.csv')
+        self.importar(ruta, lote=2, rechazados=rechazados)
+
+        self.assertEqual(Cliente.objects.count(), 2)
+        self.assertEqual(self.existente.pedido_set.get().resumen_pedido, 'Poleras')
+        self.assertEqual(Cliente.objects.get(telefono_normalizado='56933334444').pedido_set.count(), 2)
+        self.assertEqual(self.existente.pedido_set.get().fecha_solicitud.year, 2024)
+        self.assertEqual(verificar_contadores(), [])
+        self.assertEqual(
+            list(busqueda.filtrar_pedidos(Pedido.objects.all(), 'Chapitas').values_list('resumen_pedido', flat=True)),
+            ['Chapitas'],
+        )
+
+        with open(rechazados, encoding='utf-8') as reporte:
+            filas = list(csv.DictReader(reporte))
+        self.assertEqual([fila['linea'] for fila in filas], ['4', '5'])
+        self.assertIn('abono no puede ser mayor', filas[0]['errores'])
+        self.assertIn('valor_venta', filas[1]['errores'])
+
+    def test_jsonl_en_simulacion_no_escribe(self):
+        ruta = self.archivo('clientes.jsonl', (
+            '{"nombre": "Carla", "telefono": "+56 9 5555 6666", "email": "carla@ejemplo.cl"}\n'
+            '\n'
+            '{"nombre": "Sin teléfono"}\n'
+            'esto no es json\n'
+        ))
+        salida, errores = self.importar(ruta, dry_run=True)
+        self.assertIn('1 de 3 filas validadas', salida)
+        self.assertIn('línea 3', errores)
+        self.assertIn('línea 4: JSON inválido', errores)
+        self.assertEqual(Cliente.objects.count(), 1)
+
+        self.importar(ruta)
+        self.assertTrue(Cliente.objects.filter(telefono_normalizado='56955556666', email='carla@ejemplo.cl').exists())
+
+
+class OperacionesMasivasTests(TestCase):
+    """Cambiar de estado o borrar una selección cuesta lo mismo con 10 o 200 pedidos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        sembrar_pedidos(400, pedidos_por_cliente=8)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def consultas(self, url, ids, **datos):
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(url, {'ids': ids, **datos})
+        return respuesta, len(consultas)
+
+    def test_terminar_seleccion_asume_pagado(self):
+        url = reverse('cambiar_estado_masivo')
+        ids = list(Pedido.objects.exclude(estado='TERMINADO').order_by('id').values_list('id', flat=True))
+        _, pocas = self.consultas(url, ids[:10], estado='TERMINADO')
+        respuesta, muchas = self.consultas(url, ids[10:210], estado='TERMINADO', siguiente='/pedidos/lista/?estado=PENDIENTE')
+
+        self.assertRedirects(respuesta, '/pedidos/lista/?estado=PENDIENTE', fetch_redirect_response=False)
+        self.assertEqual(pocas, muchas)
+        self.assertLessEqual(muchas, 10)
+        terminados = Pedido.objects.filter(pk__in=ids[:210])
+        self.assertEqual(terminados.exclude(estado='TERMINADO').count(), 0)
+        self.assertEqual(terminados.exclude(valor_abonado=10000).count(), 0)
+        self.assertEqual(verificar_contadores(), [])
+
+    def test_eliminar_seleccion(self):
+        url = reverse('eliminar_pedidos_masivo')
+        ids = list(Pedido.objects.order_by('id').values_list('id', flat=True))
+        ArchivoMedia.objects.create(nombre='pedidos/compartida.jpg', referencias=2)
+        Pedido.objects.filter(pk__in=ids[10:12]).update(imagen_referencia='pedidos/compartida.jpg')
+
+        _, pocas = self.consultas(url, ids[:10])
+        _, muchas = self.consultas(url, ids[10:210])
+        # El lote grande borra en 2 tandas de 100 (Collector) y además
+        # descuenta y recolecta la imagen compartida (3 consultas)
+        self.assertEqual(pocas + 4, muchas)
+        self.assertEqual(Pedido.objects.count(), 190)
+        self.assertFalse(ArchivoMedia.objects.exists())
+        self.assertEqual(verificar_contadores(), [])
+
+    def test_estado_invalido_o_sin_seleccion(self):
+        pedido = Pedido.objects.order_by('id').first()
+        self.client.post(reverse('cambiar_estado_masivo'), {'ids': [pedido.pk], 'estado': 'ANULADO'})
+        self.client.post(reverse('eliminar_pedidos_masivo'), {'ids': ['x']})
+        self.assertEqual(Pedido.objects.get(pk=pedido.pk).estado, pedido.estado)
+        self.assertEqual(Pedido.objects.count(), 400)
+        self.assertEqual(self.client.get(reverse('eliminar_pedidos_masivo')).status_code, 405)
+
+
+class GuardadosSolapadosTests(TestCase):
+    """Dos copias del mismo pedido cargadas a la vez no descuadran los contadores."""
+
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_pedidos(5)
+        cls.pedido = Pedido.objects.filter(estado='PENDIENTE').first()
+
+    def test_guardar_desde_dos_copias_viejas(self):
+        primera = Pedido.objects.get(pk=self.pedido.pk)
+        segunda = Pedido.objects.get(pk=self.pedido.pk)
+        primera.estado = 'EN_PROCESO'
+        primera.save()
+        segunda.estado = 'TERMINADO'
+        segunda.save()
+
+        self.assertEqual(verificar_contadores(), [])
+        self.assertEqual(
+            ContadorEstado.objects.get(estado='PENDIENTE').cantidad,
+            Pedido.objects.filter(estado='PENDIENTE').count(),
+        )
+
+    def test_eliminar_desde_copia_vieja(self):
+        vieja = Pedido.objects.get(pk=self.pedido.pk)
+        actual = Pedido.objects.get(pk=self.pedido.pk)
+        actual.valor_venta = 50000
+        actual.save()
+        vieja.delete()
+
+        self.assertEqual(verificar_contadores(), [])
+
+
+class HistorialTests(TestCase):
+    """Cada cambio de estado o de montos deja una fila en PedidoEvento, también en lote."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        sembrar_pedidos(12, pedidos_por_cliente=4)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def eventos(self, **filtros):
+        return list(PedidoEvento.objects.filter(**filtros).order_by('id').values(
+            'pedido_id', 'usuario_id', 'estado_anterior', 'estado_nuevo', 'delta_venta', 'delta_abonado'
+        ))
+
+    def test_cambios_sueltos_registran_quien_y_diferencias(self):
+        pedido = Pedido.objects.filter(estado='PENDIENTE').first()
+        self.client.get(reverse('cambiar_estado', args=[pedido.pk, 'TERMINADO']))
+        # Terminar asume pagado: el abono que se sumó queda a la vista
+        self.assertEqual(self.eventos(), [{
+            'pedido_id': pedido.pk, 'usuario_id': self.usuario.pk, 'estado_anterior': 'PENDIENTE',
+            'estado_nuevo': 'TERMINADO', 'delta_venta': 0, 'delta_abonado': 8000,
+        }])
+
+        # Sin cambios en estado ni montos no hay fila
+        pedido.refresh_from_db()
+        pedido.resumen_pedido = 'Otro resumen'
+        pedido.save()
+        self.assertEqual(len(self.eventos()), 1)
+
+        pk = pedido.pk
+        pedido.delete()
+        self.assertEqual(self.eventos()[-1], {
+            'pedido_id': pk, 'usuario_id': None, 'estado_anterior': 'TERMINADO',
+            'estado_nuevo': None, 'delta_venta': -10000, 'delta_abonado': -10000,
+        })
+
+    def test_copias_viejas_registran_el_estado_real(self):
+        pedido = Pedido.objects.filter(estado='PENDIENTE').first()
+        primera, segunda = Pedido.objects.get(pk=pedido.pk), Pedido.objects.get(pk=pedido.pk)
+        primera.estado = 'EN_PROCESO'
+        primera.save()
+        segunda.estado = 'TERMINADO'
+        segunda.save()
+        self.assertEqual(
+            [(e['estado_anterior'], e['estado_nuevo']) for e in self.eventos()],
+            [('PENDIENTE', 'EN_PROCESO'), ('EN_PROCESO', 'TERMINADO')],
+        )
+
+    def test_borrar_usuario_conserva_su_historial(self):
+        otro = User.objects.create_user('temporal', password='clave')
+        self.client.force_login(otro)
+        pedido = Pedido.objects.filter(estado='PENDIENTE').first()
+        self.client.get(reverse('cambiar_estado', args=[pedido.pk, 'EN_PROCESO']))
+
+        pk = otro.pk
+        with CaptureQueriesContext(connection) as consultas:
+            otro.delete()
+        self.assertFalse(any('pedidos_pedidoevento' in c['sql'] for c in consultas.captured_queries))
+        self.assertEqual(self.eventos()[0]['usuario_id'], pk)
+
+    def test_operaciones_masivas_escriben_un_lote(self):
+        ids = list(Pedido.objects.order_by('id').values_list('pk', flat=True))
+        ya_terminados = set(Pedido.objects.filter(estado='TERMINADO', pk__in=ids[:8]).values_list('pk', flat=True))
+        Pedido.objects.filter(pk__in=ya_terminados).update(valor_abonado=F('valor_venta'))
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(reverse('cambiar_estado_masivo'), {'ids': ids[:8], 'estado': 'TERMINADO'})
+        inserts = [c['sql'] for c in consultas.captured_queries if 'INSERT INTO "pedidos_pedidoevento"' in c['sql']]
+        self.assertEqual(len(inserts), 1)
+        # Los que ya estaban terminados y pagados no cambiaron
+        self.assertEqual(
+            {evento['pedido_id'] for evento in self.eventos()}, set(ids[:8]) - ya_terminados
+        )
+        self.assertTrue(all(
+            evento['usuario_id'] == self.usuario.pk and evento['estado_nuevo'] == 'TERMINADO'
+            and evento['delta_abonado'] == 8000 for evento in self.eventos()
+        ))
+
+        estados = list(Pedido.objects.filter(pk__in=ids[8:]).order_by('id').values_list('pk', 'estado'))
+        self.client.post(reverse('eliminar_pedidos_masivo'), {'ids': ids[8:]})
+        self.assertEqual(self.eventos(pedido_id__in=ids[8:], estado_nuevo__isnull=True), [
+            {'pedido_id': pk, 'usuario_id': self.usuario.pk, 'estado_anterior': estado,
+             'estado_nuevo': None, 'delta_venta': -10000, 'delta_abonado': -2000}
+            for pk, estado in estados
+        ])
+
+    def test_tiempo_por_estado(self):
+        pedido = Pedido.objects.filter(estado='PENDIENTE').first()
+        inicio = pedido.fecha_solicitud
+        for horas, estado in ((2, 'EN_PROCESO'), (5, 'TERMINADO')):
+            pedido.estado = estado
+            pedido.save()
+            PedidoEvento.objects.filter(estado_nuevo=estado).update(creado_en=inicio + datetime.timedelta(hours=horas))
+        tiempos = historial.tiempo_por_estado(pedido, hasta=inicio + datetime.timedelta(hours=6))
+        self.assertEqual(tiempos, {
+            'PENDIENTE': datetime.timedelta(hours=2),
+            'EN_PROCESO': datetime.timedelta(hours=3),
+            'TERMINADO': datetime.timedelta(hours=1),
+        })
+
+    def test_compactar_historial(self):
+        pedido = Pedido.objects.first()
+        hace = timezone.now() - datetime.timedelta(days=200)
+        PedidoEvento.objects.bulk_create([
+            PedidoEvento(pedido=pedido, creado_en=hace - datetime.timedelta(days=800), estado_nuevo='PENDIENTE'),
+            PedidoEvento(pedido=pedido, creado_en=hace, estado_anterior='PENDIENTE', estado_nuevo='EN_PROCESO'),
+            *[
+                PedidoEvento(pedido=pedido, creado_en=hace, estado_anterior='EN_PROCESO',
+                             estado_nuevo='EN_PROCESO', delta_abonado=1000)
+                for _ in range(3)
+            ],
+            # Reciente: no se compacta
+            PedidoEvento(pedido=pedido, estado_anterior='EN_PROCESO', estado_nuevo='EN_PROCESO', delta_abonado=500),
+        ])
+
+        salida = StringIO()
+        call_command('compactar_historial', '--dry-run', stdout=salida)
+        self.assertIn('se borrarían: 1', salida.getvalue())
+        self.assertEqual(PedidoEvento.objects.count(), 6)
+
+        call_command('compactar_historial', '--lote', '1', stdout=StringIO())
+        self.assertEqual(
+            list(PedidoEvento.objects.order_by('creado_en', 'id').values_list('estado_nuevo', 'delta_abonado')),
+            [('EN_PROCESO', 0), ('EN_PROCESO', 3000), ('EN_PROCESO', 500)],
+        )
+
+
+class FragmentosTests(TestCase):
+    """Filas y tarjetas de pedido cacheadas hasta que cambia el pedido o su cliente."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        sembrar_pedidos(5)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        cache.clear()
+        self.pedido = Pedido.objects.filter(estado='PENDIENTE').select_related('cliente').first()
+
+    def html(self, nombre, *args):
+        return self.client.get(reverse(nombre, args=args)).content.decode()
+
+    def test_update_sin_fecha_sigue_en_cache_y_save_lo_renueva(self):
+        self.assertIn(self.pedido.resumen_pedido, self.html('lista_pedidos'))
+        self.assertIn(self.pedido.resumen_pedido, self.html('detalle_pedido', self.pedido.pk))
+
+        # Un UPDATE que no toca actualizado_en no invalida: prueba que se sirve del cache
+        Pedido.objects.filter(pk=self.pedido.pk).update(resumen_pedido='Cambio sin fecha')
+        self.assertNotIn('Cambio sin fecha', self.html('lista_pedidos'))
+        self.assertNotIn('Cambio sin fecha', self.html('detalle_pedido', self.pedido.pk))
+
+        self.pedido.resumen_pedido = 'Cambio guardado'
+        self.pedido.save()
+        self.assertIn('Cambio guardado', self.html('lista_pedidos'))
+        self.assertIn('Cambio guardado', self.html('detalle_pedido', self.pedido.pk))
+
+    def test_cambios_de_cliente_y_masivos_renuevan_el_fragmento(self):
+        self.html('lista_pedidos')
+        self.html('detalle_pedido', self.pedido.pk)
+
+        cliente = self.pedido.cliente
+        cliente.nombre = 'Cliente Renombrado'
+        cliente.save()
+        self.assertIn('Cliente Renombrado', self.html('lista_pedidos'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('cambiar_estado_masivo'), {'ids': [self.pedido.pk], 'estado': 'TERMINADO'})
+        self.assertIn('Este trabajo ha sido finalizado', self.html('detalle_pedido', self.pedido.pk))
+
+
+class VersionPedidosTests(TestCase):
+    """La versión del cache y del ETag cambia con cualquier alta, cambio o baja."""
+
+    def test_cliente_sin_pedidos_cambia_la_version(self):
+        versiones = [cache_pedidos.version_bd()]
+        cliente = Cliente.objects.create(nombre='Ana', telefono='1')
+        versiones.append(cache_pedidos.version_bd())
+        Cliente.objects.create(nombre='Beto', telefono='2')
+        versiones.append(cache_pedidos.version_bd())
+        cliente.delete()
+        versiones.append(cache_pedidos.version_bd())
+        self.assertEqual(len(set(versiones)), 4)
+
+
+class GetCondicionalTests(TestCase):
+    """Si nada cambió, las páginas de lectura responden 304 con una consulta."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        sembrar_pedidos(30)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.pedido = Pedido.objects.select_related('cliente').order_by('id').first()
+        # El primer render deja la cookie CSRF, que es parte del ETag
+        self.client.get(reverse('lista_pedidos'))
+
+    def urls(self):
+        return [
+            reverse('lista_pedidos') + '?estado=PENDIENTE',
+            reverse('trabajo_semanal'),
+            reverse('detalle_pedido', args=[self.pedido.pk]),
+        ]
+
+    def etags(self):
+        etags = {}
+        for url in self.urls():
+            respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertIn('no-cache', respuesta['Cache-Control'])
+            self.assertIn('Last-Modified', respuesta)
+            etags[url] = respuesta['ETag']
+        return etags
+
+    def assertNoModificado(self, etags, consultas=3):
+        for url, etag in etags.items():
+            # Sesión + usuario + versión: la vista no se ejecuta
+            with self.subTest(url=url), self.assertNumQueries(consultas):
+                respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(respuesta.status_code, 304)
+            self.assertEqual(respuesta.templates, [])
+
+    def test_304_cuesta_una_consulta(self):
+        self.assertNoModificado(self.etags())
+        with self.settings(ROOT_URLCONF=UrlsAsync):
+            self.assertNoModificado(self.etags())
+
+    def test_cambios_de_pedido_cliente_o_borrado_cambian_el_etag(self):
+        detalle = reverse('detalle_pedido', args=[self.pedido.pk])
+        cambios = [
+            (lambda: Pedido.objects.get(pk=self.pedido.pk).save(), True),
+            (lambda: Cliente.objects.get(pk=self.pedido.cliente_id).save(), True),
+            # Otro pedido: cambian los listados, no el detalle
+            (lambda: Pedido.objects.order_by('-id').first().delete(), False),
+        ]
+        for cambio, cambia_detalle in cambios:
+            etags = self.etags()
+            cambio()
+            for url, etag in etags.items():
+                esperado = 200 if cambia_detalle or url != detalle else 304
+                with self.subTest(url=url):
+                    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, esperado)
+
+    def test_etag_nuevo_trae_contenido_nuevo(self):
+        url = reverse('trabajo_semanal')
+        pedido = Pedido.objects.filter(estado='PENDIENTE', fecha_entrega__gte=datetime.date.today()).first()
+        etag = self.client.get(url)['ETag']
+        # UPDATE sin señales, como lo vería un worker que no hizo el cambio
+        Pedido.objects.filter(pk=pedido.pk).update(resumen_pedido='Resumen nuevo', actualizado_en=timezone.now())
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Resumen nuevo')
+
+    def test_etag_depende_de_la_url_y_del_usuario(self):
+        url = reverse('lista_pedidos')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url + '?estado=TERMINADO')['ETag'], etag)
+        self.client.force_login(User.objects.create_user('otro', password='clave'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class MetricasTests(TestCase):
+    """El middleware mide cada vista con memoria acotada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        sembrar_pedidos(30)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        metricas.reiniciar()
+        self.addCleanup(metricas.reiniciar)
+
+    @override_settings(PEDIDOS_METRICAS_MUESTRAS=5)
+    def test_percentiles_por_vista_en_ventana_acotada(self):
+        for _ in range(8):
+            cache.clear()
+            self.client.get(reverse('lista_pedidos'))
+        b''.join(self.client.get(reverse('exportar_pedidos', args=['csv'])).streaming_content)
+
+        datos = self.client.get(reverse('api_metricas')).json()
+        lista = datos['lista_pedidos']
+        self.assertEqual((lista['peticiones'], lista['muestras']), (8, 5))
+        self.assertEqual(lista['consultas']['p99'], 5)
+        self.assertGreater(lista['bytes']['p50'], 0)
+        self.assertLessEqual(lista['tiempo_ms']['p50'], lista['tiempo_ms']['p99'])
+        # Las exportaciones se miden al terminar de enviarse
+        self.assertEqual(datos['exportar_pedidos']['consultas']['max'], 3)
+
+    @override_settings(PEDIDOS_SERVER_TIMING=True)
+    def test_cabecera_server_timing(self):
+        respuesta = self.client.get(reverse('dashboard'))
+        self.assertRegex(respuesta['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ consultas"$')
+
+    def test_solo_staff(self):
+        self.client.force_login(User.objects.create_user('vendedor', password='clave'))
+        self.assertEqual(self.client.get(reverse('api_metricas')).status_code, 302)
+
+
+class RegistroTests(TestCase):
+    """Los errores se registran en JSON, con contexto y sin avalanchas."""
+
+    def registro_con_error(self):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            return logging.LogRecord(
+                'pedidos.prueba', logging.ERROR, __file__, 1, 'Falló %s', ('algo',), sys.exc_info()
+            )
+
+    def test_formato_json_con_contexto_y_traceback(self):
+        request = RequestFactory().get('/pedidos/lista/')
+        request.request_id = 'abc123'
+        request.user = User(username='operador')
+        registro_log = self.registro_con_error()
+
+        token = registro.peticion_actual.set(request)
+        try:
+            registro.FiltroContexto().filter(registro_log)
+        finally:
+            registro.peticion_actual.reset(token)
+        datos = json.loads(registro.FormatoJSON().format(registro_log))
+
+        self.assertEqual(datos['mensaje'], 'Falló algo')
+        self.assertEqual((datos['request_id'], datos['usuario'], datos['ruta']), ('abc123', 'operador', '/pedidos/lista/'))
+        self.assertIn('ZeroDivisionError', datos['traceback'])
+
+    def test_errores_identicos_se_limitan_por_ventana(self):
+        filtro = registro.FiltroRepetidos(maximo=2, ventana=60)
+        with mock.patch('pedidos.registro.time.monotonic', return_value=0):
+            pasan = [filtro.filter(self.registro_con_error()) for _ in range(5)]
+        self.assertEqual(pasan, [True, True, False, False, False])
+
+        registro_log = self.registro_con_error()
+        with mock.patch('pedidos.registro.time.monotonic', return_value=61):
+            self.assertTrue(filtro.filter(registro_log))
+        self.assertEqual(registro_log.repeticiones_suprimidas, 3)
+
+    def test_decorador_registra_la_excepcion(self):
+        @transaccion_segura
+        def vista_rota(request):
+            raise ValueError('sin stock')
+
+        with self.assertLogs('pedidos.decorators', 'ERROR') as capturados:
+            respuesta = vista_rota(RequestFactory().get('/'))
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertIsNotNone(capturados.records[0].exc_info)
+
+    def test_request_id_en_la_respuesta(self):
+        self.assertEqual(self.client.get('/', HTTP_X_REQUEST_ID='proxy-42')['X-Request-ID'], 'proxy-42')
+        self.assertRegex(self.client.get('/', HTTP_X_REQUEST_ID='no válido!')['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+
+class UrlsAsync:
+    """URLconf del perfil ASGI: las vistas de lectura en su versión async."""
+    urlpatterns = [path('accounts/', include('django.contrib.auth.urls'))] + [
+        path(str(patron.pattern), getattr(views, f'{patron.name}_async', patron.callback), name=patron.name)
+        for patron in pedidos_urls.urlpatterns
+    ]
+
+
+class VistasAsyncTests(TestCase):
+    """Las vistas async (perfil ASGI) responden igual que las síncronas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        sembrar_pedidos(60, pedidos_por_cliente=3)
+        reconstruir_contadores()
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        busqueda.fts_disponible()
+
+    def contenido(self, url, data=None):
+        cache.clear()
+        respuesta = self.client.get(url, data)
+        self.assertEqual(respuesta.status_code, 200, url)
+        # El token CSRF cambia en cada respuesta
+        return re.sub(rb'name="csrfmiddlewaretoken" value="[^"]+"', b'', respuesta.content)
+
+    def test_mismo_contenido_que_la_version_sincrona(self):
+        casos = [
+            ('dashboard', None),
+            ('trabajo_semanal', None),
+            ('lista_pedidos', None),
+            ('lista_pedidos', {'estado': 'PENDIENTE', 'orden': 'fecha_entrega'}),
+            ('lista_pedidos', {'busqueda': 'Cliente 1'}),
+            ('api_clientes', None),
+            ('api_buscar_clientes', {'q': 'cli'}),
+        ]
+        for nombre, data in casos:
+            with self.subTest(url=nombre, data=data):
+                sincrono = self.contenido(reverse(nombre), data)
+                with self.settings(ROOT_URLCONF=UrlsAsync):
+                    self.assertEqual(self.contenido(reverse(nombre), data), sincrono)
+
+    def test_mismo_presupuesto_de_consultas(self):
+        presupuestos = dict((nombre, n) for nombre, _, n in PresupuestoConsultasTests.PRESUPUESTOS)
+        with self.settings(ROOT_URLCONF=UrlsAsync):
+            for nombre in ('dashboard', 'lista_pedidos', 'trabajo_semanal', 'api_clientes', 'api_buscar_clientes'):
+                cache.clear()
+                with self.subTest(url=nombre), self.assertNumQueries(presupuestos[nombre]):
+                    self.client.get(reverse(nombre))
+
+    @override_settings(ROOT_URLCONF=UrlsAsync)
+    async def test_cadena_de_middleware_async(self):
+        metricas.reiniciar()
+        self.addCleanup(metricas.reiniciar)
+        await self.async_client.aforce_login(self.usuario)
+
+        respuesta = await self.async_client.get(reverse('dashboard'), headers={'X-Request-ID': 'abc-123'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['X-Request-ID'], 'abc-123')
+        self.assertEqual(metricas.resumen()['dashboard']['peticiones'], 1)
+
+    @override_settings(ROOT_URLCONF=UrlsAsync, PEDIDOS_ASGI=True)
+    async def test_exportacion_en_flujo_async(self):
+        await self.async_client.aforce_login(self.usuario)
+        respuesta = await self.async_client.get(reverse('exportar_pedidos', args=['csv']))
+        self.assertTrue(respuesta.is_async)
+        contenido = b''.join([parte async for parte in respuesta.streaming_content])
+        self.assertEqual(contenido.decode('utf-8-sig').count('\r\n'), 1 + await Pedido.objects.acount())
+
+
+def datos_evento(mensaje):
+    """El JSON de `data:` de un mensaje SSE."""
+    return json.loads(re.search(r'^data: (.*)$', mensaje, re.M).group(1))
+
+
+@override_settings(PEDIDOS_EVENTOS_REVISION=0)
+class EventosEnVivoTests(TestCase):
+    """Los cambios de pedidos llegan como server-sent events, sin broker externo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('tablet', password='clave')
+        sembrar_pedidos(6, pedidos_por_cliente=3)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.canal = eventos.Canal()
+        for parche in (mock.patch.object(eventos, 'canal', self.canal),
+                       mock.patch.object(eventos, 'SOLAPE', datetime.timedelta(0))):
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def publicados(self):
+        return [datos_evento(mensaje) for _, mensaje in self.canal._historial]
+
+    def test_paginas_se_suscriben_solo_si_esta_activado(self):
+        for url in (reverse('dashboard'), reverse('trabajo_semanal')):
+            with self.subTest(url=url):
+                with self.settings(PEDIDOS_EN_VIVO=False):
+                    self.assertNotContains(self.client.get(url), 'data-en-vivo')
+                with self.settings(PEDIDOS_EN_VIVO=True):
+                    self.assertContains(self.client.get(url), f'data-en-vivo="{reverse("eventos_pedidos")}?desde=')
+
+    def test_guardar_y_eliminar_publican_al_confirmar(self):
+        pedido = Pedido.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.estado = 'EN_PROCESO'
+            pedido.save()
+            self.assertEqual(self.publicados(), [])
+        self.assertEqual(self.publicados(), [{
+            'id': pedido.pk, 'estado': 'EN_PROCESO', 'etiqueta': 'En Proceso',
+            'valor_pendiente': 8000, 'fecha_entrega': pedido.fecha_entrega.isoformat(),
+        }])
+
+        pk = pedido.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.delete()
+        self.assertEqual(self.publicados()[-1], {'id': pk, 'eliminado': True})
+
+    def test_operacion_masiva_publica_sin_repetir_en_el_vigia(self):
+        ids = list(Pedido.objects.filter(estado='PENDIENTE').values_list('pk', flat=True))
+        vigia = eventos.Vigia()
+        vigia.revisar()
+        with self.captureOnCommitCallbacks(execute=True):
+            operaciones.cambiar_estado(ids, 'TERMINADO')
+        publicados = self.publicados()
+        self.assertEqual({evento['id'] for evento in publicados}, set(ids))
+        self.assertTrue(all(evento['valor_pendiente'] == 0 for evento in publicados))
+
+        # El vigía ve las mismas filas en la BD, pero ya se publicaron aquí
+        vigia.revisar()
+        self.assertEqual(len(self.canal._historial), len(ids))
+
+    def test_vigia_publica_cambios_de_otros_procesos(self):
+        vigia = eventos.Vigia()
+        vigia.revisar()
+        self.assertEqual(self.publicados(), [])
+
+        # Otro worker: la fila cambia sin pasar por las señales de este proceso
+        pedido = Pedido.objects.first()
+        Pedido.objects.filter(pk=pedido.pk).update(estado='TERMINADO', actualizado_en=timezone.now())
+        with self.assertNumQueries(2):
+            vigia.revisar()
+        self.assertEqual(self.publicados()[-1]['id'], pedido.pk)
+        self.assertEqual(self.publicados()[-1]['estado'], 'TERMINADO')
+
+        # Un borrado no deja fila que leer: se nota en los contadores
+        contador = ContadorEstado.objects.filter(cantidad__gt=0).first()
+        ContadorEstado.objects.filter(pk=contador.pk).update(cantidad=contador.cantidad - 1)
+        vigia.revisar()
+        self.assertEqual(self.canal._historial[-1][1].split('\n')[1], 'event: refrescar')
+        self.assertEqual(len(self.canal._historial), 2)
+
+    def test_reconexion_y_cola_llena(self):
+        self.canal.publicar('pedido', {'id': 1})
+        ultimo = self.canal.ultimo_id()
+        self.canal.publicar('pedido', {'id': 2})
+
+        # Con Last-Event-ID se recibe solo lo que faltó
+        mensajes = self.canal.suscribir(ultimo).esperar(0)
+        self.assertEqual([datos_evento(mensaje) for mensaje in mensajes], [{'id': 2}])
+        # Id de otro proceso (o de antes de un reinicio): la página se refresca
+        self.assertEqual(self.canal.suscribir('otro-1').esperar(0), [eventos.REFRESCAR])
+
+        suscripcion = eventos.Suscripcion(self.canal, capacidad=2)
+        for pk in range(3):
+            suscripcion.entregar(eventos.formatear('pedido', {'id': pk}))
+        self.assertEqual(suscripcion.esperar(0), [eventos.REFRESCAR])
+        self.assertEqual(suscripcion.esperar(0), [])
+
+    @override_settings(PEDIDOS_EVENTOS_DURACION_SYNC=0.2, PEDIDOS_EVENTOS_LATIDO=0.1)
+    def test_vista_sincrona_termina_y_reanuda(self):
+        desde = self.canal.ultimo_id()
+        self.canal.publicar('pedido', {'id': 7})
+
+        respuesta = self.client.get(reverse('eventos_pedidos'), {'desde': desde})
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        self.assertEqual(respuesta['Cache-Control'], 'no-cache')
+        contenido = b''.join(respuesta.streaming_content).decode()
+        self.assertTrue(contenido.startswith('retry: 3000\n\n'))
+        self.assertIn('data: {"id":7}', contenido)
+        self.assertIn(eventos.LATIDO, contenido)
+        self.assertEqual(self.canal.suscriptores(), 0)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('eventos_pedidos')).status_code, 302)
+
+    @override_settings(ROOT_URLCONF=UrlsAsync)
+    async def test_vista_async_recibe_cambios_de_otro_hilo(self):
+        await self.async_client.aforce_login(self.usuario)
+        respuesta = await self.async_client.get(reverse('eventos_pedidos'))
+        flujo = aiter(respuesta.streaming_content)
+        self.assertEqual(await anext(flujo), b'retry: 3000\n\n')
+
+        pedido = await Pedido.objects.afirst()
+        pedido.estado = 'TERMINADO'
+        # Se publica desde el hilo del ORM, no desde el loop de la vista
+        await sync_to_async(eventos.publicar_pedido)(pedido)
+        mensaje = (await asyncio.wait_for(anext(flujo), 5)).decode()
+        self.assertEqual(datos_evento(mensaje)['id'], pedido.pk)
+        self.assertEqual(datos_evento(mensaje)['estado'], 'TERMINADO')
+        self.assertEqual(self.canal.suscriptores(), 1)
+
+        # Como al desconectarse el navegador: se cancela la espera
+        espera = asyncio.ensure_future(anext(flujo))
+        await asyncio.sleep(0)
+        espera.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await espera
+        self.assertEqual(self.canal.suscriptores(), 0)
+
+
+class AutocompletarClientesTests(TestCase):
+    """El select de clientes se llena por AJAX y no crece con la base."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        sembrar_pedidos(200, pedidos_por_cliente=1)
+        cls.cliente = Cliente.objects.create(nombre='Imprenta Zúñiga', telefono='+56 9 8765-4321')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        cache.clear()
+
+    def buscar(self, termino):
+        respuesta = self.client.get(reverse('api_buscar_clientes'), {'q': termino})
+        return [resultado['id'] for resultado in respuesta.json()['results']]
+
+    def test_formulario_solo_trae_el_cliente_elegido(self):
+        nuevo = self.client.get(reverse('crear_pedido')).content.decode()
+        self.assertEqual(nuevo.count('<option'), 1)
+
+        pedido = Pedido.objects.order_by('id').first()
+        edicion = self.client.get(reverse('editar_pedido', args=[pedido.pk])).content.decode()
+        self.assertEqual(edicion.count('<option'), 2)
+        self.assertIn(f'<option value="{pedido.cliente_id}" selected>', edicion)
+
+    def test_busca_por_prefijo_de_nombre_y_telefono(self):
+        if not busqueda.fts_disponible():
+            self.skipTest('SQLite sin FTS5')
+        self.assertEqual(self.buscar('impr'), [self.cliente.pk])
+        self.assertEqual(self.buscar('zuni'), [self.cliente.pk])
+        self.assertEqual(self.buscar('+56 9 8765'), [self.cliente.pk])
+        self.assertEqual(len(self.buscar('cliente')), 20)
+
+    def test_respuestas_repetidas_no_consultan_la_base(self):
+        self.buscar('cliente 1')
+        with self.assertNumQueries(3):  # solo sesión, usuario y versión de pedidos
+            self.buscar('Cliente  1')
+
+
+class TriggersBusquedaTests(TestCase):
+    """Tras migrar están todos los triggers FTS5: una migración que los borre se nota aquí."""
+
+    def setUp(self):
+        if not busqueda.fts_disponible():
+            self.skipTest('SQLite sin FTS5')
+
+    def test_migraciones_dejan_todos_los_triggers(self):
+        self.assertEqual(busqueda.triggers_faltantes(), [])
+        self.assertEqual(checks.triggers_busqueda(None, databases=['default']), [])
+
+    def test_trigger_borrado_se_avisa(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER pedidos_pedido_fts_au')
+        avisos = checks.triggers_busqueda(None, databases=['default'])
+        self.assertEqual([aviso.id for aviso in avisos], ['pedidos.W001'])
+        self.assertIn('pedidos_pedido_fts_au', avisos[0].msg)
+
+
+class TelefonoNormalizadoTests(TestCase):
+    """El teléfono se guarda también solo con dígitos y se busca por prefijo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        cls.cliente = Cliente.objects.create(nombre='Ana', telefono='+56 9 1234-5678')
+        cls.otro = Cliente.objects.create(nombre='Beto', telefono='(2) 2345 6789')
+        Pedido.objects.create(
+            cliente=cls.cliente, resumen_pedido='Tazas', detalles_pedido='-',
+            valor_venta=1000, valor_abonado=0, fecha_entrega=datetime.date.today(),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        cache.clear()
+
+    def test_se_normaliza_al_guardar(self):
+        self.assertEqual(self.cliente.telefono_normalizado, '56912345678')
+        self.cliente.telefono = '+56 9 8888 7777'
+        self.cliente.save(update_fields=['telefono'])
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.telefono_normalizado, '56988887777')
+
+    def test_busqueda_por_prefijo_con_y_sin_formato(self):
+        for termino in ('+56 9 1234', '5691234', '56912345678'):
+            with self.subTest(termino=termino):
+                clientes = self.client.get(reverse('lista_clientes'), {'busqueda': termino}).context['clientes']
+                self.assertEqual([c.pk for c in clientes], [self.cliente.pk])
+                pedidos = self.client.get(reverse('lista_pedidos'), {'busqueda': termino}).context['pedidos']
+                self.assertEqual([p.cliente_id for p in pedidos], [self.cliente.pk])
+
+        # Solo prefijo: dígitos del medio no coinciden
+        clientes = self.client.get(reverse('lista_clientes'), {'busqueda': '12345678'}).context['clientes']
+        self.assertEqual(len(clientes), 0)
+
+    def test_comando_rellena_filas_sin_normalizar(self):
+        Cliente.objects.bulk_create([Cliente(nombre=f'Sin {i}', telefono=f'+56 9 {i:04d}-0000') for i in range(5)])
+        version = cache_pedidos.version_bd()
+        salida = StringIO()
+        call_command('normalizar_telefonos', lote=2, stdout=salida)
+        self.assertIn('5 de 7', salida.getvalue())
+        self.assertFalse(Cliente.objects.filter(telefono_normalizado='').exists())
+        # Las respuestas cacheadas con los teléfonos viejos quedan obsoletas
+        self.assertNotEqual(cache_pedidos.version_bd(), version)
+
+
+class MediaTemporalMixin:
+    """MEDIA_ROOT temporal y ayudas para subir imágenes de prueba."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('operador', password='clave')
+        cls.cliente = Cliente.objects.create(nombre='Ana', telefono='+56 9 1234 5678')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def foto(self, ancho=3000, alto=2000):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camara de prueba'  # Make
+        salida = BytesIO()
+        Image.new('RGB', (ancho, alto), 'red').save(salida, 'JPEG', exif=exif)
+        return SimpleUploadedFile('foto celular.jpg', salida.getvalue(), content_type='image/jpeg')
+
+    def crear(self, foto=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('crear_pedido'), {
+                'cliente': self.cliente.pk,
+                'resumen_pedido': 'Poleras',
+                'detalles_pedido': 'Logo al frente',
+                'valor_venta': 10000,
+                'valor_abonado': 0,
+                'fecha_entrega': datetime.date.today(),
+                'imagen_referencia': foto or self.foto(),
+            })
+        return Pedido.objects.latest('id')
+
+
+@override_settings(PEDIDOS_IMAGENES_ASINCRONO=False)
+class ImagenesPedidoTests(MediaTemporalMixin, TestCase):
+    """Las imágenes subidas se normalizan y generan variantes para srcset."""
+
+    def test_subida_genera_original_limitado_y_variantes(self):
+        pedido = self.crear()
+        self.assertRegex(pedido.imagen_referencia.name, r'^pedidos/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+
+        with Image.open(pedido.imagen_referencia.path) as original:
+            self.assertEqual(original.size, (2560, 1707))
+            self.assertEqual(len(original.getexif()), 0)
+
+        storage = pedido.imagen_referencia.storage
+        for ancho in imagenes.ANCHOS.values():
+            for extension in imagenes.FORMATOS:
+                self.assertTrue(storage.exists(imagenes.nombre_variante(pedido.imagen_hash, ancho, extension)))
+
+        detalle = self.client.get(reverse('detalle_pedido', args=[pedido.pk])).content.decode()
+        self.assertIn(f'{pedido.imagen_hash}-320.webp 320w', detalle)
+
+    def test_comando_procesa_imagenes_existentes(self):
+        pedido = self.crear()
+        nombre = default_storage.save('pedidos/sin procesar.jpg', self.foto(800, 600))
+        Pedido.objects.filter(pk=pedido.pk).update(imagen_referencia=nombre, imagen_hash=None)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('procesar_imagenes', hilos=1, stdout=StringIO())
+
+        pedido.refresh_from_db()
+        self.assertIsNotNone(pedido.imagen_hash)
+        self.assertFalse(default_storage.exists(nombre))
+
+
+@override_settings(PEDIDOS_IMAGENES_ASINCRONO=False)
+class AlmacenamientoPorContenidoTests(MediaTemporalMixin, TestCase):
+    """Imágenes idénticas comparten archivo y se borran con el último pedido."""
+
+    def eliminar(self, pedido):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('eliminar_pedido', args=[pedido.pk]))
+
+    def test_subidas_identicas_comparten_archivo(self):
+        primero = self.crear(self.foto(500, 400))
+        segundo = self.crear(self.foto(500, 400))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('duplicar_pedido', args=[segundo.pk]))
+        tercero = Pedido.objects.latest('id')
+
+        nombre = primero.imagen_referencia.name
+        self.assertEqual({segundo.imagen_referencia.name, tercero.imagen_referencia.name}, {nombre})
+        self.assertEqual(ArchivoMedia.objects.get(nombre=nombre).referencias, 3)
+        # Solo queda el original normalizado: las subidas se recolectaron
+        _, archivos = default_storage.listdir(posixpath.dirname(nombre))
+        self.assertEqual(archivos, [posixpath.basename(nombre)])
+
+        variante = imagenes.nombre_variante(primero.imagen_hash, 320, 'webp')
+        for pedido in (primero, segundo):
+            self.eliminar(pedido)
+            self.assertTrue(default_storage.exists(nombre))
+        self.eliminar(tercero)
+        self.assertFalse(default_storage.exists(nombre))
+        self.assertFalse(default_storage.exists(variante))
+        self.assertFalse(ArchivoMedia.objects.exists())
+
+    def test_media_gc_simulacion_y_borrado(self):
+        pedido = self.crear()
+        huerfano = default_storage.save('pedidos/huerfano.jpg', self.foto(10, 10))
+        ArchivoMedia.objects.filter(nombre=pedido.imagen_referencia.name).update(referencias=7)
+
+        salida = StringIO()
+        call_command('media_gc', dry_run=True, min_edad=0, stdout=salida)
+        self.assertIn('(simulación) pedidos/huerfano.jpg', salida.getvalue())
+        self.assertTrue(default_storage.exists(huerfano))
+        self.assertEqual(ArchivoMedia.objects.get().referencias, 7)
+
+        call_command('media_gc', min_edad=0, stdout=StringIO())
+        self.assertFalse(default_storage.exists(huerfano))
+        self.assertTrue(default_storage.exists(pedido.imagen_referencia.name))
+        self.assertEqual(ArchivoMedia.objects.get().referencias, 1)
+
+
+class EstaticosTests(TestCase):
+    """Estáticos con hash, copias precomprimidas y cambio CDN/locales."""
+
+    def setUp(self):
+        self.raiz = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.raiz, ignore_errors=True)
+        ajuste = override_settings(STATIC_ROOT=self.raiz, STORAGES={
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'pedidos.almacenamiento.EstaticosComprimidos'},
+        })
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.addCleanup(estaticos._construidos.cache_clear)
+
+    def publicar(self):
+        """Un CSS pasado por el post_process de collectstatic."""
+        storage = EstaticosComprimidos()
+        storage.save('pedidos/app.css', ContentFile(b'.tarjeta { color: #FBBF24; }\n' * 200))
+        list(storage.post_process({'pedidos/app.css': (storage, 'pedidos/app.css')}))
+        return storage.hashed_files['pedidos/app.css']
+
+    def test_collectstatic_deja_nombre_con_hash_y_gzip(self):
+        nombre = self.publicar()
+        self.assertRegex(nombre, r'^pedidos/app\.[0-9a-f]{12}\.css$')
+        with gzip.open(f'{self.raiz}/{nombre}.gz') as comprimido:
+            self.assertEqual(comprimido.read(), b'.tarjeta { color: #FBBF24; }\n' * 200)
+        self.assertEqual(EstaticosComprimidos().url('pedidos/app.css'), f'/static/{nombre}')
+
+    def test_sin_manifiesto_usa_nombres_originales(self):
+        self.assertEqual(EstaticosComprimidos().url('pedidos/js/index.js'), '/static/pedidos/js/index.js')
+        # Fuera de STATIC_ROOT no se sirve nada
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+    def test_middleware_sirve_inmutable_y_precomprimido(self):
+        nombre = self.publicar()
+        respuesta = self.client.get(f'/static/{nombre}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertEqual(respuesta['Content-Type'], 'text/css')
+        self.assertIn('immutable', respuesta['Cache-Control'])
+        self.assertEqual(respuesta['Vary'], 'Accept-Encoding')
+
+        sin_hash = self.client.get('/static/pedidos/app.css')
+        self.assertNotIn('Content-Encoding', sin_hash)
+        self.assertNotIn('immutable', sin_hash['Cache-Control'])
+
+        repetida = self.client.get(f'/static/{nombre}', HTTP_IF_MODIFIED_SINCE=respuesta['Last-Modified'])
+        self.assertEqual(repetida.status_code, 304)
+
+    def test_plantillas_cambian_entre_cdn_y_locales(self):
+        with override_settings(PEDIDOS_ESTATICOS='cdn'):
+            html = self.client.get(reverse('login')).content.decode()
+        self.assertIn('cdn.tailwindcss.com', html)
+
+        with override_settings(PEDIDOS_ESTATICOS='locales'):
+            html = self.client.get(reverse('login')).content.decode()
+        self.assertNotIn('cdn.tailwindcss.com', html)
+        self.assertIn('/static/pedidos/dist/app.css', html)
+        self.assertIn('/static/pedidos/vendor/fuentes/fuentes.css', html)
@@ -1,19 +1,35 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+
+def lectura(nombre):
+    """Vista de solo lectura: con el perfil ASGI se usa su versión async."""
+    return getattr(views, f'{nombre}_async' if settings.PEDIDOS_ASGI else nombre)
+
+
 urlpatterns = [
-    path('', views.dashboard, name='dashboard'),
+    path('', lectura('dashboard'), name='dashboard'),
     path('nuevo/', views.crear_pedido, name='crear_pedido'),
     path('api/cliente/nuevo/', views.api_crear_cliente_rapido, name='api_crear_cliente_rapido'),
-    path('pedidos/lista/', views.lista_pedidos, name='lista_pedidos'),
+    path('api/cliente/buscar/', lectura('api_buscar_clientes'), name='api_buscar_clientes'),
+    path('pedidos/lista/', lectura('lista_pedidos'), name='lista_pedidos'),
+    path('pedidos/exportar/<str:formato>/', views.exportar_pedidos, name='exportar_pedidos'),
     path('<int:pk>/', views.detalle_pedido, name='detalle_pedido'),
     path('pedido/<int:pk>/cambiar/<str:nuevo_estado>/', views.cambiar_estado_pedido, name='cambiar_estado'),
+    path('pedidos/estado-masivo/', views.cambiar_estado_masivo, name='cambiar_estado_masivo'),
+    path('pedidos/eliminar-masivo/', views.eliminar_pedidos_masivo, name='eliminar_pedidos_masivo'),
     path('pedido/duplicar/<int:pk>/', views.duplicar_pedido, name='duplicar_pedido'),
     path('pedido/editar/<int:pk>/', views.editar_pedido, name='editar_pedido'),
     path('pedido/eliminar/<int:pk>/', views.eliminar_pedido, name='eliminar_pedido'),
     path('clientes/', views.lista_clientes, name='lista_clientes'),
+    path('api/clientes/', lectura('api_clientes'), name='api_clientes'),
+    path('clientes/exportar/<str:formato>/', views.exportar_clientes, name='exportar_clientes'),
     path('clientes/nuevo/', views.crear_cliente, name='crear_cliente'),
     path('clientes/editar/<int:pk>/', views.editar_cliente, name='editar_cliente'),
     path('clientes/eliminar/<int:pk>/', views.eliminar_cliente, name='eliminar_cliente'),
-    path('pedidos/trabajo-semanal/', views.trabajo_semanal, name='trabajo_semanal'),
+    path('pedidos/trabajo-semanal/', lectura('trabajo_semanal'), name='trabajo_semanal'),
+    path('api/eventos/', lectura('eventos_pedidos'), name='eventos_pedidos'),
+    path('api/cache/estadisticas/', lectura('api_estadisticas_cache'), name='api_estadisticas_cache'),
+    path('api/metricas/', lectura('api_metricas'), name='api_metricas'),
 ]
\ No newline at end of file
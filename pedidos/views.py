@@ -1,98 +1,98 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Q, Count, Sum, F
-from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Case, Count, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views.decorators.http import require_POST
-from .models import Pedido, Cliente
+from .models import Pedido, Cliente, ContadorCliente
 from .forms import PedidoForm, ClienteForm
-from .decorators import transaccion_segura
+from .decorators import condicional, transaccion_segura
+from .kpis import ESTADOS_ACTIVOS, aleer_kpis, leer_kpis
+from .busqueda import autocompletar_clientes, filtrar_clientes, filtrar_pedidos
+from .paginacion import PaginadorCursor
+from . import cache as cache_pedidos
+from . import eventos, exportacion, metricas, operaciones
 from django.utils import timezone
 from datetime import timedelta
 import locale
 
 
-@login_required
-def dashboard(request):
-    # ==========================================
-    # 1. KPIs FINANCIEROS (Dinero)
-    # ==========================================
-    ingresos_totales = Pedido.objects.filter(estado='TERMINADO').aggregate(
-        total=Sum('valor_venta')
-    )['total'] or 0
+def _top_contadores():
+    # Top clientes: se lee del contador por cliente en vez de agrupar toda
+    # la tabla de pedidos
+    return ContadorCliente.objects.select_related('cliente').order_by('-cantidad')[:5]
 
-    por_cobrar = Pedido.objects.filter(
-        estado__in=['PENDIENTE', 'EN_PROCESO']
-    ).aggregate(
-        total=Sum(F('valor_venta') - F('valor_abonado'))
-    )['total'] or 0
 
+def _contexto_dashboard():
     # ==========================================
-    # 2. MÉTRICAS OPERATIVAS
+    # 1. KPIs FINANCIEROS Y OPERATIVOS (contadores materializados)
     # ==========================================
+    kpis = leer_kpis()
+
     total_clientes = Cliente.objects.count()
 
-    total_pedidos = Pedido.objects.count()
-    pendientes = Pedido.objects.filter(estado='PENDIENTE').count()
-    en_proceso = Pedido.objects.filter(estado='EN_PROCESO').count()
-    completados = Pedido.objects.filter(estado='TERMINADO').count()
+    return _armar_contexto_dashboard(kpis, total_clientes, list(_top_contadores()))
 
+
+def _armar_contexto_dashboard(kpis, total_clientes, top_contadores):
     # ==========================================
-    # 3. CÁLCULOS PARA GRÁFICOS HTML (CSS PURO)
+    # 2. CÁLCULOS PARA GRÁFICOS HTML (CSS PURO)
     # ==========================================
 
     # A. Datos para Gráfico de Dona (Conic Gradient)
-    # Calculamos los puntos de corte del gradiente (acumulados)
-    if total_pedidos > 0:
-        pct_pendientes = (pendientes / total_pedidos) * 100
-        pct_en_proceso = (en_proceso / total_pedidos) * 100
-        # Puntos de parada para el CSS conic-gradient
-        stop_1 = pct_pendientes
-        stop_2 = pct_pendientes + pct_en_proceso
-    else:
-        stop_1 = 0
-        stop_2 = 0
-
-    # Porcentajes individuales para mostrar en texto
-    pct_text_pendientes = round((pendientes / total_pedidos * 100)) if total_pedidos > 0 else 0
-    pct_text_proceso = round((en_proceso / total_pedidos * 100)) if total_pedidos > 0 else 0
-    pct_text_completados = round((completados / total_pedidos * 100)) if total_pedidos > 0 else 0
+    # Puntos de parada acumulados para el CSS conic-gradient
+    stop_1, stop_2 = kpis.donut_stops
 
     # B. Datos para Gráfico de Barras (Top Clientes)
-    top_clientes = Cliente.objects.annotate(
-        num_pedidos=Count('pedido')
-    ).order_by('-num_pedidos')[:5]
+    top_clientes = []
+    for contador in top_contadores:
+        contador.cliente.num_pedidos = contador.cantidad
+        top_clientes.append(contador.cliente)
 
     # Obtener el valor máximo para calcular el ancho de las barras (width %)
     max_pedidos = top_clientes[0].num_pedidos if top_clientes else 1
 
     # ==========================================
-    # 4. CONTEXTO
+    # 3. CONTEXTO
     # ==========================================
     context = {
         # KPIs
-        'ingresos_totales': ingresos_totales,
-        'por_cobrar': por_cobrar,
+        'ingresos_totales': kpis.ingresos_totales,
+        'por_cobrar': kpis.por_cobrar,
         'total_clientes': total_clientes,
-        'total_pedidos': total_pedidos,  # Necesario para el centro de la dona
+        'total_pedidos': kpis.total_pedidos,  # Necesario para el centro de la dona
 
         # Datos Crudos
-        'pendientes': pendientes,
-        'en_proceso': en_proceso,
-        'completados': completados,
+        'pendientes': kpis.pendientes,
+        'en_proceso': kpis.en_proceso,
+        'completados': kpis.completados,
 
         # Porcentajes Visuales (Donut)
         'donut_stop_1': stop_1,
         'donut_stop_2': stop_2,
-        'pct_pendientes': pct_text_pendientes,
-        'pct_proceso': pct_text_proceso,
-        'pct_completados': pct_text_completados,
+        'pct_pendientes': round(kpis.porcentaje(kpis.pendientes)),
+        'pct_proceso': round(kpis.porcentaje(kpis.en_proceso)),
+        'pct_completados': round(kpis.porcentaje(kpis.completados)),
 
         # Datos Visuales (Barras)
         'top_clientes': top_clientes,
         'max_pedidos': max_pedidos,
     }
 
+    return context
+
+
+@login_required
+def dashboard(request):
+    # El contexto completo se cachea hasta que cambie algún pedido o cliente
+    context = cache_pedidos.obtener_o_calcular('dashboard', _contexto_dashboard)
     return render(request, 'pedidos/dashboard.html', context)
 
 @login_required
@@ -130,6 +130,15 @@ def api_crear_cliente_rapido(request):
             'errors': form.errors
         })
 
+LIMITE_AUTOCOMPLETAR = 20
+
+
+@login_required
+def api_buscar_clientes(request):
+    """Autocompletado del select de clientes (formato de resultados de select2)."""
+    resultados = autocompletar_clientes(request.GET.get('q', ''), limite=LIMITE_AUTOCOMPLETAR)
+    return JsonResponse({'results': resultados})
+
 @login_required
 @transaccion_segura
 def editar_pedido(request, pk):
@@ -147,15 +156,43 @@ def editar_pedido(request, pk):
 @login_required
 @transaccion_segura
 def eliminar_pedido(request, pk):
-    pedido = get_object_or_404(Pedido, pk=pk)
+    pedido = get_object_or_404(Pedido.objects.select_related('cliente'), pk=pk)
     if request.method == 'POST':
         pedido.delete()
         return redirect('dashboard')
     return render(request, 'pedidos/pedido_confirm_delete.html', {'pedido': pedido})
 
+# ==========================================
+# VERSIONES PARA GET CONDICIONAL (ETag / 304)
+# ==========================================
+# Las tablets del taller recargan estas páginas todo el tiempo: si nada
+# cambió se responde 304 con una sola consulta (ver decorators.condicional)
+
+def _version_lista_pedidos(request):
+    # Los contadores de la cabecera son globales: cualquier cambio cuenta,
+    # no solo los del filtro actual. La vista la reutiliza como versión del
+    # cache: un ETag nuevo nunca acompaña contenido cacheado viejo.
+    request.version_pedidos = cache_pedidos.version_bd()
+    return request.version_pedidos
+
+
+def _version_trabajo_semanal(request):
+    ultima, partes = request.version_pedidos = cache_pedidos.version_bd()
+    # Las zonas dependen del día aunque no cambie ningún pedido
+    return ultima, (*partes, timezone.now().date())
+
+
+def _version_pedido(request, pk):
+    fila = Pedido.objects.filter(pk=pk).values_list('actualizado_en', 'cliente__actualizado_en').first()
+    if fila is None:
+        return None
+    return max(fila), fila
+
+
 @login_required
+@condicional(_version_pedido)
 def detalle_pedido(request, pk):
-    pedido = get_object_or_404(Pedido, pk=pk)
+    pedido = get_object_or_404(Pedido.objects.select_related('cliente'), pk=pk)
     return render(request, 'pedidos/pedido_detail.html', {'pedido': pedido})
 
 
@@ -176,37 +213,135 @@ def cambiar_estado_pedido(request, pk, nuevo_estado):
 
     return redirect('detalle_pedido', pk=pk)
 
+def _ids_seleccionados(request):
+    return [int(valor) for valor in request.POST.getlist('ids') if valor.isdigit()]
+
+
+def _volver_al_listado(request):
+    # Vuelve a la misma página del listado (filtros y cursor incluidos)
+    siguiente = request.POST.get('siguiente')
+    if siguiente and url_has_allowed_host_and_scheme(siguiente, {request.get_host()}, request.is_secure()):
+        return redirect(siguiente)
+    return redirect('lista_pedidos')
+
+
 @login_required
-def lista_clientes(request):
-    # Anotar clientes con el total de pedidos
-    clientes = Cliente.objects.annotate(total_pedidos=Count('pedido'))
-    
-    # Búsqueda
-    busqueda = request.GET.get('busqueda')
+@require_POST
+def cambiar_estado_masivo(request):
+    nuevo_estado = request.POST.get('estado')
+    if nuevo_estado in dict(Pedido.ESTADO_CHOICES):
+        operaciones.cambiar_estado(_ids_seleccionados(request), nuevo_estado)
+    return _volver_al_listado(request)
+
+
+@login_required
+@require_POST
+def eliminar_pedidos_masivo(request):
+    operaciones.eliminar(_ids_seleccionados(request))
+    return _volver_al_listado(request)
+
+CLIENTES_POR_PAGINA = 25
+
+
+def _clientes_filtrados(busqueda):
+    # El total de pedidos sale del contador por cliente (sin agrupar pedidos)
+    clientes = Cliente.objects.annotate(total_pedidos=Coalesce('contador__cantidad', 0))
     if busqueda:
-        clientes = clientes.filter(
-            Q(nombre__icontains=busqueda) | 
-            Q(email__icontains=busqueda) |
-            Q(telefono__icontains=busqueda)
+        clientes = filtrar_clientes(clientes, busqueda)
+    return clientes
+
+
+def _estadisticas_clientes(busqueda):
+    """
+    Total, activos (con al menos un pedido) y cliente top en un solo
+    agregado más la consulta del top. Se cachea por búsqueda hasta que
+    cambie algún pedido o cliente.
+    """
+    def calcular():
+        clientes = Cliente.objects.all()
+        if busqueda:
+            clientes = filtrar_clientes(clientes, busqueda)
+        totales = clientes.aggregate(
+            total=Count('pk'),
+            activos=Count('pk', filter=Q(contador__cantidad__gt=0)),
         )
-    
-    # Calcular clientes activos (aquellos con más de 0 pedidos)
-    # Nota: Usamos la lista anotada para filtrar en Python o hacemos otra query.
-    # Para eficiencia, podemos contar sobre el QuerySet anotado:
-    clientes_activos = clientes.filter(total_pedidos__gt=0).count()
-    
-    # Obtener el cliente top (con más pedidos)
-    top_cliente = clientes.order_by('-total_pedidos').first()
-    
+        top = (
+            ContadorCliente.objects.filter(cantidad__gt=0, cliente__in=clientes)
+            .select_related('cliente').order_by('-cantidad', 'cliente_id').first()
+        )
+        top_cliente = None
+        if top:
+            top_cliente = top.cliente
+            top_cliente.total_pedidos = top.cantidad
+        return totales['total'], totales['activos'], top_cliente
+
+    return cache_pedidos.obtener_o_calcular(
+        'ranking_clientes', calcular, partes=(busqueda or '',)
+    )
+
+
+def _paginador_clientes(busqueda):
+    return PaginadorCursor(_clientes_filtrados(busqueda), 'nombre', por_pagina=CLIENTES_POR_PAGINA)
+
+
+def _pagina_clientes(request):
+    busqueda = request.GET.get('busqueda')
+    pagina = _paginador_clientes(busqueda).pagina(request.GET.get('cursor'))
+    return busqueda, pagina, _url_siguiente_clientes(request, pagina)
+
+
+def _url_siguiente_clientes(request, pagina):
+    url_siguiente = None
+    if pagina.siguiente:
+        parametros = request.GET.copy()
+        parametros['cursor'] = pagina.siguiente
+        url_siguiente = '?' + parametros.urlencode()
+    return url_siguiente
+
+
+@login_required
+def lista_clientes(request):
+    busqueda, pagina, url_siguiente = _pagina_clientes(request)
+    total_clientes, clientes_activos, top_cliente = _estadisticas_clientes(busqueda)
+
     context = {
-        'clientes': clientes,
+        'clientes': pagina,
+        'total_clientes': total_clientes,
         'clientes_activos': clientes_activos,
         'clientes_nuevos': 0, # Placeholder
         'top_cliente': top_cliente,
         'busqueda': busqueda,
+        'url_siguiente': url_siguiente,
     }
     return render(request, 'pedidos/cliente_list.html', context)
 
+
+@login_required
+def api_clientes(request):
+    """
+    Página siguiente del directorio de clientes para el scroll infinito.
+    Devuelve los datos y las filas ya renderizadas con el mismo template.
+    """
+    busqueda, pagina, url_siguiente = _pagina_clientes(request)
+    return JsonResponse(_datos_api_clientes(request, pagina, url_siguiente))
+
+
+def _datos_api_clientes(request, pagina, url_siguiente):
+    return {
+        'clientes': [
+            {
+                'id': cliente.id,
+                'nombre': cliente.nombre,
+                'telefono': cliente.telefono,
+                'email': cliente.email,
+                'total_pedidos': cliente.total_pedidos,
+            }
+            for cliente in pagina
+        ],
+        'html': render_to_string('pedidos/includes/cliente_filas.html', {'clientes': pagina}, request),
+        'siguiente': url_siguiente,
+    }
+
 @login_required
 @transaccion_segura
 def crear_cliente(request):
@@ -244,65 +379,104 @@ def eliminar_cliente(request, pk):
     return render(request, 'pedidos/cliente_confirm_delete.html', {'cliente': cliente})
 
 
-@login_required
-def lista_pedidos(request):
-    # Contadores globales
-    total_pedidos = Pedido.objects.count()
-    pendientes = Pedido.objects.filter(estado='PENDIENTE').count()
-    en_proceso = Pedido.objects.filter(estado='EN_PROCESO').count()
-    completados = Pedido.objects.filter(estado='TERMINADO').count()
+CAMPOS_ORDEN_PEDIDOS = [
+    'cliente__nombre', '-cliente__nombre',
+    'estado', '-estado',
+    'fecha_entrega', '-fecha_entrega',
+    'fecha_solicitud', '-fecha_solicitud',
+    'id', '-id'
+]
 
-    # 1. Base QuerySet
-    pedidos = Pedido.objects.all()
 
-    # 2. Lógica de Ordenamiento (Sorting)
-    orden = request.GET.get('orden', '-fecha_solicitud')  # Default: Lo más nuevo primero
-
-    campos_permitidos = [
-        'cliente__nombre', '-cliente__nombre',
-        'estado', '-estado',
-        'fecha_entrega', '-fecha_entrega',
-        'fecha_solicitud', '-fecha_solicitud',
-        'id', '-id'
-    ]
+def _filtrar_lista_pedidos(params):
+    """
+    Aplica orden, filtro de estado y búsqueda del listado de pedidos.
+    Devuelve (queryset, orden, estado_filter, busqueda).
+    """
+    # 1. Base QuerySet (el template muestra el nombre del cliente en cada fila)
+    pedidos = Pedido.objects.select_related('cliente')
 
-    if orden in campos_permitidos:
-        pedidos = pedidos.order_by(orden)
-    else:
-        pedidos = pedidos.order_by('-fecha_solicitud')
+    # 2. Lógica de Ordenamiento (Sorting)
+    orden = params.get('orden', '-fecha_solicitud')  # Default: Lo más nuevo primero
+    if orden not in CAMPOS_ORDEN_PEDIDOS:
+        orden = '-fecha_solicitud'
+    pedidos = pedidos.order_by(orden)
 
     # 3. Filtros Existentes (Estado)
-    estado_filter = request.GET.get('estado')
+    estado_filter = params.get('estado')
     if estado_filter:
         pedidos = pedidos.filter(estado=estado_filter)
 
-    # 4. Búsqueda - Solo Cliente y Teléfono
-    busqueda = request.GET.get('busqueda')
+    # 4. Búsqueda - Cliente (nombre, teléfono, email) y texto del pedido
+    busqueda = params.get('busqueda')
     if busqueda:
-        pedidos = pedidos.filter(
-            Q(cliente__nombre__icontains=busqueda) |
-            Q(cliente__telefono__icontains=busqueda)
+        pedidos = filtrar_pedidos(pedidos, busqueda)
+
+    return pedidos, orden, estado_filter, busqueda
+
+
+@login_required
+@condicional(_version_lista_pedidos)
+def lista_pedidos(request):
+    # Contadores globales (tabla de contadores compartida con el dashboard)
+    kpis = leer_kpis()
+
+    pedidos, orden, estado_filter, busqueda = _filtrar_lista_pedidos(request.GET)
+
+    # 5. Paginación por cursor (sin COUNT ni OFFSET)
+    pagina = PaginadorCursor(pedidos, orden, por_pagina=10).pagina(request.GET.get('cursor'))
+
+    # 6. Total aproximado: sale de los contadores o, si hay búsqueda,
+    # de un conteo cacheado hasta que cambien los pedidos.
+    if busqueda:
+        total_aproximado = cache_pedidos.obtener_o_calcular(
+            'conteo_pedidos', pedidos.count, partes=(estado_filter or '', busqueda),
+            version=getattr(request, 'version_pedidos', None),
         )
+    else:
+        total_aproximado = _total_por_estado(kpis, estado_filter)
+
+    context = _contexto_lista_pedidos(
+        request, kpis, pagina, orden, estado_filter, busqueda, total_aproximado
+    )
+    return render(request, 'pedidos/pedido_list.html', context)
+
 
-    # 5. Paginación
-    paginator = Paginator(pedidos, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def _total_por_estado(kpis, estado_filter):
+    if estado_filter:
+        return {
+            'PENDIENTE': kpis.pendientes,
+            'EN_PROCESO': kpis.en_proceso,
+            'TERMINADO': kpis.completados,
+        }.get(estado_filter, 0)
+    return kpis.total_pedidos
+
+
+def _contexto_lista_pedidos(request, kpis, pagina, orden, estado_filter, busqueda, total_aproximado):
+    def url_pagina(cursor):
+        if not cursor:
+            return None
+        parametros = request.GET.copy()
+        parametros['cursor'] = cursor
+        parametros.pop('page', None)
+        return '?' + parametros.urlencode()
 
     context = {
-        'total_pedidos': total_pedidos,
-        'pendientes': pendientes,
-        'en_proceso': en_proceso,
-        'completados': completados,
-        'pedidos': page_obj,
-        'page_obj': page_obj,
+        'total_pedidos': kpis.total_pedidos,
+        'pendientes': kpis.pendientes,
+        'en_proceso': kpis.en_proceso,
+        'completados': kpis.completados,
+        'pedidos': pagina,
         'busqueda': busqueda,
         'estado_filter': estado_filter,
         'orden': orden,
-        'is_paginated': page_obj.has_other_pages(),
+        'total_aproximado': total_aproximado,
+        'url_siguiente': url_pagina(pagina.siguiente),
+        'url_anterior': url_pagina(pagina.anterior),
+        'is_paginated': pagina.tiene_otras_paginas,
+        'estados': Pedido.ESTADO_CHOICES,
     }
-
-    return render(request, 'pedidos/pedido_list.html', context)
+    return context
 
 @login_required
 @transaccion_segura
@@ -312,14 +486,15 @@ def duplicar_pedido(request, pk):
 
     # 2. Crear una copia en memoria (sin PK para que sea nuevo)
     nuevo_pedido = Pedido(
-        cliente=original.cliente,
+        cliente_id=original.cliente_id,  # Sin cargar el cliente: basta su id
         resumen_pedido=original.resumen_pedido,
         detalles_pedido=original.detalles_pedido,
         valor_venta=original.valor_venta,
         valor_abonado=0,  # IMPORTANTE: La deuda nace en 0
         estado='PENDIENTE',  # IMPORTANTE: Nace pendiente
         fecha_entrega=original.fecha_entrega,  # Mantenemos fecha ref, usuario editará si quiere
-        imagen_referencia=original.imagen_referencia  # Mantenemos la imagen si tenía
+        imagen_referencia=original.imagen_referencia,  # Mantenemos la imagen si tenía
+        imagen_hash=original.imagen_hash,  # ...y sus variantes ya generadas
     )
 
     # 3. Guardar el nuevo registro (esto genera fecha_solicitud actual automática)
@@ -329,52 +504,308 @@ def duplicar_pedido(request, pk):
     return redirect('detalle_pedido', pk=nuevo_pedido.pk)
 
 
-@login_required
-def trabajo_semanal(request):
+HORIZONTE_MINIMO, HORIZONTE_MAXIMO = 7, 90
+
+
+def _horizonte_carga(params):
+    """Días hacia adelante del histograma de carga (?dias=N, acotado)."""
+    try:
+        dias = int(params.get('dias', settings.PEDIDOS_HORIZONTE_CARGA))
+    except (TypeError, ValueError):
+        dias = settings.PEDIDOS_HORIZONTE_CARGA
+    # Nunca menos de una semana: el día peak sale del mismo histograma
+    return max(HORIZONTE_MINIMO, min(HORIZONTE_MAXIMO, dias))
+
+
+def _consultas_trabajo_semanal(hoy, horizonte):
+    """
+    Dos consultas sin evaluar, de costo fijo: los pedidos activos con su
+    zona (Case/When) y las entregas por día del horizonte (GROUP BY).
+    """
     # 1. Definir Fechas
-    hoy = timezone.now().date()
     limite_semana = hoy + timedelta(days=7)
 
     # 2. Obtener Pedidos Activos
-    activos = Pedido.objects.exclude(estado='TERMINADO')
+    # (estado__in en vez de exclude: permite usar el índice estado + fecha_entrega)
+    activos = Pedido.objects.filter(estado__in=ESTADOS_ACTIVOS)
+
+    # 3. Clasificación en la misma consulta (con su cliente, para poder cachearlos)
+    clasificados = (
+        activos.select_related('cliente')
+        .annotate(zona=Case(
+            When(fecha_entrega__lt=hoy, then=Value('criticos')),
+            When(fecha_entrega__lte=limite_semana, then=Value('urgentes')),
+            default=Value('normales'),
+        ))
+        .order_by('fecha_entrega', 'id')
+    )
+
+    # 4. Carga por día: una fila por fecha con entregas
+    carga = (
+        activos.filter(fecha_entrega__range=[hoy, hoy + timedelta(days=horizonte)])
+        .values('fecha_entrega')
+        .annotate(cantidad=Count('id'))
+        .order_by('fecha_entrega')
+        .values_list('fecha_entrega', 'cantidad')
+    )
+    return clasificados, carga
+
 
-    # 3. Clasificación
-    criticos = activos.filter(fecha_entrega__lt=hoy).order_by('fecha_entrega')
-    urgentes = activos.filter(fecha_entrega__range=[hoy, limite_semana]).order_by('fecha_entrega')
-    normales = activos.filter(fecha_entrega__gt=limite_semana).order_by('fecha_entrega')
+def _contexto_trabajo_semanal(hoy, horizonte):
+    clasificados, carga = _consultas_trabajo_semanal(hoy, horizonte)
+    return _armar_contexto_trabajo_semanal(hoy, horizonte, list(clasificados), list(carga))
 
-    # 4. Métricas
-    total_activos = activos.count()
-    total_presion = criticos.count() + urgentes.count()
+
+def _histograma_carga(hoy, horizonte, carga):
+    """Un punto por día del horizonte (también los días sin entregas)."""
+    por_dia = dict(carga)
+    capacidad = settings.PEDIDOS_CAPACIDAD_DIARIA
+    maximo = max(capacidad, *por_dia.values(), 1)
+
+    histograma = []
+    for desplazamiento in range(horizonte + 1):
+        fecha = hoy + timedelta(days=desplazamiento)
+        cantidad = por_dia.get(fecha, 0)
+        histograma.append({
+            'fecha': fecha,
+            'cantidad': cantidad,
+            'altura': round(cantidad * 100 / maximo),
+            'excede': bool(capacidad) and cantidad > capacidad,
+        })
+    return histograma, round(capacidad * 100 / maximo)
+
+
+def _armar_contexto_trabajo_semanal(hoy, horizonte, clasificados, carga):
+    zonas = {'criticos': [], 'urgentes': [], 'normales': []}
+    for pedido in clasificados:
+        zonas[pedido.zona].append(pedido)
+
+    # 5. Métricas
+    total_activos = len(clasificados)
+    total_presion = len(zonas['criticos']) + len(zonas['urgentes'])
 
     if total_activos > 0:
         nivel_presion = int((total_presion / total_activos) * 100)
     else:
         nivel_presion = 0
 
-    # 5. Métrica Peak Load (CORREGIDA)
-    dia_peak_date = None  # Pasamos el objeto fecha, no el texto
-    dia_peak_cantidad = 0
+    # 6. Día peak de la semana: el de más entregas (el primero si empatan),
+    # leído del histograma en vez de contar fechas en Python
+    limite_semana = hoy + timedelta(days=7)
+    dia_peak_date, dia_peak_cantidad = max(
+        ((fecha, cantidad) for fecha, cantidad in carga if fecha <= limite_semana),
+        key=lambda dia: dia[1], default=(None, 0),
+    )
 
-    if urgentes.exists():
-        fechas = [p.fecha_entrega for p in urgentes]
-        # Encontramos la fecha más común
-        fecha_mas_comun = max(set(fechas), key=fechas.count)
-        dia_peak_cantidad = fechas.count(fecha_mas_comun)
-        dia_peak_date = fecha_mas_comun  # Guardamos la fecha real
+    histograma, linea_capacidad = _histograma_carga(hoy, horizonte, carga)
 
     context = {
-        'criticos': criticos,
-        'urgentes': urgentes,
-        'normales': normales,
+        **zonas,
         'nivel_presion': nivel_presion,
-        'dia_peak_date': dia_peak_date,  # Nueva variable para el template
+        'dia_peak_date': dia_peak_date,
         'dia_peak_cantidad': dia_peak_cantidad,
         'hoy': hoy,
+        'horizonte': horizonte,
+        'histograma': histograma,
+        'capacidad_diaria': settings.PEDIDOS_CAPACIDAD_DIARIA,
+        'linea_capacidad': linea_capacidad,
     }
 
+    return context
+
+
+@login_required
+@condicional(_version_trabajo_semanal)
+def trabajo_semanal(request):
+    hoy = timezone.now().date()
+    horizonte = _horizonte_carga(request.GET)
+    # La fecha forma parte de la clave: al cambiar el día se recalcula
+    context = cache_pedidos.obtener_o_calcular(
+        'trabajo_semanal', lambda: _contexto_trabajo_semanal(hoy, horizonte),
+        partes=(hoy.isoformat(), horizonte), version=getattr(request, 'version_pedidos', None),
+    )
     return render(request, 'pedidos/trabajo_semanal.html', context)
 
+
+def _respuesta_exportacion(formato, nombre, encabezados, filas):
+    if formato not in exportacion.FORMATOS:
+        raise Http404("Formato de exportación no soportado")
+    generar, tipo = exportacion.FORMATOS[formato]
+    contenido = generar(encabezados, filas)
+    if settings.PEDIDOS_ASGI:
+        contenido = exportacion.en_flujo_async(contenido)
+    respuesta = StreamingHttpResponse(contenido, content_type=tipo)
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}-{timezone.localdate():%Y%m%d}.{formato}"'
+    return respuesta
+
+
+@login_required
+def exportar_pedidos(request, formato):
+    # Mismos filtros y orden que el listado (sin paginar)
+    pedidos, _, _, _ = _filtrar_lista_pedidos(request.GET)
+    encabezados = [titulo for titulo, _ in exportacion.COLUMNAS_PEDIDOS]
+    return _respuesta_exportacion(formato, 'pedidos', encabezados, exportacion.filas_pedidos(pedidos))
+
+
+@login_required
+def exportar_clientes(request, formato):
+    clientes = Cliente.objects.order_by('nombre', 'id')
+    busqueda = request.GET.get('busqueda')
+    if busqueda:
+        clientes = filtrar_clientes(clientes, busqueda)
+    encabezados = [titulo for titulo, _ in exportacion.COLUMNAS_CLIENTES]
+    return _respuesta_exportacion(formato, 'clientes', encabezados, exportacion.filas_clientes(clientes))
+
+
+# ==========================================
+# CAMBIOS EN VIVO (server-sent events)
+# ==========================================
+
+def _respuesta_eventos(contenido):
+    respuesta = StreamingHttpResponse(contenido, content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    # Que nginx no acumule el flujo antes de enviarlo
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+
+def _ultimo_evento(request):
+    # EventSource manda Last-Event-ID al reconectarse; la primera vez, la
+    # página trae en ?desde= el último evento que ya incluía
+    return request.headers.get('Last-Event-ID') or request.GET.get('desde')
+
+
+@login_required
+def eventos_pedidos(request):
+    """
+    En WSGI cada conexión ocupa un hilo: se cierra a los
+    PEDIDOS_EVENTOS_DURACION_SYNC segundos y el navegador se reconecta.
+    """
+    return _respuesta_eventos(eventos.flujo(
+        _ultimo_evento(request), settings.PEDIDOS_EVENTOS_LATIDO, settings.PEDIDOS_EVENTOS_DURACION_SYNC
+    ))
+
+
+@staff_member_required
+def api_estadisticas_cache(request):
+    return JsonResponse(cache_pedidos.estadisticas())
+
+
+@staff_member_required
+def api_metricas(request):
+    # Métricas de ESTE proceso: con varios workers cada uno tiene las suyas
+    return JsonResponse(metricas.resumen())
+
+
+# ==========================================
+# VISTAS ASYNC (perfil ASGI)
+# ==========================================
+# Versiones async de las páginas de solo lectura y de las APIs JSON. urls.py
+# las usa cuando PEDIDOS_ASGI está activo (PedidosApp/asgi.py lo activa).
+# Las consultas independientes se lanzan juntas con asyncio.gather; el
+# render (el template puede tocar sesión y usuario) va en un hilo.
+
+async def _alistar(queryset):
+    return [objeto async for objeto in queryset]
+
+
+async def _arender(request, plantilla, context):
+    # login_required ya cargó el usuario con auser(): se reutiliza para que
+    # el template no lo vuelva a consultar
+    request.user = await request.auser()
+    return await sync_to_async(render)(request, plantilla, context)
+
+
+async def _acontexto_dashboard():
+    kpis, total_clientes, top_contadores = await asyncio.gather(
+        aleer_kpis(),
+        Cliente.objects.acount(),
+        _alistar(_top_contadores()),
+    )
+    return _armar_contexto_dashboard(kpis, total_clientes, top_contadores)
+
+
+@login_required
+async def dashboard_async(request):
+    context = await cache_pedidos.aobtener_o_calcular('dashboard', _acontexto_dashboard)
+    return await _arender(request, 'pedidos/dashboard.html', context)
+
+
+@login_required
+@condicional(_version_trabajo_semanal)
+async def trabajo_semanal_async(request):
+    hoy = timezone.now().date()
+    horizonte = _horizonte_carga(request.GET)
+
+    async def calcular():
+        clasificados, carga = _consultas_trabajo_semanal(hoy, horizonte)
+        clasificados, carga = await asyncio.gather(_alistar(clasificados), _alistar(carga))
+        return _armar_contexto_trabajo_semanal(hoy, horizonte, clasificados, carga)
+
+    context = await cache_pedidos.aobtener_o_calcular(
+        'trabajo_semanal', calcular, partes=(hoy.isoformat(), horizonte),
+        version=getattr(request, 'version_pedidos', None),
+    )
+    return await _arender(request, 'pedidos/trabajo_semanal.html', context)
+
+
+@login_required
+@condicional(_version_lista_pedidos)
+async def lista_pedidos_async(request):
+    # La búsqueda puede consultar una vez si existe FTS5 (SQL crudo): va en un hilo
+    pedidos, orden, estado_filter, busqueda = await sync_to_async(_filtrar_lista_pedidos)(request.GET)
+
+    consultas = [
+        aleer_kpis(),
+        PaginadorCursor(pedidos, orden, por_pagina=10).apagina(request.GET.get('cursor')),
+    ]
+    if busqueda:
+        consultas.append(cache_pedidos.aobtener_o_calcular(
+            'conteo_pedidos', pedidos.acount, partes=(estado_filter or '', busqueda),
+            version=getattr(request, 'version_pedidos', None),
+        ))
+    kpis, pagina, *conteo = await asyncio.gather(*consultas)
+    total_aproximado = conteo[0] if conteo else _total_por_estado(kpis, estado_filter)
+
+    context = _contexto_lista_pedidos(
+        request, kpis, pagina, orden, estado_filter, busqueda, total_aproximado
+    )
+    return await _arender(request, 'pedidos/pedido_list.html', context)
+
+
+@login_required
+async def api_buscar_clientes_async(request):
+    # El autocompletado tiene su cache en memoria y usa SQL crudo (FTS5)
+    resultados = await sync_to_async(autocompletar_clientes)(request.GET.get('q', ''), limite=LIMITE_AUTOCOMPLETAR)
+    return JsonResponse({'results': resultados})
+
+
+@login_required
+async def api_clientes_async(request):
+    busqueda = request.GET.get('busqueda')
+    paginador = await sync_to_async(_paginador_clientes)(busqueda)
+    pagina = await paginador.apagina(request.GET.get('cursor'))
+    request.user = await request.auser()
+    datos = await sync_to_async(_datos_api_clientes)(request, pagina, _url_siguiente_clientes(request, pagina))
+    return JsonResponse(datos)
+
+
+@login_required
+async def eventos_pedidos_async(request):
+    # Una conexión abierta no ocupa un hilo: dura lo que el navegador quiera
+    return _respuesta_eventos(eventos.aflujo(_ultimo_evento(request), settings.PEDIDOS_EVENTOS_LATIDO))
+
+
+@staff_member_required
+async def api_estadisticas_cache_async(request):
+    return JsonResponse(await sync_to_async(cache_pedidos.estadisticas)())
+
+
+@staff_member_required
+async def api_metricas_async(request):
+    return JsonResponse(metricas.resumen())
+
+
 def error_404(request, exception):
     return render(request, 'pedidos/errors/404.html', status=404)
 
@@ -0,0 +1,29 @@
+/** Misma configuración que usaba el script de cdn.tailwindcss.com en base.html */
+module.exports = {
+    darkMode: "class",
+    // Solo se generan las clases que aparecen en estos archivos
+    content: [
+        "./pedidos/templates/**/*.html",
+        "./pedidos/templatetags/**/*.py",
+        "./pedidos/static/pedidos/js/**/*.js",
+    ],
+    theme: {
+        extend: {
+            colors: {
+                primary: "#FBBF24", // Amarillo Manzagrafica
+                "background-light": "#F9FAFB",
+                "background-dark": "#0A0A0A",
+                "card-dark": "#171717",
+                "border-dark": "#262626",
+            },
+            fontFamily: {
+                display: ["Bebas Neue", "sans-serif"],
+                sans: ["Inter", "sans-serif"],
+            },
+        },
+    },
+    plugins: [
+        require("@tailwindcss/forms"),
+        require("@tailwindcss/typography"),
+    ],
+};